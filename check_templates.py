@@ -0,0 +1,41 @@
+"""
+Parses every file under `contents` as a Jinja template, as `archetect render` does.
+
+Python and YAML content must not contain `{{`, `}}`, `{%` or `{#` other than the template variables and tags of the
+archetype, e.g. in f-strings. Escape literal braces with `{{'{'}}` or build them from single braces.
+
+Usage:
+    pip install jinja2
+    python check_templates.py
+"""
+
+import os
+import sys
+
+from jinja2 import Environment, TemplateSyntaxError
+
+CONTENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contents")
+
+
+def main() -> int:
+    environment = Environment()
+    errors = 0
+    for directory, _, files in os.walk(CONTENTS_DIR):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            try:
+                with open(path, encoding="utf-8") as file:
+                    source = file.read()
+            except UnicodeDecodeError:
+                # Binary files are copied, not rendered
+                continue
+            try:
+                environment.parse(source)
+            except TemplateSyntaxError as error:
+                print(f"{os.path.relpath(path)}:{error.lineno}: {error.message}")
+                errors += 1
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Recall@k and latency of the IVF backend against exact search, for a range of `nprobe` values.
+
+The synthetic corpus is a mixture of Gaussian clusters, which resembles real embedding distributions far
+better than uniform noise (on which no ANN index can beat brute force).
+
+Usage:
+    poetry run python -m benchmarks.bench_ann --nodes 100000 --dim 256 --nprobe 1 4 16 64
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.common import Stopwatch, percentile
+from {{ project_identifier }}.core.ann import IVFIndex, IVFSearcher
+from {{ project_identifier }}.core.search import DenseSearcher, normalize_rows
+
+
+def clustered_embeddings(num_nodes: int, dim: int, num_topics: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    topics = normalize_rows(rng.standard_normal((num_topics, dim), dtype=np.float32))
+    vectors = topics[rng.integers(0, num_topics, num_nodes)] + 0.6 * rng.standard_normal(
+        (num_nodes, dim), dtype=np.float32
+    ) / np.sqrt(dim)
+    return normalize_rows(vectors)
+
+
+def recall_at_k(exact_positions, approximate_positions) -> float:
+    hits = [
+        len(set(exact) & set(approximate)) / len(exact)
+        for exact, approximate in zip(exact_positions, approximate_positions)
+    ]
+    return float(np.mean(hits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--num-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = clustered_embeddings(args.nodes + args.queries, args.dim, args.topics)
+    vectors, queries = corpus[: args.nodes], corpus[args.nodes :]
+
+    with Stopwatch() as build:
+        ivf = IVFIndex.build(vectors, num_lists=args.num_lists)
+    print(f"Built IVF index with {ivf.num_lists} lists over {args.nodes} nodes in {build.seconds:.1f}s")
+
+    exact = DenseSearcher(vectors, normalized=True)
+    exact_positions, exact_latencies = [], []
+    for query in queries:
+        with Stopwatch() as stopwatch:
+            _, positions = exact.search(query, args.top_k)
+        exact_positions.append(positions)
+        exact_latencies.append(stopwatch.seconds * 1000)
+
+    print(f"{'search':>12} {'recall@' + str(args.top_k):>10} {'p50 ms':>10} {'p99 ms':>10}")
+    print(
+        f"{'exact':>12} {1.0:>10.3f} "
+        f"{percentile(exact_latencies, 50):>10.3f} {percentile(exact_latencies, 99):>10.3f}"
+    )
+    for nprobe in args.nprobe:
+        searcher = IVFSearcher(ivf, vectors, nprobe=nprobe)
+        approximate_positions, latencies = [], []
+        for query in queries:
+            with Stopwatch() as stopwatch:
+                _, positions = searcher.search(query, args.top_k)
+            approximate_positions.append(positions)
+            latencies.append(stopwatch.seconds * 1000)
+        recall = recall_at_k(exact_positions, approximate_positions)
+        print(
+            f"{'nprobe=' + str(nprobe):>12} {recall:>10.3f} "
+            f"{percentile(latencies, 50):>10.3f} {percentile(latencies, 99):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Build time, on-disk size and query latency of the BM25 index, and the latency hybrid search adds to dense
+search, for synthetic corpora of increasing size.
+
+Synthetic pages draw from a 30 word vocabulary, so every common term has postings in nearly every page:
+a worst case for an inverted index. Every page also carries a unique part number, and queries mix three
+common words with one part number, like a question about a specific product. Indexes are loaded back
+memory-mapped, as the app does.
+
+Usage:
+    poetry run python -m benchmarks.bench_bm25 --nodes 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.common import Stopwatch, percentile, synthetic_embeddings, synthetic_text
+from {{ project_identifier }}.core.bm25 import BM25Index, reciprocal_rank_fusion
+from {{ project_identifier }}.core.search import DenseSearcher
+
+
+def part_number(position: int) -> str:
+    return f"g{3440 + position % 97}-{position:06d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>7} {'build s':>8} {'disk MB':>8} {'load ms':>8} {'bm25 p50':>9} {'bm25 p99':>9} "
+        f"{'dense p50':>10} {'hybrid p50':>11} {'hybrid p99':>11}"
+    )
+    for num_nodes in args.nodes:
+        rng = random.Random(0)
+        texts = [f"{synthetic_text(rng, args.words)} {part_number(position)}" for position in range(num_nodes)]
+        queries = [
+            f"{synthetic_text(rng, 3)} {part_number(rng.randrange(num_nodes))}" for _ in range(args.queries)
+        ]
+        vectors = synthetic_embeddings(num_nodes, args.dim)
+        query_vectors = synthetic_embeddings(args.queries, args.dim, seed=1)
+        dense = DenseSearcher(vectors, normalized=True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with Stopwatch() as build:
+                BM25Index.build(texts).save(tmp)
+            disk_mb = sum(entry.stat().st_size for entry in os.scandir(tmp)) / 1024**2
+            with Stopwatch() as load:
+                bm25 = BM25Index.load(tmp)
+
+            lexical_latencies, dense_latencies, hybrid_latencies = [], [], []
+            for query, query_vector in zip(queries, query_vectors):
+                with Stopwatch() as lexical:
+                    bm25.search(query, args.candidates)
+                with Stopwatch() as dense_only:
+                    dense.search(query_vector, args.candidates)
+                with Stopwatch() as hybrid:
+                    _, dense_positions = dense.search(query_vector, args.candidates)
+                    _, lexical_positions = bm25.search(query, args.candidates)
+                    reciprocal_rank_fusion([dense_positions, lexical_positions], top_k=5)
+                lexical_latencies.append(lexical.seconds * 1000)
+                dense_latencies.append(dense_only.seconds * 1000)
+                hybrid_latencies.append(hybrid.seconds * 1000)
+            del bm25
+
+        print(
+            f"{num_nodes:>7} {build.seconds:>8.2f} {disk_mb:>8.1f} {load.seconds * 1000:>8.1f} "
+            f"{percentile(lexical_latencies, 50):>9.2f} {percentile(lexical_latencies, 99):>9.2f} "
+            f"{percentile(dense_latencies, 50):>10.2f} {percentile(hybrid_latencies, 50):>11.2f} "
+            f"{percentile(hybrid_latencies, 99):>11.2f}"
+        )
+    print("Latencies in ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Prompt tokens per turn of a synthetic 50-turn conversation, with the chat memory an agent gets by default
+vs. the bounded, summarized memory of `core/chat_memory.py`, and the cost of reading and writing the history
+in the in-memory and SQLite chat stores.
+
+"history tokens" are the tokens of the chat history and the new question, the part of the prompt that grows
+with the conversation (the system prompt and tool descriptions are the same every turn). The default memory
+is the `ChatMemoryBuffer` the agents create, bounded by 75% of the 128k context window of gpt-4o. The
+summarizer is a fake LLM that answers with a fixed summary of `--summary-words` words; "summary tokens" are
+the tokens sent to it.
+
+Usage:
+    poetry run python -m benchmarks.bench_chat_memory --turns 50 --token-limit 3000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Any
+
+from loguru import logger
+
+from llama_index.core.base.llms.types import ChatMessage, CompletionResponse, MessageRole
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.storage.chat_store import SimpleChatStore
+
+from benchmarks.common import percentile, synthetic_text
+from benchmarks.fakes import FakeInstantLLM
+from {{ project_identifier }}.core.chat_memory import SQLiteChatStore, SummarizingChatMemory
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+
+
+class CountingSummaryLLM(FakeInstantLLM):
+    """Fake summarizer that counts the prompts and tokens it is sent."""
+
+    calls: int = 0
+    prompt_tokens: int = 0
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        self.calls += 1
+        self.prompt_tokens += count_tokens(prompt)
+        return CompletionResponse(text=self.answer)
+
+
+def conversation(turns: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [(synthetic_text(rng, 30) + "?", synthetic_text(rng, 180) + ".") for _ in range(turns)]
+
+
+def run(memory, turns):
+    """Plays the conversation, returns the history tokens and the milliseconds spent in the memory per turn."""
+    tokens, latencies = [], []
+    for question, answer in turns:
+        started = time.perf_counter()
+        history = memory.get(input=question)
+        latencies.append((time.perf_counter() - started) * 1000)
+        tokens.append(sum(count_tokens(message.content) for message in history) + count_tokens(question))
+        started = time.perf_counter()
+        memory.put(ChatMessage(role=MessageRole.USER, content=question))
+        memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+        latencies[-1] += (time.perf_counter() - started) * 1000
+    return tokens, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--token-limit", type=int, default=3000)
+    parser.add_argument("--summary-words", type=int, default=150)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+    turns = conversation(args.turns)
+    summary = synthetic_text(random.Random(1), args.summary_words) + "."
+
+    results = {}
+    default = ChatMemoryBuffer.from_defaults(token_limit=int(128000 * 0.75))
+    results["default"] = run(default, turns) + (None,)
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {"memory": SimpleChatStore(), "sqlite": SQLiteChatStore(os.path.join(tmp, "chat.sqlite"))}
+        for name, store in stores.items():
+            llm = CountingSummaryLLM(answer=summary)
+            memory = SummarizingChatMemory(
+                llm=llm, chat_store=store, chat_store_key="thread", token_limit=args.token_limit, background=False
+            )
+            results[f"summarized/{name}"] = run(memory, turns) + (llm,)
+        stores["sqlite"].close()
+
+    summarized = results["summarized/memory"][0]
+    print(f"{args.turns} turns, summarized memory limited to {args.token_limit} tokens")
+    print(f"{'turn':>5} {'default tokens':>15} {'summarized tokens':>18}")
+    for turn in [1] + list(range(5, args.turns + 1, 5)):
+        print(f"{turn:>5} {results['default'][0][turn - 1]:>15} {summarized[turn - 1]:>18}")
+
+    print(
+        f"\n{'memory':>17} {'history tokens':>15} {'max/turn':>9} {'summaries':>10} {'summary tokens':>15} "
+        f"{'p50 ms':>7} {'max ms':>7}"
+    )
+    for name, (tokens, latencies, llm) in results.items():
+        calls, summary_tokens = (llm.calls, llm.prompt_tokens) if llm is not None else (0, 0)
+        print(
+            f"{name:>17} {sum(tokens):>15} {max(tokens):>9} {calls:>10} {summary_tokens:>15} "
+            f"{percentile(latencies, 50):>7.2f} {max(latencies):>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
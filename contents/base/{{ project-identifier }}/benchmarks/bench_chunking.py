@@ -0,0 +1,131 @@
+"""
+Index size, build cost and retrieval quality of embedding whole pages vs. chunks of headings, paragraphs and
+tables, over the pages shipped in `data/indices`.
+
+Build: nodes, tokens sent to the embedding model, question extraction requests (pages only, chunks are
+embedded as they are), time to chunk, and the size on disk of the binary vector store (1536-dimensional
+embeddings) and of the BM25 index. Retrieval: the labelled queries of `benchmarks/retrieval_eval.jsonl`,
+chunk rankings are mapped back to their pages, keeping the first chunk of every page, so both schemes are
+scored on pages. "context tokens" are the tokens of the top 3 nodes, the re-ranker's default. The shipped
+index carries no embeddings, so dense search is only evaluated with `--dense`, which embeds pages, chunks and
+queries with the configured OpenAI embedding model (needs OPENAI_API_KEY).
+
+Usage:
+    poetry run python -m benchmarks.bench_chunking --max-tokens 256
+    poetry run python -m benchmarks.bench_chunking --max-tokens 256 --dense
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from llama_index.core.schema import MetadataMode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from benchmarks.common import Stopwatch, synthetic_embeddings
+from benchmarks.eval_retrieval import EVAL_PATH, evaluate, page_key
+from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text
+from {{ project_identifier }}.core.index_registry import INDEX_PATH
+from {{ project_identifier }}.core.search import DenseSearcher
+from {{ project_identifier }}.core.vector_store import write_binary_store
+from {{ project_identifier }}.ingestion.chunking import chunk_page
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+
+
+def directory_mb(path) -> float:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()) / (1024 * 1024)
+
+
+def page_rankings(nodes, rankings, num_pages: int):
+    """Maps rankings of node positions to rankings of distinct pages."""
+    pages = []
+    for ranking in rankings:
+        keys = list(dict.fromkeys(page_key(nodes[position]) for position in ranking))
+        pages.append(keys[:num_pages])
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--min-tokens", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dense", action="store_true", help="Also evaluate dense search.")
+    args = parser.parse_args()
+
+    with open(EVAL_PATH) as eval_file:
+        examples = [json.loads(line) for line in eval_file if line.strip()]
+    labels = [
+        {(relevant["file"], page) for relevant in example["relevant"] for page in relevant["pages"]}
+        for example in examples
+    ]
+    queries = [example["query"] for example in examples]
+    pages = list(SimpleDocumentStore.from_persist_dir(INDEX_PATH).docs.values())
+
+    with Stopwatch() as chunking:
+        chunks = [chunk for page in pages for chunk in chunk_page(page, args.max_tokens, args.min_tokens)]
+    schemes = {"pages": (pages, 0.0, len(pages)), "chunks": (chunks, chunking.seconds, 0)}
+
+    build_rows, quality_rows = [], []
+    embed_model = None
+    if args.dense:
+        from {{ project_identifier }}.core.core import get_embed_model
+
+        embed_model = get_embed_model()
+        query_vectors = np.asarray([embed_model.get_query_embedding(query) for query in queries], dtype=np.float32)
+    for name, (nodes, chunk_seconds, extraction_requests) in schemes.items():
+        embedded = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        with tempfile.TemporaryDirectory() as tmp:
+            write_binary_store(nodes, synthetic_embeddings(len(nodes)), os.path.join(tmp, "store"))
+            with Stopwatch() as bm25_build:
+                bm25 = BM25Index.build(lexical_text(node) for node in nodes)
+            os.makedirs(os.path.join(tmp, "bm25"))
+            bm25.save(os.path.join(tmp, "bm25"))
+            store_mb, bm25_mb = directory_mb(os.path.join(tmp, "store")), directory_mb(os.path.join(tmp, "bm25"))
+        build_rows.append(
+            (
+                name,
+                len(nodes),
+                sum(count_tokens(text) for text in embedded),
+                extraction_requests,
+                chunk_seconds * 1000,
+                bm25_build.seconds * 1000,
+                store_mb,
+                bm25_mb,
+            )
+        )
+
+        rankings = {"bm25": [bm25.search(query, 50)[1].tolist() for query in queries]}
+        if embed_model is not None:
+            searcher = DenseSearcher(np.asarray(embed_model.get_text_embedding_batch(embedded), dtype=np.float32))
+            rankings["dense"] = [positions.tolist() for positions in searcher.search_batch(query_vectors, 50)[1]]
+        for search, positions in rankings.items():
+            metrics = evaluate(page_rankings(nodes, positions, args.top_k), labels, args.top_k)
+            context = [sum(count_tokens(nodes[position].get_content()) for position in top[:3]) for top in positions]
+            quality_rows.append((name, search, metrics, sum(context) / len(context)))
+
+    print(f"{len(pages)} shipped pages, chunks of at most {args.max_tokens} tokens")
+    print(
+        f"{'scheme':>7} {'nodes':>6} {'embedded tokens':>16} {'question requests':>18} {'chunk ms':>9} "
+        f"{'bm25 build ms':>14} {'store MB':>9} {'bm25 MB':>8}"
+    )
+    for name, num_nodes, tokens, requests, chunk_ms, bm25_ms, store_mb, bm25_mb in build_rows:
+        print(
+            f"{name:>7} {num_nodes:>6} {tokens:>16} {requests:>18} {chunk_ms:>9.0f} "
+            f"{bm25_ms:>14.0f} {store_mb:>9.2f} {bm25_mb:>8.2f}"
+        )
+    print(f"\n{len(queries)} labelled queries, scored on distinct pages")
+    hit, recall = f"hit@{args.top_k}", f"recall@{args.top_k}"
+    print(f"{'scheme':>7} {'search':>7} {hit:>7} {recall:>9} {'MRR':>6} {'context tokens':>15}")
+    for name, search, metrics, context_tokens in quality_rows:
+        print(
+            f"{name:>7} {search:>7} {metrics[hit]:>7.2f} {metrics[recall]:>9.2f} {metrics['MRR']:>6.2f} "
+            f"{context_tokens:>15.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Prompt tokens and latency per starter question of the Search tool's query engine, with whole retrieved pages
+vs. the context packed into a token budget, over the shipped documents.
+
+"top 5 pages" is the former query engine: the five best pages, whole. "re-ranked pages" re-ranks 50
+candidates down to 3 whole pages. "packed" also packs their sections into `--budget` tokens. The first
+stage is BM25, the shipped index carries no embeddings. Prompts are built by the real compact response
+synthesizer and counted with the tokenizer of the LLM. Offline, a fake LLM answers instantly, so
+latencies cover retrieval, re-ranking, packing and prompt building only. With `--live` the prompts are
+answered by the OpenAI model (needs OPENAI_API_KEY) and latencies include the completion.
+
+Usage:
+    poetry run python -m benchmarks.bench_context_packing --budget 1500
+    poetry run python -m benchmarks.bench_context_packing --budget 1500 --live --model gpt-4o-mini
+"""
+
+import argparse
+import json
+import os
+from typing import List
+
+from loguru import logger
+
+from llama_index.core import Settings
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.utils import get_tokenizer
+
+from benchmarks.common import Stopwatch, percentile
+from benchmarks.fakes import FakeInstantLLM
+from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text
+from {{ project_identifier }}.core.context_packer import ContextPacker
+from {{ project_identifier }}.core.index_registry import INDEX_PATH
+from {{ project_identifier }}.core.rerank import LexicalReranker
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "tests", "evaluation_questions.jsonl")
+
+
+class BM25Retriever(BaseRetriever):
+    def __init__(self, nodes, top_k: int):
+        self._nodes = nodes
+        self._bm25 = BM25Index.build(lexical_text(node) for node in nodes)
+        self._top_k = top_k
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        scores, positions = self._bm25.search(query_bundle.query_str, self._top_k)
+        return [
+            NodeWithScore(node=self._nodes[position], score=float(score)) for score, position in zip(scores, positions)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--live", action="store_true", help="Answer with the OpenAI model instead of offline.")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+
+    with open(QUESTIONS_PATH) as questions_file:
+        questions = [json.loads(line)["query"] for line in questions_file if line.strip()]
+    # The starter questions, not the degenerate ones kept for robustness tests
+    questions = [question for question in questions if len(question.split()) > 4]
+    nodes = list(SimpleDocumentStore.from_persist_dir(INDEX_PATH).docs.values())
+
+    configurations = {
+        "top 5 pages": (5, []),
+        "re-ranked pages": (50, [LexicalReranker(budget_ms=1e6)]),
+        "packed": (50, [LexicalReranker(budget_ms=1e6), ContextPacker(token_budget=args.budget)]),
+    }
+    # Response synthesizers hand the global callback manager to their LLM
+    token_counter = TokenCountingHandler(tokenizer=get_tokenizer())
+    Settings.callback_manager = CallbackManager([token_counter])
+    results = {}
+    for name, (top_k, postprocessors) in configurations.items():
+        if args.live:
+            from llama_index.llms.openai import OpenAI
+
+            llm = OpenAI(model=args.model, temperature=0, max_tokens=2048)
+        else:
+            llm = FakeInstantLLM()
+        query_engine = RetrieverQueryEngine.from_args(
+            BM25Retriever(nodes, top_k), llm=llm, response_mode="compact", node_postprocessors=postprocessors
+        )
+        rows = []
+        for question in questions:
+            token_counter.reset_counts()
+            with Stopwatch() as stopwatch:
+                query_engine.query(question)
+            rows.append((token_counter.prompt_llm_token_count, stopwatch.seconds * 1000))
+        results[name] = rows
+
+    print(f"{len(questions)} starter questions over {len(nodes)} shipped nodes, budget {args.budget} tokens")
+    print(f"{'question':>9} " + " ".join(f"{name + ' tokens':>22} {'ms':>8}" for name in configurations))
+    for position in range(len(questions)):
+        cells = [f"{results[name][position][0]:>22} {results[name][position][1]:>8.1f}" for name in configurations]
+        print(f"{position + 1:>9} " + " ".join(cells))
+    cells = [
+        f"{sum(row[0] for row in rows) / len(rows):>22.0f} {percentile([row[1] for row in rows], 50):>8.1f}"
+        for rows in results.values()
+    ]
+    print(f"{'mean/p50':>9} " + " ".join(cells))
+    print("Prompt tokens per query, latencies in ms" + (" including the completion." if args.live else "."))
+
+
+if __name__ == "__main__":
+    main()
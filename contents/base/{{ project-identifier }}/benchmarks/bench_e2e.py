@@ -0,0 +1,330 @@
+"""
+Latency, throughput and memory of whole chat sessions through the chainlit handlers of `main.py`, offline.
+
+Every session starts with `on_chat_start`, which builds its agent with `select_agent`, then sends `--turns`
+starter questions through `on_message`: the agent, the Search tool and its query engine over a synthetic index
+of `--nodes` pages, the Web tool for `--web-share` of the questions, and `process_response_for_references`.
+The OpenAI LLM and embedding clients and the Tavily search are replaced by the fakes of `benchmarks/fakes.py`,
+with the latencies and token rate given here, so runs are repeatable and comparable between versions of the
+archetype. `--sessions` sessions run concurrently, `AGENT_MODE` and the other settings are read from the
+environment as by the app.
+
+"first token" is the time from a message to the first token sent to the browser, "turn" the time until its
+references are sent. The stages are the means of the `/metrics` histograms over the run. Results are written as
+JSON to `--output`. Given the results of an earlier run as `--baseline`, the run exits with status 1 when its
+p95 latencies, throughput or peak RSS are worse by more than `--tolerance`.
+
+Usage:
+    poetry run python -m benchmarks.bench_e2e --nodes 5000 --sessions 20 --turns 5 --output e2e.json
+    poetry run python -m benchmarks.bench_e2e --nodes 5000 --sessions 20 --turns 5 --baseline e2e.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from loguru import logger
+
+from chainlit.context import ChainlitContext, context_var
+from chainlit.emitter import BaseChainlitEmitter
+from chainlit.session import HTTPSession
+
+from llama_index.core import Settings
+
+from benchmarks.common import Stopwatch, current_rss_mb, peak_rss_mb, percentile, synthetic_embeddings, synthetic_nodes
+from benchmarks.fakes import FakeOpenAI, FakeOpenAIEmbedding, FakeTavilyToolSpec
+from {{ project_identifier }}.utils.chat_profiles import CHAT_PROFILES
+
+# Metrics compared with a baseline: the key in the results, and whether higher is better
+COMPARED_METRICS = [
+    ("latency_ms.turn.p95", False),
+    ("latency_ms.first_token.p95", False),
+    ("throughput_turns_per_second", True),
+    ("memory_mb.peak_rss", False),
+]
+
+
+class RecordingEmitter(BaseChainlitEmitter):
+    """Emitter of a simulated browser session, recording when the streamed tokens would be sent to it."""
+
+    def __init__(self, session):
+        super().__init__(session)
+        self.first_token_at = None
+        self.tokens = 0
+
+    async def send_token(self, id: str, token: str, is_sequence=False, is_input=False):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+
+class Fakes:
+    """Creates the fake clients in place of the real ones, keeping them to count their calls."""
+
+    def __init__(self, args):
+        self.args = args
+        self.llms, self.embed_models, self.web_tools = [], [], []
+
+    def llm(self, **kwargs) -> FakeOpenAI:
+        llm = FakeOpenAI(
+            round_trip_seconds=self.args.llm_first_token_ms / 1000,
+            tokens_per_second=self.args.tokens_per_second,
+            answer_tokens=self.args.answer_tokens,
+            **kwargs,
+        )
+        self.llms.append(llm)
+        return llm
+
+    def embed_model(self, **kwargs) -> FakeOpenAIEmbedding:
+        embed_model = FakeOpenAIEmbedding(latency_seconds=self.args.embedding_ms / 1000, **kwargs)
+        self.embed_models.append(embed_model)
+        return embed_model
+
+    def web_tool(self, **kwargs) -> FakeTavilyToolSpec:
+        web_tool = FakeTavilyToolSpec(latency_seconds=self.args.web_ms / 1000, **kwargs)
+        self.web_tools.append(web_tool)
+        return web_tool
+
+    def counts(self) -> dict:
+        return {
+            "llm_round_trips": sum(llm.round_trips for llm in self.llms),
+            "embedding_requests": sum(embed_model.requests for embed_model in self.embed_models),
+            "web_searches": sum(web_tool.searches for web_tool in self.web_tools),
+        }
+
+
+def build_index(path: str, num_nodes: int):
+    from {{ project_identifier }}.core.vector_store import write_binary_store
+
+    write_binary_store(synthetic_nodes(num_nodes), synthetic_embeddings(num_nodes), path)
+
+
+def questions(starters, args, seed: int):
+    rng = random.Random(seed)
+    for _ in range(args.turns):
+        question = rng.choice(starters).message
+        if rng.random() < args.web_share:
+            question = f"Search the web: {question}"
+        yield question
+
+
+async def run_session(app, profile: str, session_questions, results: dict):
+    import chainlit as cl
+
+    session = HTTPSession(id=str(uuid.uuid4()), thread_id=str(uuid.uuid4()), token=None, client_type="webapp")
+    session.chat_profile = profile
+    emitter = RecordingEmitter(session)
+    # Set in the task of the session only, like chainlit does for every socket event
+    context_var.set(ChainlitContext(session, emitter))
+    try:
+        with Stopwatch() as stopwatch:
+            await app.start()
+        results["chat_start"].append(stopwatch.seconds)
+        for question in session_questions:
+            emitter.first_token_at = None
+            started = time.perf_counter()
+            try:
+                await app.main(cl.Message(content=question))
+            except Exception as e:
+                results["errors"].append(f"{type(e).__name__}: {e}")
+                continue
+            results["turn"].append(time.perf_counter() - started)
+            if emitter.first_token_at is not None:
+                results["first_token"].append(emitter.first_token_at - started)
+    finally:
+        app.end()
+
+
+def summarize(seconds) -> dict:
+    milliseconds = [value * 1000 for value in seconds]
+    return {
+        "p50": percentile(milliseconds, 50),
+        "p95": percentile(milliseconds, 95),
+        "p99": percentile(milliseconds, 99),
+        "mean": sum(milliseconds) / len(milliseconds) if milliseconds else 0.0,
+    }
+
+
+def stage_means(before: dict, after: dict) -> dict:
+    """Mean duration in ms of every stage recorded between two snapshots of the stage histograms."""
+    means = {}
+    for stage, histogram in after.items():
+        previous = before.get(stage, {"count": 0, "sum": 0.0})
+        count = histogram["count"] - previous["count"]
+        if count:
+            means[stage] = {"count": count, "mean": (histogram["sum"] - previous["sum"]) * 1000 / count}
+    return means
+
+
+async def run(args) -> dict:
+    fakes = Fakes(args)
+    rss_before_import = current_rss_mb()
+
+    from {{ project_identifier }}.core import core
+    from {{ project_identifier }}.core.index_registry import index_registry
+
+    core.OpenAI = fakes.llm
+    core.OpenAIEmbedding = fakes.embed_model
+    core.TavilyToolSpec = fakes.web_tool
+    # The index is loaded without an embedding model of its own, retrieval embeds with the cached client
+    Settings.embed_model = fakes.embed_model()
+
+    with tempfile.TemporaryDirectory() as index_path:
+        build_index(index_path, args.nodes)
+        index_registry.index_path = index_path
+        # Importing the app starts loading the index in the background
+        from {{ project_identifier }} import main as app
+        from {{ project_identifier }}.core.metrics import stage_latency
+
+        # The app configures logging on import, only errors and unhandled exceptions are kept
+        logger.remove()
+        logger.add(sys.stderr, level="ERROR")
+        await asyncio.to_thread(index_registry.get)
+        rss_after_load = current_rss_mb()
+
+        starters = await app.set_starters()
+        results = {"chat_start": [], "turn": [], "first_token": [], "errors": []}
+        stages_before = stage_latency.snapshot()
+        with Stopwatch() as stopwatch:
+            await asyncio.gather(
+                *(
+                    run_session(app, args.profile, list(questions(starters, args, seed=session)), results)
+                    for session in range(args.sessions)
+                )
+            )
+        stages_after = stage_latency.snapshot()
+
+    return {
+        "benchmark": "bench_e2e",
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")
+        }
+        | {"agent_mode": core.AGENT_MODE},
+        "turns": len(results["turn"]),
+        "errors": results["errors"],
+        "seconds": stopwatch.seconds,
+        "throughput_turns_per_second": len(results["turn"]) / stopwatch.seconds,
+        "latency_ms": {
+            "turn": summarize(results["turn"]),
+            "first_token": summarize(results["first_token"]),
+            "chat_start": summarize(results["chat_start"]),
+        },
+        "stages_ms": stage_means(stages_before, stages_after),
+        "memory_mb": {
+            "app_and_index_rss": rss_after_load - rss_before_import,
+            "index_rss": index_registry.rss_delta_mb,
+            "final_rss": current_rss_mb(),
+            "peak_rss": peak_rss_mb(),
+        },
+        "calls": fakes.counts(),
+    }
+
+
+def metric(results: dict, key: str) -> float:
+    value = results
+    for part in key.split("."):
+        value = value[part]
+    return value
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints the compared metrics against the baseline, returns the regressed ones."""
+    regressions = []
+    print(f"\nAgainst {baseline.get('label') or 'baseline'} from {baseline.get('timestamp')}:")
+    changed = sorted(
+        key
+        for key in results["config"].keys() | baseline["config"].keys()
+        if key != "label" and results["config"].get(key) != baseline["config"].get(key)
+    )
+    if changed:
+        print(f"The configuration differs in {', '.join(changed)}, the runs may not be comparable")
+    print(f"{'metric':>28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, higher_is_better in COMPARED_METRICS:
+        previous, current = metric(baseline, key), metric(results, key)
+        change = (current - previous) / previous if previous else 0.0
+        regressed = (-change if higher_is_better else change) > tolerance
+        print(f"{key:>28} {previous:>10.1f} {current:>10.1f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def report(results: dict):
+    config = results["config"]
+    print(
+        f"{config['sessions']} sessions x {config['turns']} turns, {config['nodes']} nodes, {config['agent_mode']} "
+        f"agent, LLM first token {config['llm_first_token_ms']:.0f} ms at {config['tokens_per_second']:.0f} "
+        f"tokens/s, embedding {config['embedding_ms']:.0f} ms, web {config['web_ms']:.0f} ms"
+    )
+    print(
+        f"{results['turns']} turns in {results['seconds']:.2f}s, {results['throughput_turns_per_second']:.2f} "
+        f"turns/s, {len(results['errors'])} errors"
+    )
+    print(f"{'latency':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, latency in results["latency_ms"].items():
+        print(f"{name:>12} {latency['p50']:>8.0f} {latency['p95']:>8.0f} {latency['p99']:>8.0f}")
+    print(f"{'stage':>20} {'count':>6} {'mean ms':>8}")
+    for stage, mean in results["stages_ms"].items():
+        print(f"{stage:>20} {mean['count']:>6} {mean['mean']:>8.1f}")
+    memory = results["memory_mb"]
+    print(
+        f"RSS: app and index +{memory['app_and_index_rss']:.1f} MB, final {memory['final_rss']:.1f} MB, "
+        f"peak {memory['peak_rss']:.1f} MB"
+    )
+    print(", ".join(f"{name.replace('_', ' ')} {count}" for name, count in results["calls"].items()))
+    for error in sorted(set(results["errors"])):
+        print(f"error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    profiles = [profile["name"] for profile in CHAT_PROFILES.values()]
+    parser.add_argument("--profile", choices=profiles, default=profiles[0])
+    parser.add_argument("--web-share", type=float, default=0.2)
+    parser.add_argument("--llm-first-token-ms", type=float, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--embedding-ms", type=float, default=60)
+    parser.add_argument("--web-ms", type=float, default=1200)
+    parser.add_argument("--label", default="", help="Names the run in the results, e.g. the archetype version.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # The OpenAI clients are never called, but are configured on import
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+    # The agents are verbose
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(run(args))
+    report(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
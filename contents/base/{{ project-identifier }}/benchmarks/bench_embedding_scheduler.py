@@ -0,0 +1,66 @@
+"""
+Documents/sec of index embedding against a local stub of the OpenAI embeddings API that enforces request
+and token rate limits.
+
+"default" is the former behaviour: `OpenAIEmbedding.get_text_embedding_batch` with fixed batches of
+`embed_batch_size` texts and blind randomized exponential retries. "scheduled" is `BatchedEmbedder`:
+token-sized batches, several requests in flight and token-bucket accounting of both limits. The limits
+apply per `--window` seconds to keep the run short, the scheduler is configured with the same limits.
+
+Usage:
+    poetry run python -m benchmarks.bench_embedding_scheduler --docs 300 --rpm 20 --tpm 40000 --window 1
+"""
+
+import argparse
+import random
+
+import openai
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from benchmarks.common import Stopwatch, synthetic_text
+from benchmarks.fakes import StubOpenAIServer
+from {{ project_identifier }}.ingestion.scheduler import BatchedEmbedder, RateLimitScheduler, openai_embed_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=300)
+    parser.add_argument("--words", type=int, default=300, help="Words per document")
+    parser.add_argument("--rpm", type=int, default=20, help="Requests allowed per window")
+    parser.add_argument("--tpm", type=int, default=40000, help="Tokens allowed per window")
+    parser.add_argument("--window", type=float, default=1.0, help="Rate limit window in seconds")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Stub server latency per request")
+    parser.add_argument("--in-flight", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [synthetic_text(rng, args.words) for _ in range(args.docs)]
+
+    print(f"{'embedding':>10} {'docs/s':>8} {'seconds':>8} {'requests':>9} {'429s':>6}")
+    latency_seconds = args.latency_ms / 1000
+    for name in ("default", "scheduled"):
+        with StubOpenAIServer(args.rpm, args.tpm, args.window, latency_seconds=latency_seconds) as server:
+            failed = False
+            with Stopwatch() as stopwatch:
+                try:
+                    if name == "default":
+                        embed_model = OpenAIEmbedding(api_base=server.base_url, api_key="sk-stub", max_retries=0)
+                        embed_model.get_text_embedding_batch(texts)
+                    else:
+                        client = openai.OpenAI(base_url=server.base_url, api_key="sk-stub", max_retries=0)
+                        scheduler = RateLimitScheduler(
+                            args.rpm, args.tpm, max_in_flight=args.in_flight, period_seconds=args.window
+                        )
+                        embedder = BatchedEmbedder(openai_embed_batch(client, "text-embedding-3-small"), scheduler)
+                        embedder.embed(texts)
+                except openai.RateLimitError:
+                    failed = True
+            docs_per_second = "failed" if failed else f"{args.docs / stopwatch.seconds:.1f}"
+            print(
+                f"{name:>10} {docs_per_second:>8} {stopwatch.seconds:>8.2f} "
+                f"{server.served + server.rejected:>9} {server.rejected:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
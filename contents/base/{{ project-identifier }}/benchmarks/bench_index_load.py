@@ -0,0 +1,89 @@
+"""
+Compares cold load time and resident memory of the JSON storage context against the binary vector store.
+
+Usage:
+    poetry run python benchmarks/bench_index_load.py --nodes 100 1000 10000
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from llama_index.core import MockEmbedding, StorageContext, VectorStoreIndex
+
+from benchmarks.common import Stopwatch, current_rss_mb, synthetic_embeddings, synthetic_nodes
+
+
+def build_stores(num_nodes: int, dim: int, root: Path):
+    from {{ project_identifier }}.core.vector_store import write_binary_store
+
+    nodes = synthetic_nodes(num_nodes)
+    embeddings = synthetic_embeddings(num_nodes, dim)
+    for node, embedding in zip(nodes, embeddings):
+        node.embedding = embedding.tolist()
+
+    json_dir, binary_dir = root / "json", root / "binary"
+    index = VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=dim))
+    index.storage_context.persist(persist_dir=json_dir)
+    write_binary_store(nodes, embeddings, binary_dir)
+    return json_dir, binary_dir
+
+
+def load_in_child(index_format: str, path: str, dim: int):
+    """Runs in a fresh interpreter, so the measurement includes nothing but the load itself."""
+    from llama_index.core import load_index_from_storage
+    from {{ project_identifier }}.core.vector_store import load_vector_index
+
+    embed_model = MockEmbedding(embed_dim=dim)
+    rss_before = current_rss_mb()
+    with Stopwatch() as stopwatch:
+        if index_format == "json":
+            index = load_index_from_storage(StorageContext.from_defaults(persist_dir=path), embed_model=embed_model)
+        else:
+            index = load_vector_index(path, embed_model=embed_model)
+    # Touch one query so lazily mapped stores are measured in a usable state
+    index.as_retriever(similarity_top_k=5).retrieve("ammonia calibration")
+    print(json.dumps({"load_seconds": stopwatch.seconds, "rss_delta_mb": current_rss_mb() - rss_before}))
+
+
+def measure(index_format: str, path: Path, dim: int) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_index_load", "--child", index_format, "--dim", str(dim)]
+    output = subprocess.run(
+        command + ["--path", str(path)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--child", choices=["json", "binary"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        load_in_child(args.child, args.path, args.dim)
+        return
+
+    print(f"{'nodes':>8} {'format':>8} {'disk MB':>9} {'load s':>9} {'RSS MB':>9}")
+    for num_nodes in args.nodes:
+        with tempfile.TemporaryDirectory() as tmp:
+            stores = build_stores(num_nodes, args.dim, Path(tmp))
+            for index_format, path in zip(("json", "binary"), stores):
+                disk_mb = sum(f.stat().st_size for f in path.iterdir()) / (1024 * 1024)
+                result = measure(index_format, path, args.dim)
+                print(
+                    f"{num_nodes:>8} {index_format:>8} {disk_mb:>9.1f} "
+                    f"{result['load_seconds']:>9.3f} {result['rss_delta_mb']:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Latency of a question that needs both the Search and the Web tool, answered by the ReAct agent vs. the
+parallel tool agent (`AGENT_MODE=parallel`), with stub tools of fixed latencies and a fake LLM.
+
+Every LLM round trip takes `--llm-ms`. The ReAct agent calls one tool per round trip, so the question costs
+three round trips and both tool latencies. The parallel agent requests both calls in one round trip and
+runs them concurrently, so it costs two round trips and the slower tool. "slow web" makes the Web tool take
+`--slow-web-ms`, beyond its `--timeout-ms` timeout. "first token" is the time to the first streamed token of
+the answer.
+
+Usage:
+    poetry run python -m benchmarks.bench_parallel_tools --llm-ms 500 --search-ms 800 --web-ms 1200
+"""
+
+import argparse
+import asyncio
+import time
+
+from loguru import logger
+
+from llama_index.core.agent import ReActAgent
+from llama_index.core.tools import FunctionTool
+
+from benchmarks.common import percentile
+from benchmarks.fakes import FakeToolCallingLLM
+from {{ project_identifier }}.core.parallel_agent import ParallelToolAgent, TimeoutTool
+
+PLAN = [("Search", {"input": "ammonia analysis"}), ("Web", {"query": "ammonia analysis"})]
+
+
+def stub_tool(name: str, seconds: float) -> FunctionTool:
+    async def call(input: str = "", query: str = "") -> str:
+        await asyncio.sleep(seconds)
+        return f"{name} result"
+
+    return FunctionTool.from_defaults(async_fn=call, name=name, description=f"Stub {name} tool.")
+
+
+async def ask(agent) -> tuple:
+    started = time.perf_counter()
+    response = await agent.astream_chat("What's the Ammonia Analysis in High-Purity Hydrogen for Fuel Cell Vehicles?")
+    first_token = None
+    async for _ in response.async_response_gen():
+        if first_token is None:
+            first_token = time.perf_counter() - started
+    return time.perf_counter() - started, first_token
+
+
+async def run(args):
+    scenarios = {
+        "both tools": (args.search_ms, args.web_ms),
+        "slow web": (args.search_ms, args.slow_web_ms),
+    }
+    print(
+        f"LLM round trip {args.llm_ms} ms, Search {args.search_ms} ms, Web {args.web_ms} ms "
+        f"(slow web {args.slow_web_ms} ms, timeout {args.timeout_ms} ms), {args.repeats} questions each"
+    )
+    print(f"{'scenario':>11} {'agent':>9} {'p50 ms':>8} {'first token ms':>15} {'LLM round trips':>16}")
+    for scenario, (search_ms, web_ms) in scenarios.items():
+        tools = [
+            TimeoutTool(stub_tool("Search", search_ms / 1000)),
+            TimeoutTool(stub_tool("Web", web_ms / 1000), timeout_seconds=args.timeout_ms / 1000),
+        ]
+        for name in ("react", "parallel"):
+            latencies, first_tokens, round_trips = [], [], 0
+            for _ in range(args.repeats):
+                # A new agent per question, so every question starts without chat history
+                llm = FakeToolCallingLLM(plan=PLAN, round_trip_seconds=args.llm_ms / 1000)
+                if name == "react":
+                    agent = ReActAgent.from_tools(tools, llm=llm)
+                else:
+                    agent = ParallelToolAgent.from_tools(tools, llm=llm)
+                seconds, first_token = await ask(agent)
+                latencies.append(seconds * 1000)
+                first_tokens.append(first_token * 1000)
+                round_trips += llm.round_trips
+            print(
+                f"{scenario:>11} {name:>9} {percentile(latencies, 50):>8.0f} {percentile(first_tokens, 50):>15.0f} "
+                f"{round_trips / args.repeats:>16.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-ms", type=float, default=500)
+    parser.add_argument("--search-ms", type=float, default=800)
+    parser.add_argument("--web-ms", type=float, default=1200)
+    parser.add_argument("--slow-web-ms", type=float, default=10000)
+    parser.add_argument("--timeout-ms", type=float, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
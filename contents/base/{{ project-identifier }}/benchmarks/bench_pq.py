@@ -0,0 +1,83 @@
+"""
+Bytes per vector, load time, recall@k and latency of product-quantized search against float32 exact search.
+
+Runs on the binary vector store of a built index when `--index-path` points to one (queries are a sample
+of the stored embeddings themselves), or on synthetic clustered embeddings otherwise.
+
+Usage:
+    poetry run python -m benchmarks.bench_pq --index-path <project>/data/indices
+    poetry run python -m benchmarks.bench_pq --nodes 50000 --dim 1536 --subspaces 96
+"""
+
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.bench_ann import clustered_embeddings, recall_at_k
+from benchmarks.common import Stopwatch, percentile
+from {{ project_identifier }}.core.quantization import PQSearcher, ProductQuantizer
+from {{ project_identifier }}.core.search import DenseSearcher
+from {{ project_identifier }}.core.vector_store import MemmapVectorStore
+
+
+def evaluate(searcher, queries, exact_positions, top_k: int):
+    positions, latencies = [], []
+    for query in queries:
+        with Stopwatch() as stopwatch:
+            _, row_positions = searcher.search(query, top_k)
+        positions.append(row_positions)
+        latencies.append(stopwatch.seconds * 1000)
+    return recall_at_k(exact_positions, positions), percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-path", help="Directory of a binary vector store written by index_data.py")
+    parser.add_argument("--nodes", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--subspaces", type=int, default=96)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 20, 50])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.index_path:
+        vectors = np.asarray(MemmapVectorStore.from_persist_dir(args.index_path).vectors)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+        queries = queries + 0.01 * rng.standard_normal(queries.shape, dtype=np.float32)
+    else:
+        corpus = clustered_embeddings(args.nodes + args.queries, args.dim, num_topics=500)
+        vectors, queries = corpus[: args.nodes], corpus[args.nodes :]
+
+    with Stopwatch() as training:
+        quantizer = ProductQuantizer.train(vectors, num_subspaces=args.subspaces)
+        codes = quantizer.encode(vectors)
+    print(f"Trained {args.subspaces} subspace codebooks on {len(vectors)} vectors in {training.seconds:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(f"{tmp}/vectors.npy", vectors)
+        quantizer.save(tmp, codes)
+        with Stopwatch() as float_load:
+            np.load(f"{tmp}/vectors.npy")
+        with Stopwatch() as pq_load:
+            ProductQuantizer.load(tmp)
+
+    exact = DenseSearcher(vectors, normalized=True)
+    exact_positions = [exact.search(query, args.top_k)[1] for query in queries]
+    _, exact_p50 = evaluate(exact, queries, exact_positions, args.top_k)
+
+    print(f"{'search':>14} {'bytes/vector':>13} {'load ms':>9} {'recall@' + str(args.top_k):>9} {'p50 ms':>8}")
+    print(f"{'float32':>14} {vectors.shape[1] * 4:>13} {float_load.seconds * 1000:>9.2f} {1.0:>9.3f} {exact_p50:>8.3f}")
+    for rerank in args.rerank:
+        searcher = PQSearcher(quantizer, codes, vectors, rerank=rerank)
+        recall, p50 = evaluate(searcher, queries, exact_positions, args.top_k)
+        print(
+            f"{'pq rerank=' + str(rerank):>14} {codes.shape[1]:>13} {pq_load.seconds * 1000:>9.2f} "
+            f"{recall:>9.3f} {p50:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Time and peak allocations of turning source nodes into references (`process_response_metadata_list`)
+for 10k synthetic `NodeWithScore`, one per page of 500 PDFs, every fifth page without an image.
+
+"former" is the previous implementation, kept here as the baseline: `re.findall` per node, an INFO log
+line per missing image and text concatenated with `+=`. "current, absolute" runs the current code on
+nodes indexed before relative paths were stored, which falls back to precompiled patterns. "current,
+relative" runs it on nodes with the relative paths written by `scripts/index_data.py`. Logs go to a
+discarding sink, so their formatting is measured but not printed.
+
+Usage:
+    poetry run python -m benchmarks.bench_reference_metadata --nodes 10000
+"""
+
+import argparse
+import re
+import tracemalloc
+from collections import defaultdict
+
+from loguru import logger
+
+from llama_index.core.schema import NodeWithScore
+
+from benchmarks.common import Stopwatch, percentile, synthetic_nodes
+from {{ project_identifier }}.utils.common import (
+    DOCUMENT_RELATIVE_PATH_KEY,
+    IMAGE_RELATIVE_PATH_KEY,
+    process_response_metadata_list,
+)
+
+
+def former_process_response_metadata_list(response_metadata_list):
+    all_documents = defaultdict(
+        lambda: {
+            "type": "Pdf",
+            "path": None,
+            "name": None,
+            "display": "inline",
+            "page_numbers": set(),
+            "text": "",
+            "score": None,
+            "images": [],
+        }
+    )
+    for response_meta in response_metadata_list:
+        metadata = response_meta.node.metadata
+        try:
+            image_path = f"./data/images/{re.findall(r'.*/data/images/(.*)', metadata.get('image_path', ''))[0]}"
+        except (IndexError, AttributeError):
+            logger.info("No valid image path found.")
+            image_path = None
+        try:
+            pattern = r".*/data/documents/(.*)"
+            document_path = f"./data/documents/{re.findall(pattern, metadata.get('source_file_path', ''))[0]}"
+        except (IndexError, AttributeError):
+            logger.info(f"No source document path match for {metadata.get('source_file_path', None)}.")
+            document_path = None
+        page_number = str(metadata.get("page_num", "Unknown"))
+        parsed_text = metadata.get("parsed_text_markdown", "No parsed text found.")
+        score = response_meta.score
+        if document_path:
+            document = all_documents[document_path]
+            document["path"] = document_path
+            document["name"] = f"pdf{len(all_documents)}"
+            document["page_numbers"].add(page_number)
+            document["text"] += parsed_text + "\n\n"
+            document["score"] = score if document["score"] is None else max(document["score"], score)
+            if image_path:
+                document["images"].append(
+                    {
+                        "type": "Image",
+                        "path": image_path,
+                        "name": f"image{len(document['images']) + 1}",
+                        "display": "inline",
+                        "page_num": page_number,
+                        "score": score,
+                    }
+                )
+    for document in all_documents.values():
+        document["page_numbers"] = sorted(document["page_numbers"])
+    return list(all_documents.values())
+
+
+def measure(process, hits, repeats: int):
+    latencies = []
+    for _ in range(repeats):
+        with Stopwatch() as stopwatch:
+            process(hits)
+        latencies.append(stopwatch.seconds * 1000)
+    tracemalloc.start()
+    process(hits)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return percentile(latencies, 50), peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+
+    relative_hits, absolute_hits = [], []
+    for position, node in enumerate(synthetic_nodes(args.nodes, words_per_node=50)):
+        if position % 5 == 4:
+            for key in ("image_path", IMAGE_RELATIVE_PATH_KEY):
+                node.metadata.pop(key)
+        relative_hits.append(NodeWithScore(node=node, score=1.0 - position / args.nodes))
+        absolute_node = node.model_copy(deep=True)
+        absolute_node.metadata.pop(DOCUMENT_RELATIVE_PATH_KEY)
+        absolute_node.metadata.pop(IMAGE_RELATIVE_PATH_KEY, None)
+        absolute_hits.append(NodeWithScore(node=absolute_node, score=1.0 - position / args.nodes))
+
+    print(f"{'implementation':>18} {'nodes':>7} {'p50 ms':>8} {'peak alloc KB':>14}")
+    for name, process, hits in (
+        ("former", former_process_response_metadata_list, absolute_hits),
+        ("current, absolute", process_response_metadata_list, absolute_hits),
+        ("current, relative", process_response_metadata_list, relative_hits),
+    ):
+        p50_ms, peak_kb = measure(process, hits, args.repeats)
+        print(f"{name:>18} {len(hits):>7} {p50_ms:>8.2f} {peak_kb:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
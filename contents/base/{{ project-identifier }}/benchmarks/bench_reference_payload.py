@@ -0,0 +1,71 @@
+"""
+Bytes the browser downloads for the references of a response, over the nodes and images shipped in
+`data/`.
+
+Responses are random sets of `--top-k` nodes of the shipped docstore. "before" is the former message: every
+PDF and page image uploaded in full as inline elements. "after" is the current message: inline thumbnails,
+with documents and full size images only downloaded when clicked ("after, all opened" counts them too).
+Thumbnails are rendered into a temporary folder.
+
+Usage:
+    poetry run python -m benchmarks.bench_reference_payload --responses 200
+"""
+
+import argparse
+import random
+import tempfile
+
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from benchmarks.common import Stopwatch, percentile
+from {{ project_identifier }}.core.index_registry import INDEX_PATH
+from {{ project_identifier }}.core.reference_assets import ThumbnailCache, resolve_asset_path
+from {{ project_identifier }}.utils.common import process_response_metadata_list
+
+
+def file_size(folder: str, path: str) -> int:
+    asset_path = resolve_asset_path(folder, path.split(f"/data/{folder}/", 1)[-1])
+    return asset_path.stat().st_size if asset_path is not None and asset_path.is_file() else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    nodes = list(SimpleDocumentStore.from_persist_dir(INDEX_PATH).docs.values())
+    rng = random.Random(0)
+    payloads = {"before": [], "after": [], "after, all opened": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        thumbnails = ThumbnailCache(tmp)
+        with Stopwatch() as stopwatch:
+            for _ in range(args.responses):
+                hits = [NodeWithScore(node=node, score=1.0) for node in rng.sample(nodes, args.top_k)]
+                documents = process_response_metadata_list(hits)
+                pdf_bytes = sum(file_size("documents", document.path) for document in documents)
+                images = [image for document in documents for image in document.images]
+                image_bytes = sum(file_size("images", image.path) for image in images)
+                thumbnail_bytes = 0
+                for image in images:
+                    image_path = resolve_asset_path("images", image.path.split("/data/images/", 1)[-1])
+                    if image_path is not None and image_path.is_file():
+                        thumbnail_bytes += thumbnails.get(image_path).stat().st_size
+                payloads["before"].append(pdf_bytes + image_bytes)
+                payloads["after"].append(thumbnail_bytes)
+                payloads["after, all opened"].append(thumbnail_bytes + pdf_bytes + image_bytes)
+
+    print(f"{len(nodes)} nodes, {args.responses} responses of {args.top_k} nodes, {thumbnails.renders} thumbnails "
+          f"rendered in {stopwatch.seconds:.2f}s")
+    print(f"{'references':>18} {'mean KB':>9} {'p50 KB':>8} {'p95 KB':>8} {'max KB':>8}")
+    for name, sizes in payloads.items():
+        sizes_kb = [size / 1024 for size in sizes]
+        print(
+            f"{name:>18} {sum(sizes_kb) / len(sizes_kb):>9.0f} {percentile(sizes_kb, 50):>8.0f} "
+            f"{percentile(sizes_kb, 95):>8.0f} {max(sizes_kb):>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Prompt tokens, retrieval quality and latency of re-ranking many candidates down to a few, over the shipped
+documents and on synthetic pages.
+
+Shipped documents: the first stage is BM25 (the shipped index carries no embeddings), the queries and
+relevant pages are those of `benchmarks/retrieval_eval.jsonl`. "top 5" passes the first five candidates to
+the LLM as before, "top 3" simply truncates, "reranked" re-ranks the top `--candidates` and keeps three.
+Prompt tokens are those of the nodes passed to the LLM, as the query engine formats them.
+
+Synthetic pages: latency of re-ranking `--candidates` nodes, with cold and warm feature caches, and how many
+requests each latency budget lets through, starting from a cold cache.
+
+Usage:
+    poetry run python -m benchmarks.bench_rerank --candidates 50
+"""
+
+import argparse
+import json
+
+from loguru import logger
+
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from benchmarks.common import Stopwatch, percentile, synthetic_nodes
+from benchmarks.eval_retrieval import EVAL_PATH, evaluate, page_key
+from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text
+from {{ project_identifier }}.core.index_registry import INDEX_PATH
+from {{ project_identifier }}.core.rerank import LexicalReranker
+
+
+def shipped_documents(num_candidates: int, top_n: int):
+    with open(EVAL_PATH) as eval_file:
+        examples = [json.loads(line) for line in eval_file if line.strip()]
+    labels = [
+        {(relevant["file"], page) for relevant in example["relevant"] for page in relevant["pages"]}
+        for example in examples
+    ]
+    nodes = list(SimpleDocumentStore.from_persist_dir(INDEX_PATH).docs.values())
+    bm25 = BM25Index.build(lexical_text(node) for node in nodes)
+    reranker = LexicalReranker(top_n=top_n, budget_ms=1000)
+
+    results = {"top 5": [], f"top {top_n}": [], "reranked": []}
+    latencies = []
+    for example in examples:
+        scores, positions = bm25.search(example["query"], num_candidates)
+        hits = [NodeWithScore(node=nodes[position], score=float(score)) for score, position in zip(scores, positions)]
+        results["top 5"].append(hits[:5])
+        results[f"top {top_n}"].append(hits[:top_n])
+        with Stopwatch() as stopwatch:
+            results["reranked"].append(reranker.postprocess_nodes(hits, QueryBundle(example["query"])))
+        latencies.append(stopwatch.seconds * 1000)
+
+    print(f"{len(examples)} labelled queries over {len(nodes)} shipped nodes, BM25 top {num_candidates} candidates")
+    print(f"{'passed to the LLM':>18} {f'hit@{top_n}':>7} {'MRR':>6} {'mean prompt tokens':>19}")
+    for name, passed in results.items():
+        metrics = evaluate([[page_key(hit.node) for hit in kept] for kept in passed], labels, top_n)
+        tokens = [sum(reranker._node_features(hit.node).tokens for hit in kept) for kept in passed]
+        print(f"{name:>18} {metrics[f'hit@{top_n}']:>7.2f} {metrics['MRR']:>6.2f} {sum(tokens) / len(tokens):>19.0f}")
+    print(f"Re-ranking p50 {percentile(latencies, 50):.2f} ms, p99 {percentile(latencies, 99):.2f} ms (cold cache)")
+    print(f"Re-ranker stats: {reranker.stats()}")
+
+
+def synthetic(num_candidates: int, top_n: int, requests: int, budgets):
+    nodes = synthetic_nodes(num_candidates * requests, words_per_node=400)
+    query = QueryBundle("ammonia calibration in hydrogen fuel cell samples")
+    print(f"\nSynthetic: {requests} requests of {num_candidates} candidates of 400 words")
+    print(f"{'features':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    reranker = LexicalReranker(top_n=top_n, budget_ms=1e6, cache_size=len(nodes))
+    batches = [
+        [NodeWithScore(node=node, score=1.0) for node in nodes[start : start + num_candidates]]
+        for start in range(0, len(nodes), num_candidates)
+    ]
+    for name in ("cold", "warm"):
+        latencies = []
+        for batch in batches:
+            with Stopwatch() as stopwatch:
+                reranker.postprocess_nodes(batch, query)
+            latencies.append(stopwatch.seconds * 1000)
+        print(f"{name:>9} {percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f}")
+
+    print(f"{'budget ms':>9} {'reranked':>9} {'skipped':>8} {'over budget':>12}")
+    for budget_ms in budgets:
+        reranker = LexicalReranker(top_n=top_n, budget_ms=budget_ms, cache_size=len(nodes))
+        for batch in batches:
+            reranker.postprocess_nodes(batch, query)
+        stats = reranker.stats()
+        print(f"{budget_ms:>9} {stats['reranked']:>9} {stats['skipped']:>8} {stats['over_budget']:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--budgets", type=float, nargs="+", default=[1, 5, 30])
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+
+    shipped_documents(args.candidates, args.top_n)
+    synthetic(args.candidates, args.top_n, args.requests, args.budgets)
+
+
+if __name__ == "__main__":
+    main()
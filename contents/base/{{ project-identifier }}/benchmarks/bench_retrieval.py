@@ -0,0 +1,69 @@
+"""
+Micro-benchmark of top-k retrieval latency on synthetic corpora from 1k to 1M nodes.
+
+Compares llama-index's per-node scoring loop (used by the default in-memory vector store) with the
+vectorized `DenseSearcher`, for single queries and for batches of queries. The loop baseline is only run
+up to `--baseline-max-nodes` because it is too slow beyond that.
+
+Usage:
+    poetry run python -m benchmarks.bench_retrieval --nodes 1000 10000 100000 1000000 --dim 256
+"""
+
+import argparse
+
+import numpy as np
+
+from llama_index.core.indices.query.embedding_utils import get_top_k_embeddings
+
+from benchmarks.common import Stopwatch, percentile, synthetic_embeddings
+from {{ project_identifier }}.core.search import DenseSearcher
+
+
+def time_queries(search, queries, repeats: int):
+    latencies = []
+    for position in range(repeats):
+        with Stopwatch() as stopwatch:
+            search(queries[position % len(queries)])
+        latencies.append(stopwatch.seconds * 1000)
+    return latencies
+
+
+def report(num_nodes: int, name: str, latencies_ms):
+    print(f"{num_nodes:>9} {name:>16} {percentile(latencies_ms, 50):>10.3f} {percentile(latencies_ms, 99):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=256, help="Use 1536 to match text-embedding-3-small")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--baseline-max-nodes", type=int, default=100000)
+    args = parser.parse_args()
+
+    queries = synthetic_embeddings(max(args.repeats, args.batch_size), args.dim, seed=1)
+
+    print(f"{'nodes':>9} {'engine':>16} {'p50 ms':>10} {'p99 ms':>10}")
+    for num_nodes in args.nodes:
+        vectors = synthetic_embeddings(num_nodes, args.dim)
+        searcher = DenseSearcher(vectors, normalized=True)
+
+        if num_nodes <= args.baseline_max_nodes:
+            vector_list = vectors.tolist()
+
+            def loop_search(query):
+                return get_top_k_embeddings(query.tolist(), vector_list, similarity_top_k=args.top_k)
+
+            repeats = max(3, min(args.repeats, 1000000 // num_nodes))
+            report(num_nodes, "python loop", time_queries(loop_search, queries, repeats))
+
+        report(num_nodes, "numpy", time_queries(lambda q: searcher.search(q, args.top_k), queries, args.repeats))
+
+        batch = queries[: args.batch_size]
+        batch_latencies = time_queries(lambda _: searcher.search_batch(batch, args.top_k), [None], args.repeats)
+        report(num_nodes, f"numpy batch/{args.batch_size}", np.asarray(batch_latencies) / args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
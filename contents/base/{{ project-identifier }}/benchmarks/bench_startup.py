@@ -0,0 +1,67 @@
+"""
+Measures process start-up cost of loading the index once per call site (the former behaviour of `main.py`
+and `core/core.py`) against the shared `IndexRegistry`.
+
+Usage:
+    poetry run python -m benchmarks.bench_startup --nodes 1000 --format json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from llama_index.core import MockEmbedding
+
+from benchmarks.bench_index_load import build_stores
+from benchmarks.common import Stopwatch, current_rss_mb
+
+
+def start_in_child(mode: str, path: str, dim: int):
+    from {{ project_identifier }}.core.index_registry import IndexRegistry
+    from {{ project_identifier }}.core.vector_store import load_vector_index
+
+    def loader(index_path):
+        return load_vector_index(index_path, embed_model=MockEmbedding(embed_dim=dim))
+
+    rss_before = current_rss_mb()
+    with Stopwatch() as stopwatch:
+        if mode == "per-module":
+            main_index = loader(path)  # noqa: F841
+            core_index = loader(path)  # noqa: F841
+        else:
+            registry = IndexRegistry(path, loader=loader)
+            main_index = registry.get()  # noqa: F841
+            core_index = registry.get()  # noqa: F841
+    print(json.dumps({"startup_seconds": stopwatch.seconds, "rss_delta_mb": current_rss_mb() - rss_before}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument("--child", choices=["per-module", "registry"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        start_in_child(args.child, args.path, args.dim)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir, binary_dir = build_stores(args.nodes, args.dim, Path(tmp))
+        path = json_dir if args.format == "json" else binary_dir
+        print(f"{args.nodes} nodes, {args.format} store")
+        print(f"{'mode':>12} {'startup s':>10} {'RSS MB':>9}")
+        for mode in ("per-module", "registry"):
+            command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, "--dim", str(args.dim)]
+            output = subprocess.run(command + ["--path", str(path)], check=True, capture_output=True, text=True)
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{mode:>12} {result['startup_seconds']:>10.3f} {result['rss_delta_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Time to first token and tokens/sec of the chat message handler at increasing numbers of concurrent
+sessions, with a local fake LLM.
+
+"sync" is the former handler: `stream_chat` in a worker thread (`cl.make_async` is `asyncer.asyncify`), then
+the synchronous `response_gen` iterated on the event loop. "async" is the current handler: `astream_chat`
+and `async_response_gen`. Sessions arrive `--arrival-ms` apart. "loop stall" is the longest time the event
+loop could not run a 1 ms heartbeat.
+
+Usage:
+    poetry run python -m benchmarks.bench_streaming --sessions 1 10 100
+"""
+
+import argparse
+import asyncio
+import time
+
+from asyncer import asyncify
+from llama_index.core.agent import ReActAgent
+
+from benchmarks.common import percentile
+from benchmarks.fakes import FakeStreamingLLM
+
+
+async def stream_token(token: str):
+    # Stands in for `cl.Message.stream_token`, which awaits a websocket emit
+    await asyncio.sleep(0)
+
+
+async def handle_sync(agent: ReActAgent, message: str):
+    res = await asyncify(agent.stream_chat)(message)
+    for token in res.response_gen:
+        yield token
+
+
+async def handle_async(agent: ReActAgent, message: str):
+    res = await agent.astream_chat(message)
+    async for token in res.async_response_gen():
+        yield token
+
+
+async def run_session(handler, llm, delay: float) -> dict:
+    await asyncio.sleep(delay)
+    agent = ReActAgent.from_tools([], llm=llm)
+    started = time.perf_counter()
+    first_token_at, num_tokens = None, 0
+    async for token in handler(agent, "What are some of the methods for methane gas?"):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        num_tokens += 1
+        await stream_token(token)
+    finished = time.perf_counter()
+    return {
+        "ttft": first_token_at - started,
+        "tokens_per_second": num_tokens / max(finished - first_token_at, 1e-9),
+        "tokens": num_tokens,
+    }
+
+
+async def heartbeat(stalls: list, stop: asyncio.Event):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - before - 0.001)
+
+
+async def run(handler, llm, num_sessions: int, arrival_seconds: float) -> dict:
+    stalls, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(stalls, stop))
+    started = time.perf_counter()
+    sessions = await asyncio.gather(
+        *[run_session(handler, llm, position * arrival_seconds) for position in range(num_sessions)]
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    ttfts = [session["ttft"] * 1000 for session in sessions]
+    return {
+        "ttft_p50_ms": percentile(ttfts, 50),
+        "ttft_p95_ms": percentile(ttfts, 95),
+        "session_tokens_per_second": percentile([session["tokens_per_second"] for session in sessions], 50),
+        "total_tokens_per_second": sum(session["tokens"] for session in sessions) / elapsed,
+        "max_loop_stall_ms": max(stalls, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=10)
+    parser.add_argument("--arrival-ms", type=float, default=5, help="Delay between session arrivals")
+    args = parser.parse_args()
+
+    llm = FakeStreamingLLM(
+        num_tokens=args.tokens, first_token_seconds=args.first_token_ms / 1000, token_seconds=args.token_ms / 1000
+    )
+    print(
+        f"{'handler':>8} {'sessions':>9} {'TTFT p50 ms':>12} {'TTFT p95 ms':>12} {'tok/s/session':>14} "
+        f"{'tok/s total':>12} {'loop stall ms':>14}"
+    )
+    for num_sessions in args.sessions:
+        for name, handler in (("sync", handle_sync), ("async", handle_async)):
+            result = asyncio.run(run(handler, llm, num_sessions, args.arrival_ms / 1000))
+            print(
+                f"{name:>8} {num_sessions:>9} {result['ttft_p50_ms']:>12.0f} {result['ttft_p95_ms']:>12.0f} "
+                f"{result['session_tokens_per_second']:>14.1f} {result['total_tokens_per_second']:>12.1f} "
+                f"{result['max_loop_stall_ms']:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Chat turns per second and memory per worker of the pre-forked server of `serve.py`, for 1 to 4 workers, offline.
+
+Every configuration runs in a new interpreter, which imports `main.py` with the fake clients of `bench_e2e` over
+a synthetic index of `--nodes` pages with its BM25 index, then forks the workers with `serve.prefork`. With
+`preload`, the parent loads the index and its searchers before forking, as `serve.py` does. With `per-worker`,
+every worker loads them after the fork. Each worker runs `--sessions` concurrent sessions of `--turns` turns
+through the chainlit handlers. The fakes answer without latency by default, so turns are bound by the CPU.
+
+Turns/s is the sum over the workers, from the first worker start to the last worker finish. The memory of every
+worker is read from `/proc/<pid>/smaps_rollup` while all workers are still running: RSS counts the pages shared
+with the parent and the other workers in full, PSS divides them between the processes sharing them, private
+pages are the own copy of a worker. "total PSS" adds the PSS of the workers and of the parent, the memory of
+the whole pod. Adding workers only helps up to the number of CPUs, which is printed.
+
+Usage:
+    poetry run python -m benchmarks.bench_workers --workers 1 2 3 4 --nodes 20000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from llama_index.core import Settings
+
+from benchmarks.bench_e2e import Fakes, questions, run_session
+from benchmarks.common import synthetic_embeddings, synthetic_nodes
+from {{ project_identifier }}.utils.chat_profiles import CHAT_PROFILES
+
+# Fields of /proc/<pid>/smaps_rollup, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def build_index(path: str, num_nodes: int):
+    from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text
+    from {{ project_identifier }}.core.vector_store import write_binary_store
+
+    nodes = synthetic_nodes(num_nodes)
+    manifest = write_binary_store(nodes, synthetic_embeddings(num_nodes), path)
+    BM25Index.build(lexical_text(node) for node in nodes).save(path, build_id=manifest["build_id"])
+
+
+def memory_mb(pid="self") -> dict:
+    """RSS, PSS, shared and private memory of a process in MB, empty where /proc/<pid>/smaps_rollup is missing."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            lines = rollup.read().splitlines()
+    except OSError:
+        return {}
+    fields = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in SMAPS_FIELDS:
+            fields[name] = int(value.split()[0]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def wait_for(paths, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while not all(os.path.exists(path) for path in paths) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def write_json(path: str, data: dict):
+    # Renamed into place, waiting processes never read a partial file
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(data, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def run_configuration(args) -> dict:
+    """Runs one worker count and mode in this process and its forked workers."""
+    fakes = Fakes(args)
+
+    from {{ project_identifier }}.core import core
+    from {{ project_identifier }}.core.index_registry import index_registry
+
+    core.OpenAI = fakes.llm
+    core.OpenAIEmbedding = fakes.embed_model
+    core.TavilyToolSpec = fakes.web_tool
+    Settings.embed_model = fakes.embed_model()
+    index_registry.index_path = args.index
+    if args.run_mode == "per-worker":
+        # The index is loaded by every worker after the fork instead
+        index_registry.warm_up = lambda: None
+
+    from {{ project_identifier }} import main as app
+    from {{ project_identifier }}.serve import preload_index, prefork
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    if args.run_mode == "preload":
+        preload_index()
+        gc.freeze()
+
+    results_dir = tempfile.mkdtemp(prefix="bench-workers-")
+    worker_paths = [os.path.join(results_dir, f"worker-{worker}.json") for worker in range(args.run_workers)]
+    parent_path = os.path.join(results_dir, "parent.json")
+
+    def run_worker(worker: int):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        if args.run_mode == "per-worker":
+            preload_index()
+        starters = loop.run_until_complete(app.set_starters())
+        results = {"chat_start": [], "turn": [], "first_token": [], "errors": []}
+        started = time.monotonic()
+        loop.run_until_complete(
+            asyncio.gather(
+                *(
+                    run_session(app, args.profile, list(questions(starters, args, seed=seed)), results)
+                    for seed in range(worker * args.sessions, (worker + 1) * args.sessions)
+                )
+            )
+        )
+        finished = time.monotonic()
+        write_json(
+            worker_paths[worker],
+            {
+                "turns": len(results["turn"]),
+                "errors": results["errors"],
+                "started": started,
+                "finished": finished,
+                "memory_mb": memory_mb(),
+            },
+        )
+        # Memory is read while every process still holds its share of the pages
+        wait_for(worker_paths)
+        if worker == 0:
+            write_json(parent_path, {"memory_mb": memory_mb(os.getppid())})
+        wait_for([parent_path])
+
+    statuses = prefork(args.run_workers, run_worker)
+    workers = []
+    for path in worker_paths:
+        with open(path) as file:
+            workers.append(json.load(file))
+    with open(parent_path) as file:
+        parent = json.load(file)
+    shutil.rmtree(results_dir, ignore_errors=True)
+    seconds = max(worker["finished"] for worker in workers) - min(worker["started"] for worker in workers)
+    turns = sum(worker["turns"] for worker in workers)
+    return {
+        "mode": args.run_mode,
+        "workers": args.run_workers,
+        "exit_statuses": statuses,
+        "turns": turns,
+        "errors": [error for worker in workers for error in worker["errors"]],
+        "seconds": seconds,
+        "throughput_turns_per_second": turns / seconds,
+        "memory_mb": {"workers": [worker["memory_mb"] for worker in workers], "parent": parent["memory_mb"]},
+    }
+
+
+def mean(values) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def report(args, configurations):
+    print(
+        f"{args.nodes} nodes, {args.sessions} sessions x {args.turns} turns per worker, {os.cpu_count()} CPUs, "
+        f"LLM first token {args.llm_first_token_ms:.0f} ms, embedding {args.embedding_ms:.0f} ms, "
+        f"web {args.web_ms:.0f} ms"
+    )
+    print(
+        f"{'mode':>10} {'workers':>7} {'turns/s':>8} {'RSS/worker':>10} {'PSS/worker':>10} {'private/worker':>14} "
+        f"{'total PSS':>9} {'errors':>6}"
+    )
+    for configuration in configurations:
+        memory = configuration["memory_mb"]
+        workers = memory["workers"]
+        if not workers[0]:
+            print(f"{configuration['mode']:>10} {configuration['workers']:>7} (no /proc/<pid>/smaps_rollup)")
+            continue
+        total_pss = sum(worker["pss"] for worker in workers) + memory["parent"]["pss"]
+        print(
+            f"{configuration['mode']:>10} {configuration['workers']:>7} "
+            f"{configuration['throughput_turns_per_second']:>8.1f} "
+            f"{mean([worker['rss'] for worker in workers]):>7.0f} MB "
+            f"{mean([worker['pss'] for worker in workers]):>7.0f} MB "
+            f"{mean([worker['private'] for worker in workers]):>11.0f} MB "
+            f"{total_pss:>6.0f} MB {len(configuration['errors']):>6}"
+        )
+    for error in sorted({error for configuration in configurations for error in configuration["errors"]}):
+        print(f"error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--modes", nargs="+", choices=["preload", "per-worker"], default=["preload", "per-worker"])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions per worker.")
+    parser.add_argument("--turns", type=int, default=3)
+    profiles = [profile["name"] for profile in CHAT_PROFILES.values()]
+    parser.add_argument("--profile", choices=profiles, default=profiles[0])
+    parser.add_argument("--web-share", type=float, default=0.2)
+    parser.add_argument("--llm-first-token-ms", type=float, default=0)
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--embedding-ms", type=float, default=0)
+    parser.add_argument("--web-ms", type=float, default=0)
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    # Set for the interpreter running a single configuration
+    parser.add_argument("--run-workers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    parser.add_argument("--index", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # The OpenAI clients are never called, but are configured on import
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    if args.run_workers:
+        logger.remove()
+        logger.add(lambda message: None, level="INFO")
+        # The agents are verbose
+        with contextlib.redirect_stdout(io.StringIO()):
+            configuration = run_configuration(args)
+        write_json(args.result, configuration)
+        return
+
+    configurations = []
+    with tempfile.TemporaryDirectory() as index_path:
+        build_index(index_path, args.nodes)
+        for mode in args.modes:
+            for num_workers in args.workers:
+                result_path = os.path.join(index_path, f"result-{mode}-{num_workers}.json")
+                subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_workers", *sys.argv[1:]]
+                    + ["--run-workers", str(num_workers), "--run-mode", mode, "--index", index_path]
+                    + ["--result", result_path],
+                    check=True,
+                )
+                with open(result_path) as file:
+                    configurations.append(json.load(file))
+    report(args, configurations)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {"benchmark": "bench_workers", "cpus": os.cpu_count(), "config": vars(args)} | {"runs": configurations},
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
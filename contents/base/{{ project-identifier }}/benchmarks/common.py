@@ -0,0 +1,84 @@
+import random
+import resource
+import time
+
+import numpy as np
+
+from llama_index.core.schema import TextNode
+
+from {{ project_identifier }}.utils.common import DOCUMENT_RELATIVE_PATH_KEY, IMAGE_RELATIVE_PATH_KEY
+from {{ project_identifier }}.utils.common import current_rss_mb  # noqa: F401
+
+WORDS = (
+    "ammonia hydrogen fuel cell chromatography detector calibration methane ethylene propylene pesticide "
+    "column injection sample preparation formaldehyde repeatability analysis nitrogen spectrometry lipid "
+    "matrix recovery retention peak signal baseline carrier gas valve oven temperature pressure flow"
+).split()
+
+SYNTHETIC_EXCLUDED_METADATA_KEYS = [
+    "page_num",
+    "image_path",
+    "source_file_path",
+    "parsed_text_markdown",
+    IMAGE_RELATIVE_PATH_KEY,
+    DOCUMENT_RELATIVE_PATH_KEY,
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(np.asarray(values, dtype=np.float64), q)) if len(values) else 0.0
+
+
+def synthetic_text(rng: random.Random, num_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(num_words))
+
+
+def synthetic_embeddings(num_nodes: int, dim: int = 1536, seed: int = 0) -> np.ndarray:
+    """Random unit-norm float32 embeddings."""
+    vectors = np.random.default_rng(seed).standard_normal((num_nodes, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_nodes(num_nodes: int, words_per_node: int = 400, seed: int = 0):
+    """
+    Builds nodes shaped like the ones produced by `scripts/index_data.py`, one per synthetic PDF page.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    for position in range(num_nodes):
+        text = synthetic_text(rng, words_per_node)
+        file_name = f"synthetic-{position // 20}.pdf"
+        page_num = position % 20 + 1
+        nodes.append(
+            TextNode(
+                text=text,
+                metadata={
+                    "page_num": page_num,
+                    "image_path": f"/app/data/images/{file_name}/img_p{page_num}_1.png",
+                    IMAGE_RELATIVE_PATH_KEY: f"{file_name}/img_p{page_num}_1.png",
+                    "parsed_text_markdown": text,
+                    "source_file_path": f"/app/data/documents/{file_name}",
+                    DOCUMENT_RELATIVE_PATH_KEY: file_name,
+                },
+                excluded_embed_metadata_keys=SYNTHETIC_EXCLUDED_METADATA_KEYS,
+                excluded_llm_metadata_keys=SYNTHETIC_EXCLUDED_METADATA_KEYS,
+            )
+        )
+    return nodes
+
+
+class Stopwatch:
+    """Monotonic wall clock timer."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.start
@@ -0,0 +1,97 @@
+"""
+Retrieval quality of BM25, dense and hybrid search over the nodes shipped in `data/indices`, on the labelled
+queries of `benchmarks/retrieval_eval.jsonl`.
+
+Every query lists the pages that answer it. "hit@k" is the share of queries with a relevant page in the top
+k, "recall@k" the share of relevant pages found, and "MRR" the mean reciprocal rank of the first relevant
+page. The shipped index carries no embeddings, so dense and hybrid search are only evaluated with `--dense`,
+which embeds the nodes and queries with the configured OpenAI embedding model (needs OPENAI_API_KEY).
+
+Usage:
+    poetry run python -m benchmarks.eval_retrieval --top-k 5
+    poetry run python -m benchmarks.eval_retrieval --top-k 5 --dense
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from llama_index.core.schema import MetadataMode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text, reciprocal_rank_fusion
+from {{ project_identifier }}.core.index_registry import INDEX_PATH
+from {{ project_identifier }}.core.search import DenseSearcher
+from {{ project_identifier }}.utils.common import document_relative_path
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "retrieval_eval.jsonl")
+
+
+def page_key(node) -> tuple:
+    return document_relative_path(node.metadata), int(node.metadata.get("page_num", 0))
+
+
+def evaluate(rankings, labels, top_k: int) -> dict:
+    hits, recalls, reciprocal_ranks = [], [], []
+    for ranking, relevant in zip(rankings, labels):
+        found = [rank for rank, page in enumerate(ranking[:top_k], start=1) if page in relevant]
+        hits.append(bool(found))
+        recalls.append(len(found) / len(relevant))
+        reciprocal_ranks.append(1.0 / found[0] if found else 0.0)
+    return {
+        f"hit@{top_k}": float(np.mean(hits)),
+        f"recall@{top_k}": float(np.mean(recalls)),
+        "MRR": float(np.mean(reciprocal_ranks)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--dense", action="store_true", help="Also evaluate dense and hybrid search.")
+    args = parser.parse_args()
+
+    with open(EVAL_PATH) as eval_file:
+        examples = [json.loads(line) for line in eval_file if line.strip()]
+    labels = [
+        {(relevant["file"], page) for relevant in example["relevant"] for page in relevant["pages"]}
+        for example in examples
+    ]
+    queries = [example["query"] for example in examples]
+
+    nodes = list(SimpleDocumentStore.from_persist_dir(INDEX_PATH).docs.values())
+    pages = [page_key(node) for node in nodes]
+    missing = set().union(*labels) - set(pages)
+    if missing:
+        raise ValueError(f"Labelled pages missing from the index: {sorted(missing)}")
+
+    bm25 = BM25Index.build(lexical_text(node) for node in nodes)
+    lexical = [bm25.search(query, args.candidates)[1].tolist() for query in queries]
+    rankings = {"bm25": lexical}
+
+    if args.dense:
+        from {{ project_identifier }}.core.core import get_embed_model
+
+        embed_model = get_embed_model()
+        vectors = embed_model.get_text_embedding_batch([node.get_content(MetadataMode.EMBED) for node in nodes])
+        searcher = DenseSearcher(np.asarray(vectors, dtype=np.float32))
+        query_vectors = np.asarray([embed_model.get_query_embedding(query) for query in queries], dtype=np.float32)
+        dense = [positions.tolist() for positions in searcher.search_batch(query_vectors, args.candidates)[1]]
+        rankings["dense"] = dense
+        rankings["hybrid"] = [reciprocal_rank_fusion([d, b])[1] for d, b in zip(dense, lexical)]
+
+    print(f"{len(queries)} labelled queries over {len(nodes)} nodes")
+    print(f"{'search':>8} {'hit@' + str(args.top_k):>8} {'recall@' + str(args.top_k):>10} {'MRR':>6}")
+    for name, positions in rankings.items():
+        metrics = evaluate([[pages[position] for position in ranking] for ranking in positions], labels, args.top_k)
+        print(
+            f"{name:>8} {metrics[f'hit@{args.top_k}']:>8.2f} {metrics[f'recall@{args.top_k}']:>10.2f} "
+            f"{metrics['MRR']:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+"""
+Local stand-ins for the network services the agent depends on, so benchmarks run offline and are
+repeatable.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.schema import Document
+from llama_index.core.tools import ToolSelection
+from llama_index.core.tools.tool_spec.base import BaseToolSpec
+from llama_index.core.utils import get_tokenizer
+
+REACT_FINAL_ANSWER_PREFIX = "Thought: I can answer without using any more tools.\nAnswer: "
+
+
+class FakeStreamingLLM(CustomLLM):
+    """
+    LLM that streams a fixed ReAct final answer with a configurable time to first token and per-token delay.
+
+    The sync methods sleep with `time.sleep` and the async methods with `asyncio.sleep`, like a network
+    client would block or yield.
+    """
+
+    num_tokens: int = 50
+    first_token_seconds: float = 0.2
+    token_seconds: float = 0.01
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_chat_model=True, model_name="fake-streaming-llm")
+
+    def _deltas(self):
+        yield REACT_FINAL_ANSWER_PREFIX
+        for position in range(self.num_tokens):
+            yield f"token{position} "
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text="".join(self._deltas()))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            text = ""
+            time.sleep(self.first_token_seconds)
+            for delta in self._deltas():
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+                time.sleep(self.token_seconds)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        async def gen() -> CompletionResponseAsyncGen:
+            text = ""
+            await asyncio.sleep(self.first_token_seconds)
+            for delta in self._deltas():
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+                await asyncio.sleep(self.token_seconds)
+
+        return gen()
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        def gen() -> ChatResponseGen:
+            for response in self.stream_complete(""):
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text), delta=response.delta
+                )
+
+        return gen()
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        async def gen() -> ChatResponseAsyncGen:
+            async for response in await self.astream_complete(""):
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text), delta=response.delta
+                )
+
+        return gen()
+
+
+class FakeInstantLLM(CustomLLM):
+    """
+    LLM that answers every prompt instantly with a fixed text, to measure everything but the completion.
+
+    Its context window is that of the OpenAI chat models, so response synthesizers pack prompts as they would
+    in production.
+    """
+
+    answer: str = "answer"
+    context_window: int = 128000
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=self.context_window, num_output=2048, model_name="fake-instant-llm")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text=self.answer)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            yield CompletionResponse(text=self.answer, delta=self.answer)
+
+        return gen()
+
+
+class FakeToolCallingLLM(FunctionCallingLLM):
+    """
+    LLM that makes a fixed plan of tool calls for every question, then answers, each round trip taking
+    `round_trip_seconds`.
+
+    Called with tools by a function calling agent, it requests all remaining calls of the plan at once when
+    parallel tool calls are allowed, otherwise one per round trip. Called by the ReAct agent, which formats
+    the tools into the prompt, it writes one ReAct action per round trip. The answer quotes the outputs of
+    the tools of the current question. Answers stream one word per token, at `tokens_per_second` if set.
+    """
+
+    plan: List[Tuple[str, Dict[str, Any]]] = []
+    round_trip_seconds: float = 0.3
+    tokens_per_second: float = 0.0
+    round_trips: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_chat_model=True, is_function_calling_model=True, model_name="fake-tool-calling-llm")
+
+    def _prepare_chat_with_tools(
+        self,
+        tools,
+        user_msg: Optional[Any] = None,
+        chat_history: Optional[List[ChatMessage]] = None,
+        verbose: bool = False,
+        allow_parallel_tool_calls: bool = False,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        messages = list(chat_history or [])
+        if user_msg is not None:
+            messages.append(ChatMessage(role=MessageRole.USER, content=str(user_msg)))
+        return {"messages": messages, "tools": tools, "parallel": allow_parallel_tool_calls}
+
+    def get_tool_calls_from_response(
+        self, response: ChatResponse, error_on_no_tool_call: bool = True, **kwargs: Any
+    ) -> List[ToolSelection]:
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+    def _plan(self, messages: Sequence[ChatMessage]) -> List[Tuple[str, Dict[str, Any]]]:
+        """The tool calls answering the current question."""
+        return self.plan
+
+    def _answer(self, outputs: List[str]) -> str:
+        return f"Answer from {'; '.join(outputs)}."
+
+    def _generation_seconds(self, message: ChatMessage) -> float:
+        if not self.tokens_per_second or message.additional_kwargs.get("tool_calls"):
+            return 0.0
+        return len((message.content or "").split(" ")) / self.tokens_per_second
+
+    def _reply(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatMessage:
+        self.round_trips += 1
+        plan = self._plan(messages)
+        if "tools" in kwargs:
+            question_start = max(
+                [position for position, message in enumerate(messages) if message.role == MessageRole.USER], default=0
+            )
+            outputs = [message.content for message in messages[question_start:] if message.role == MessageRole.TOOL]
+            remaining = plan[len(outputs) :]
+            if remaining:
+                calls = remaining if kwargs["parallel"] else remaining[:1]
+                tool_calls = [
+                    ToolSelection(tool_id=f"call_{len(outputs) + position}", tool_name=name, tool_kwargs=arguments)
+                    for position, (name, arguments) in enumerate(calls)
+                ]
+                return ChatMessage(role=MessageRole.ASSISTANT, content="", additional_kwargs={"tool_calls": tool_calls})
+            return ChatMessage(role=MessageRole.ASSISTANT, content=self._answer(outputs))
+
+        # ReAct observations are user messages after the question
+        outputs = [
+            message.content[len("Observation: ") :]
+            for message in messages
+            if (message.content or "").startswith("Observation: ")
+        ]
+        if len(outputs) < len(plan):
+            name, arguments = plan[len(outputs)]
+            content = f"Thought: I need to use a tool.\nAction: {name}\nAction Input: {json.dumps(arguments)}"
+        else:
+            content = f"{REACT_FINAL_ANSWER_PREFIX}{self._answer(outputs)}"
+        return ChatMessage(role=MessageRole.ASSISTANT, content=content)
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        message = self._reply(messages, **kwargs)
+        time.sleep(self.round_trip_seconds + self._generation_seconds(message))
+        return ChatResponse(message=message)
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        message = self._reply(messages, **kwargs)
+        await asyncio.sleep(self.round_trip_seconds + self._generation_seconds(message))
+        return ChatResponse(message=message)
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        raise NotImplementedError("FakeToolCallingLLM only streams asynchronously.")
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        async def gen() -> ChatResponseAsyncGen:
+            await asyncio.sleep(self.round_trip_seconds)
+            message = self._reply(messages, **kwargs)
+            if message.additional_kwargs.get("tool_calls"):
+                yield ChatResponse(message=message)
+                return
+            content = ""
+            for word in message.content.split(" "):
+                if content and self.tokens_per_second:
+                    await asyncio.sleep(1 / self.tokens_per_second)
+                delta = word if not content else f" {word}"
+                content += delta
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=delta)
+
+        return gen()
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        raise NotImplementedError("FakeToolCallingLLM is a chat model.")
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        raise NotImplementedError("FakeToolCallingLLM is a chat model.")
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        raise NotImplementedError("FakeToolCallingLLM is a chat model.")
+
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        raise NotImplementedError("FakeToolCallingLLM is a chat model.")
+
+
+class FakeOpenAI(FakeToolCallingLLM):
+    """
+    Stand-in for the `OpenAI` client of `core.py`: takes its arguments and answers like the agent's model would,
+    with a plan that depends on the question.
+
+    Questions mentioning "web" are answered with the Web tool, all others with the Search tool. Prompts outside
+    of an agent, of the query engine or the chat summarizer, are answered right away. Answers are
+    `answer_tokens` words long, streamed after `round_trip_seconds` at `tokens_per_second`.
+
+    Usage:
+    ```
+    core.OpenAI = functools.partial(FakeOpenAI, round_trip_seconds=0.4, tokens_per_second=60)
+    ```
+    """
+
+    model: str = "gpt-4o"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    streaming: bool = True
+    answer_tokens: int = 120
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=128000,
+            num_output=self.max_tokens or 2048,
+            is_chat_model=True,
+            is_function_calling_model=True,
+            model_name=self.model,
+        )
+
+    @staticmethod
+    def _question(messages: Sequence[ChatMessage]) -> str:
+        for message in reversed(messages):
+            content = message.content or ""
+            if message.role == MessageRole.USER and not content.startswith("Observation: "):
+                return content
+        return ""
+
+    def _plan(self, messages: Sequence[ChatMessage]) -> List[Tuple[str, Dict[str, Any]]]:
+        question = self._question(messages)
+        if "web" in question.lower():
+            return [("Web", {"query": question})]
+        return [("Search", {"input": question})]
+
+    def _answer(self, outputs: List[str]) -> str:
+        return " ".join(f"token{position}" for position in range(self.answer_tokens))
+
+    def _reply(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatMessage:
+        # The ReAct agent describes its output format in the prompt, function calling agents pass tools
+        if "tools" in kwargs or any("Action Input:" in (message.content or "") for message in messages):
+            return super()._reply(messages, **kwargs)
+        self.round_trips += 1
+        return ChatMessage(role=MessageRole.ASSISTANT, content=self._answer([]))
+
+
+class FakeOpenAIEmbedding(BaseEmbedding):
+    """
+    Stand-in for the `OpenAIEmbedding` client: every request takes `latency_seconds`, whatever its batch size.
+
+    Embeddings are deterministic unit vectors of the text, with the dimensions of `text-embedding-3-small`.
+    """
+
+    model: str = "text-embedding-3-small"
+    dimensions: int = 1536
+    latency_seconds: float = 0.05
+    requests: int = 0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeOpenAIEmbedding"
+
+    def _embed(self, text: str) -> Embedding:
+        rng = np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little"))
+        vector = rng.standard_normal(self.dimensions).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        self.requests += 1
+        time.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        self.requests += 1
+        await asyncio.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+
+
+class FakeTavilyToolSpec(BaseToolSpec):
+    """
+    Stand-in for the `TavilyToolSpec`: a blocking search, like the Tavily client, taking `latency_seconds` and
+    returning `max_results` documents of `words_per_result` words.
+    """
+
+    spec_functions = ["search"]
+
+    def __init__(
+        self, api_key: Optional[str] = None, latency_seconds: float = 0.8, words_per_result: int = 80
+    ) -> None:
+        self.latency_seconds = latency_seconds
+        self.words_per_result = words_per_result
+        self.searches = 0
+
+    def search(self, query: str, max_results: Optional[int] = 6) -> List[Document]:
+        """
+        Run query through Tavily Search and return metadata.
+
+        Args:
+            query: The query to search for.
+            max_results: The maximum number of results to return.
+
+        Returns:
+            results: A list of dictionaries containing the results:
+                url: The url of the result.
+                content: The content of the result.
+
+        """
+        self.searches += 1
+        time.sleep(self.latency_seconds)
+        text = " ".join(f"word{position}" for position in range(self.words_per_result))
+        return [
+            Document(text=f"{query} {text}", extra_info={"url": f"https://example.com/{number}"})
+            for number in range(max_results)
+        ]
+
+
+class StubOpenAIServer:
+    """
+    Local HTTP server implementing the OpenAI `/v1/embeddings` endpoint with request and token rate limits.
+
+    Limits are enforced over a sliding window of `window_seconds` (60 for real per-minute limits, shorter to
+    keep tests fast). Requests over a limit get a 429 with a `retry-after-ms` header, like the real API.
+    Embeddings are deterministic functions of the text.
+
+    Usage:
+    ```
+    with StubOpenAIServer(requests_per_window=10, tokens_per_window=1000, window_seconds=1) as server:
+        client = openai.OpenAI(base_url=server.base_url, api_key="sk-stub", max_retries=0)
+    ```
+    """
+
+    def __init__(
+        self,
+        requests_per_window: int,
+        tokens_per_window: int,
+        window_seconds: float = 60,
+        dim: int = 8,
+        latency_seconds: float = 0.0,
+    ):
+        self.requests_per_window = requests_per_window
+        self.tokens_per_window = tokens_per_window
+        self.window_seconds = window_seconds
+        self.dim = dim
+        self.latency_seconds = latency_seconds
+        self.served = 0
+        self.rejected = 0
+        self._window = deque()  # (timestamp, tokens) of accepted requests
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def embed(self, text: str) -> np.ndarray:
+        rng = np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little"))
+        return rng.standard_normal(self.dim).astype(np.float32)
+
+    def _admit(self, tokens: int) -> float:
+        """Returns 0 when the request is admitted, otherwise the seconds until it could be."""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= self.window_seconds:
+                self._window.popleft()
+            used_tokens = sum(window_tokens for _, window_tokens in self._window)
+            if len(self._window) >= self.requests_per_window or used_tokens + tokens > self.tokens_per_window:
+                self.rejected += 1
+                return self.window_seconds - (now - self._window[0][0]) if self._window else self.window_seconds
+            self._window.append((now, tokens))
+            self.served += 1
+            return 0.0
+
+    def _handler(self):
+        stub = self
+        tokenizer = get_tokenizer()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+                tokens = sum(len(tokenizer(text)) for text in texts)
+                retry_after = stub._admit(tokens)
+                if retry_after:
+                    error = {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+                    self._send(429, {"error": error}, {"retry-after-ms": str(int(retry_after * 1000) + 1)})
+                    return
+                time.sleep(stub.latency_seconds)
+                data = []
+                for position, text in enumerate(texts):
+                    embedding = stub.embed(text)
+                    if request.get("encoding_format") == "base64":
+                        embedding = base64.b64encode(embedding.tobytes()).decode()
+                    else:
+                        embedding = embedding.tolist()
+                    data.append({"object": "embedding", "index": position, "embedding": embedding})
+                usage = {"prompt_tokens": tokens, "total_tokens": tokens}
+                self._send(200, {"object": "list", "data": data, "model": request["model"], "usage": usage})
+
+        return Handler
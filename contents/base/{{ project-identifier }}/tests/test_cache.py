@@ -0,0 +1,59 @@
+import threading
+import time
+from unittest import TestCase
+
+from {{ project_identifier }}.utils.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_get_or_create_counts_hits_and_misses(self):
+        cache = LRUCache(max_size=4)
+        built = []
+
+        def factory():
+            built.append(object())
+            return built[-1]
+
+        first = cache.get_or_create(("profile", "gpt-4o", 0.1), factory)
+        second = cache.get_or_create(("profile", "gpt-4o", 0.1), factory)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(built), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_get_or_create_only_holds_up_callers_of_the_same_key(self):
+        cache = LRUCache(max_size=4)
+        slow_started = threading.Event()
+        built = []
+
+        def slow_factory():
+            slow_started.set()
+            time.sleep(0.5)
+            built.append("slow")
+            return "slow"
+
+        callers = [threading.Thread(target=cache.get_or_create, args=("slow", slow_factory)) for _ in range(3)]
+        for caller in callers:
+            caller.start()
+        slow_started.wait()
+
+        started = time.perf_counter()
+        self.assertEqual(cache.get_or_create("fast", lambda: "fast"), "fast")
+        self.assertLess(time.perf_counter() - started, 0.1)
+        for caller in callers:
+            caller.join()
+        self.assertEqual(built, ["slow"])
+        self.assertEqual(cache.get("slow"), "slow")
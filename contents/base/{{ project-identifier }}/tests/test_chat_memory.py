@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.storage.chat_store import SimpleChatStore
+
+from benchmarks.fakes import FakeInstantLLM
+from {{ project_identifier }}.core.chat_memory import SQLiteChatStore, SummarizingChatMemory
+
+
+def turn(number: int) -> list:
+    return [
+        ChatMessage(role=MessageRole.USER, content=f"Question {number} about ammonia analysis in hydrogen fuel"),
+        ChatMessage(role=MessageRole.ASSISTANT, content=f"Answer {number}: " + "chromatography detector " * 20),
+    ]
+
+
+class TestSQLiteChatStore(TestCase):
+    def test_messages_survive_a_new_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chat.sqlite")
+            store = SQLiteChatStore(path)
+            store.set_messages("thread-1", turn(1))
+            store.add_message("thread-1", turn(2)[0])
+            store.add_message("thread-2", turn(3)[0])
+            store.close()
+
+            restarted = SQLiteChatStore(path)
+            self.assertEqual(restarted.get_messages("thread-1"), turn(1) + turn(2)[:1])
+            self.assertCountEqual(restarted.get_keys(), ["thread-1", "thread-2"])
+            self.assertEqual(restarted.delete_last_message("thread-1"), turn(2)[0])
+            self.assertEqual(restarted.delete_message("thread-1", 0), turn(1)[0])
+            self.assertEqual(restarted.get_messages("thread-1"), turn(1)[1:])
+            self.assertEqual(restarted.prune(max_age_seconds=0), 2)
+            self.assertEqual(restarted.get_keys(), [])
+
+
+class TestSummarizingChatMemory(TestCase):
+    def test_older_turns_are_rolled_into_a_summary(self):
+        store = SimpleChatStore()
+        memory = SummarizingChatMemory(
+            llm=FakeInstantLLM(answer="The user asked about ammonia."),
+            chat_store=store,
+            chat_store_key="thread-1",
+            token_limit=300,
+            background=False,
+        )
+        memory.put_messages(turn(1))
+        self.assertEqual(memory.get(), turn(1))
+
+        for number in range(2, 10):
+            memory.put_messages(turn(number))
+            history = memory.get()
+            self.assertLessEqual(memory._token_count_for_messages(history), 300)
+
+        stored = store.get_messages("thread-1")
+        self.assertEqual(stored[0].role, MessageRole.SYSTEM)
+        self.assertEqual(stored[0].content, "The user asked about ammonia.")
+        self.assertEqual(stored[1].role, MessageRole.USER)
+        self.assertEqual(stored[-1], turn(9)[1])
+        self.assertEqual(history, stored)
+
+        # A rebuilt agent gets a new memory over the same stored history
+        rebuilt = SummarizingChatMemory(chat_store=store, chat_store_key="thread-1", token_limit=300)
+        self.assertEqual(rebuilt.get(), stored)
+
+    def test_background_summary_does_not_hold_up_the_prompt(self):
+        memory = SummarizingChatMemory(
+            llm=FakeInstantLLM(answer="Summary."), chat_store=SimpleChatStore(), chat_store_key="t", token_limit=200
+        )
+        for number in range(6):
+            memory.put_messages(turn(number))
+
+        history = memory.get()
+        self.assertLessEqual(memory._token_count_for_messages(history), 200)
+        self.assertEqual(history[0].role, MessageRole.USER)
+
+        deadline = time.monotonic() + 5
+        while memory.get_all()[0].role != MessageRole.SYSTEM and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(memory.get_all()[0].content, "Summary.")
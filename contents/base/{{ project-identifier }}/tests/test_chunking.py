@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from llama_index.core.schema import Document, MetadataMode, NodeRelationship
+
+from {{ project_identifier }}.core.context_packer import QUESTIONS_METADATA_KEY
+from {{ project_identifier }}.ingestion.chunking import chunk_page, split_chunks
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+
+EXCLUDED_METADATA_KEYS = ["page_num", "image_path", "parsed_text_markdown"]
+
+
+class TestSplitChunks(TestCase):
+    def test_chunks_follow_headings_and_merge_small_sections(self):
+        text = "# Contents\n# Method\nFirst paragraph.\n\nSecond paragraph.\n# Results\n" + " ".join(["word"] * 60)
+
+        chunks = split_chunks(text, max_tokens=50, min_tokens=10)
+
+        self.assertEqual(
+            chunks[:2],
+            ["# Contents\n\n# Method\n\nFirst paragraph.\n\nSecond paragraph.", "# Results\n\n" + " ".join(["word"] * 60)],
+        )
+
+    def test_large_tables_are_split_by_rows_under_their_header(self):
+        table = "\n".join(["|compound|area|", "|---|---|"] + [f"|compound {i}|{i * 100}|" for i in range(40)])
+
+        chunks = split_chunks(f"# Results\n{table}", max_tokens=60, min_tokens=10)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith("# Results\n\n|compound|area|\n|---|---|\n|compound"))
+            self.assertLessEqual(count_tokens(chunk), 60)
+        rows = [line for chunk in chunks for line in chunk.splitlines()[4:]]
+        self.assertEqual(rows, [f"|compound {i}|{i * 100}|" for i in range(40)])
+
+
+class TestChunkPage(TestCase):
+    def test_chunks_point_back_to_their_page(self):
+        text = "# Method\n" + "Ammonia was calibrated. " * 30 + "\n\n# Results\n" + "Areas were measured. " * 30
+        metadata = {
+            "page_num": 4,
+            "image_path": "/data/images/a.pdf/img_p4_1.png",
+            "parsed_text_markdown": text,
+            QUESTIONS_METADATA_KEY: "1. How was ammonia calibrated?",
+        }
+        page = Document(
+            id_="a.pdf:p4:0123",
+            text=text,
+            metadata=metadata,
+            excluded_embed_metadata_keys=list(EXCLUDED_METADATA_KEYS),
+            excluded_llm_metadata_keys=list(EXCLUDED_METADATA_KEYS),
+        )
+
+        chunks = chunk_page(page, max_tokens=200, min_tokens=20)
+
+        self.assertEqual([chunk.node_id for chunk in chunks], ["a.pdf:p4:0123:c0", "a.pdf:p4:0123:c1"])
+        self.assertTrue(chunks[1].text.startswith("# Results"))
+        for index, chunk in enumerate(chunks):
+            self.assertEqual(chunk.metadata["page_num"], 4)
+            self.assertEqual(chunk.metadata["image_path"], metadata["image_path"])
+            self.assertEqual(chunk.metadata["parent_page_id"], page.node_id)
+            self.assertEqual(chunk.metadata["chunk_index"], index)
+            self.assertEqual(chunk.metadata["parsed_text_markdown"], chunk.text)
+            self.assertEqual(chunk.relationships[NodeRelationship.SOURCE].node_id, page.node_id)
+            self.assertEqual(chunk.get_content(metadata_mode=MetadataMode.EMBED), chunk.text)
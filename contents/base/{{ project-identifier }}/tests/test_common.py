@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from {{ project_identifier }}.utils.common import process_response_metadata_list
+
+
+def hit(file_name: str, page_num: int, score: float, image: bool = True, relative: bool = True) -> NodeWithScore:
+    metadata = {
+        "page_num": page_num,
+        "parsed_text_markdown": f"{file_name} page {page_num}",
+        "source_file_path": f"/build/data/documents/{file_name}",
+    }
+    if image:
+        metadata["image_path"] = f"/build/data/images/{file_name}/img_p{page_num}_1.png"
+    if relative:
+        metadata["source_file_relative_path"] = file_name
+        if image:
+            metadata["image_relative_path"] = f"{file_name}/img_p{page_num}_1.png"
+    return NodeWithScore(node=TextNode(text="", metadata=metadata), score=score)
+
+
+class TestProcessResponseMetadataList(TestCase):
+    def test_documents_are_grouped_and_named_in_order_of_first_hit(self):
+        references = process_response_metadata_list(
+            [
+                hit("a.pdf", 10, 0.9),
+                hit("b.pdf", 1, 0.8, relative=False),
+                hit("a.pdf", 2, 0.7, image=False),
+                hit("a.pdf", 3, 0.5, relative=False),
+            ]
+        )
+
+        self.assertEqual(
+            [(reference.name, reference.path) for reference in references],
+            [("pdf1", "./data/documents/a.pdf"), ("pdf2", "./data/documents/b.pdf")],
+        )
+        first = references[0]
+        self.assertEqual(first.page_numbers, ["2", "3", "10"])
+        self.assertEqual(first.score, 0.9)
+        self.assertEqual(first.text, "a.pdf page 10\n\na.pdf page 2\n\na.pdf page 3\n\n")
+        self.assertEqual(
+            [(image.name, image.path) for image in first.images],
+            [("image1", "./data/images/a.pdf/img_p10_1.png"), ("image2", "./data/images/a.pdf/img_p3_1.png")],
+        )
+        self.assertEqual(references[1].images[0].path, "./data/images/b.pdf/img_p1_1.png")
+
+    def test_nodes_without_a_document_path_are_skipped(self):
+        node = NodeWithScore(node=TextNode(text="", metadata={"source_file_path": "/elsewhere/a.pdf"}), score=1.0)
+
+        self.assertEqual(process_response_metadata_list([node]), [])
+
+    def test_chunks_of_a_page_share_its_reference(self):
+        chunks = [hit("a.pdf", 4, 0.9), hit("a.pdf", 4, 0.8), hit("a.pdf", 2, 0.7)]
+        for index, chunk in zip((1, 0), chunks):
+            chunk.node.metadata.update(chunk_index=index, parsed_text_markdown=f"chunk {index}")
+
+        references = process_response_metadata_list(chunks)
+
+        self.assertEqual(references[0].page_numbers, ["2", "4"])
+        self.assertEqual(references[0].text, "chunk 0\n\nchunk 1\n\na.pdf page 2\n\n")
+        self.assertEqual([image.page_num for image in references[0].images], ["4", "2"])
@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle, TextNode
+
+from {{ project_identifier }}.core.context_packer import QUESTIONS_METADATA_KEY, ContextPacker, split_sections
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+
+FOOTER = "Agilent Technologies shall not be liable for errors contained herein or for incidental damages."
+
+
+def page(*blocks: str) -> NodeWithScore:
+    text = "\n\n".join(blocks)
+    metadata = {"parsed_text_markdown": text, QUESTIONS_METADATA_KEY: "1. What is measured?"}
+    return NodeWithScore(node=TextNode(text=text, metadata=metadata), score=1.0)
+
+
+class TestSplitSections(TestCase):
+    def test_sections_follow_headings_paragraphs_and_tables(self):
+        sections = split_sections(
+            "# Contents\n# Method\nFirst paragraph.\n\nSecond paragraph.\n|a|b|\n|---|---|\n|1|2|\nAfter the table."
+        )
+
+        self.assertEqual(
+            [(section.heading, section.text) for section in sections],
+            [
+                (None, "# Contents"),
+                ("# Method", "First paragraph."),
+                ("# Method", "Second paragraph."),
+                ("# Method", "|a|b|\n|---|---|\n|1|2|"),
+                ("# Method", "After the table."),
+            ],
+        )
+
+
+class TestContextPacker(TestCase):
+    def test_relevant_sections_fill_the_budget(self):
+        table = "\n".join(["|compound|area|", "|---|---|"] + [f"|compound {i}|{i * 100}|" for i in range(60)])
+        nodes = [
+            page("# Results", table, "# Calibration", "Ammonia was calibrated from 10 to 500 ppb.", FOOTER),
+            page("# Introduction", "Fuel cell vehicles need high purity hydrogen.", FOOTER),
+        ]
+        packer = ContextPacker(token_budget=60)
+
+        packed = packer.postprocess_nodes(nodes, QueryBundle("How was ammonia calibrated?"))
+
+        texts = [hit.node.get_content() for hit in packed]
+        self.assertIn("# Calibration\n\nAmmonia was calibrated from 10 to 500 ppb.", texts[0])
+        self.assertNotIn("|compound|area|", texts[0])
+        self.assertEqual(sum(FOOTER in text for text in texts), 1)
+        self.assertLessEqual(sum(count_tokens(text) for text in texts), 60)
+        self.assertEqual(packed[0].node.node_id, nodes[0].node.node_id)
+        self.assertEqual(packed[0].node.metadata, nodes[0].node.metadata)
+        self.assertNotIn("What is measured", packed[0].node.get_content(metadata_mode=MetadataMode.LLM))
+        self.assertEqual(packer.stats()["duplicates_dropped"], 1)
+
+    def test_relevant_rows_of_tables_larger_than_the_budget_are_packed(self):
+        rows = [f"|compound {i}|{i * 10} ppb|{i}%|" for i in range(300)]
+        rows[150] = "|ammonia|4.2 ppb|1.5%|"
+        table = "\n".join(["|compound|LOQ|RSD|", "|---|---|---|"] + rows)
+        nodes = [page("# Results", table), page("# Results", table.replace("ammonia", "nitrogen")), page("See above.")]
+        packer = ContextPacker(token_budget=150)
+        self.assertGreater(count_tokens(table), 10 * packer.token_budget)
+
+        packed = packer.postprocess_nodes(nodes, QueryBundle("What is the LOQ of ammonia?"))
+
+        text = packed[0].node.get_content()
+        self.assertEqual(packed[0].node.node_id, nodes[0].node.node_id)
+        self.assertTrue(text.startswith("# Results\n\n|compound|LOQ|RSD|\n|---|---|---|\n"))
+        self.assertIn("|ammonia|4.2 ppb|1.5%|", text)
+        self.assertLessEqual(sum(count_tokens(hit.node.get_content()) for hit in packed), packer.token_budget)
+
+    def test_the_top_ranked_section_is_kept_even_larger_than_the_budget(self):
+        row = "|ammonia|" + " ".join(["4.2 ppb"] * 40) + "|"
+        nodes = [page("|compound|LOQ|\n|---|---|\n" + row)]
+
+        packed = ContextPacker(token_budget=20).postprocess_nodes(nodes, QueryBundle("ammonia"))
+
+        self.assertIn(row, packed[0].node.get_content())
+
+    def test_pages_without_selected_sections_are_dropped(self):
+        nodes = [page("Ammonia calibration."), page(" ".join(["unrelated"] * 200))]
+
+        packed = ContextPacker(token_budget=20).postprocess_nodes(nodes, QueryBundle("ammonia"))
+
+        self.assertEqual([hit.node.node_id for hit in packed], [nodes[0].node.node_id])
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import tempfile
+import threading
+from typing import List
+from unittest import TestCase, mock
+
+from llama_index.core import MockEmbedding
+
+from {{ project_identifier }}.core.embedding_cache import CachedEmbedding, SQLiteEmbeddingStore
+
+
+class CountingEmbedding(MockEmbedding):
+    """Local fake embedding model that records every text it is asked to embed."""
+
+    calls: List[str] = []
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self.calls.append(query)
+        return [float(len(query))] + [0.5] * (self.embed_dim - 1)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.calls.extend(texts)
+        return [[float(len(text))] + [0.25] * (self.embed_dim - 1) for text in texts]
+
+
+class TestCachedEmbedding(TestCase):
+    def test_repeated_queries_skip_the_model(self):
+        model = CountingEmbedding(embed_dim=4, calls=[])
+        cached = CachedEmbedding(model, path=None)
+
+        first = cached.get_query_embedding("What are some of the methods for methane gas?")
+        second = cached.get_query_embedding("  What are some of the methods\nfor methane gas? ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(model.calls), 1)
+        self.assertEqual(cached.stats()["memory_hits"], 1)
+        self.assertEqual(cached.stats()["hit_rate"], 0.5)
+
+    def test_batch_only_embeds_misses(self):
+        model = CountingEmbedding(embed_dim=4, calls=[])
+        cached = CachedEmbedding(model, path=None)
+
+        cached.get_text_embedding_batch(["a", "b"])
+        embeddings = cached.get_text_embedding_batch(["b", "c", "a"])
+
+        self.assertEqual(model.calls, ["a", "b", "c"])
+        self.assertEqual([embedding[0] for embedding in embeddings], [1.0, 1.0, 1.0])
+
+    def test_disk_tier_survives_a_new_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "embeddings.sqlite")
+            CachedEmbedding(CountingEmbedding(embed_dim=4, calls=[]), path=path).get_query_embedding("hydrogen")
+
+            model = CountingEmbedding(embed_dim=4, calls=[])
+            restarted = CachedEmbedding(model, path=path)
+            self.assertEqual(restarted.get_query_embedding("hydrogen")[0], 8.0)
+            self.assertEqual(model.calls, [])
+            self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+    def test_async_queries_use_the_disk_tier_off_the_event_loop(self):
+        threads = []
+
+        def on_thread(method):
+            def wrapper(*args):
+                threads.append(threading.current_thread())
+                return method(*args)
+
+            return wrapper
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "embeddings.sqlite")
+            get = mock.patch.object(SQLiteEmbeddingStore, "get", on_thread(SQLiteEmbeddingStore.get))
+            put = mock.patch.object(SQLiteEmbeddingStore, "put", on_thread(SQLiteEmbeddingStore.put))
+            with get, put:
+                first = CachedEmbedding(CountingEmbedding(embed_dim=4, calls=[]), path=path)
+                embedding = asyncio.run(first.aget_query_embedding("NH3"))
+                restarted = CachedEmbedding(CountingEmbedding(embed_dim=4, calls=[]), path=path)
+                self.assertEqual(asyncio.run(restarted.aget_query_embedding("NH3")), embedding)
+
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+        # Lookup and insert of the first process, lookup of the second
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
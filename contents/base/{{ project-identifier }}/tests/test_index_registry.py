@@ -0,0 +1,42 @@
+import threading
+from unittest import TestCase
+
+from {{ project_identifier }}.core.index_registry import IndexRegistry
+
+
+class TestIndexRegistry(TestCase):
+    def test_loads_once_for_concurrent_callers(self):
+        calls = []
+        release = threading.Event()
+
+        def loader(index_path):
+            calls.append(index_path)
+            release.wait(timeout=5)
+            return object()
+
+        registry = IndexRegistry("indices", loader=loader)
+        registry.warm_up()
+        self.assertFalse(registry.is_ready())
+
+        results = []
+        callers = [threading.Thread(target=lambda: results.append(registry.get())) for _ in range(4)]
+        for caller in callers:
+            caller.start()
+        release.set()
+        for caller in callers:
+            caller.join(timeout=5)
+
+        self.assertTrue(registry.is_ready())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    def test_failed_load_is_not_ready(self):
+        def loader(index_path):
+            raise FileNotFoundError(index_path)
+
+        registry = IndexRegistry("missing", loader=loader)
+        registry.warm_up().join(timeout=5)
+        self.assertFalse(registry.is_ready())
+        self.assertIsInstance(registry.error, FileNotFoundError)
+        with self.assertRaises(FileNotFoundError):
+            registry.get()
@@ -0,0 +1,95 @@
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase
+
+from {{ project_identifier }}.ingestion.checkpoint import CheckpointStore
+from {{ project_identifier }}.ingestion.manifest import IngestionManifest, file_sha256
+from {{ project_identifier }}.ingestion.pipeline import Pipeline, Stage
+from {{ project_identifier }}.ingestion.scheduler import BatchedEmbedder, RateLimitScheduler
+
+
+class TestIngestionManifest(TestCase):
+    def test_plan_detects_new_changed_unchanged_and_deleted_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            for name in ("kept.pdf", "edited.pdf", "added.pdf"):
+                (tmp / name).write_bytes(name.encode())
+            manifest = IngestionManifest()
+            manifest.record_file("kept.pdf", file_sha256(tmp / "kept.pdf"), ["p1"])
+            manifest.record_file("edited.pdf", "outdated", ["p1", "p2"])
+            manifest.record_file("removed.pdf", "anything", [])
+            manifest.save(tmp)
+
+            plan = IngestionManifest.load(tmp).plan(sorted(tmp.glob("*.pdf")))
+
+            self.assertEqual([path.name for path in plan.new], ["added.pdf"])
+            self.assertEqual([path.name for path in plan.changed], ["edited.pdf"])
+            self.assertEqual([path.name for path in plan.unchanged], ["kept.pdf"])
+            self.assertEqual(plan.deleted, ["removed.pdf"])
+            self.assertEqual(IngestionManifest.load(tmp).page_hashes("edited.pdf"), ["p1", "p2"])
+
+
+class TestPipeline(TestCase):
+    def test_stages_overlap_and_failures_are_dropped(self):
+        second_item_parsed = threading.Event()
+        overlapped = []
+
+        def parse(item):
+            if item == 2:
+                second_item_parsed.set()
+            if item == 3:
+                raise ValueError("corrupt file")
+            return item
+
+        def embed(item):
+            if item == 1:
+                # The first item is only embedded once the next one has been parsed
+                overlapped.append(second_item_parsed.wait(timeout=5))
+            return item * 10
+
+        pipeline = Pipeline([Stage("parse", parse, workers=2), Stage("embed", embed)])
+        results = pipeline.run([1, 2, 3])
+
+        self.assertEqual(sorted(results), [10, 20])
+        self.assertEqual(overlapped, [True])
+        self.assertEqual([(failure.stage, failure.item) for failure in pipeline.failures], [("parse", 3)])
+        self.assertEqual(set(pipeline.busy_seconds), {"parse", "embed"})
+
+
+class TestCheckpointStore(TestCase):
+    def test_interrupted_embedding_resumes_after_the_last_checkpointed_batch(self):
+        texts = [f"page {position}" for position in range(6)]
+        requested, crash = [], threading.Event()
+
+        def embed_batch(batch):
+            if crash.is_set() and len(requested) == 2:
+                raise ValueError("process killed")
+            requested.extend(batch)
+            return [[float(text.split()[1])] for text in batch]
+
+        def run(checkpoints):
+            done = checkpoints.get_vectors(texts)
+            missing = [text for text in texts if text not in done]
+            embedder = BatchedEmbedder(embed_batch, RateLimitScheduler(1000, 100000, max_in_flight=1), max_batch_size=2)
+            embeddings = embedder.embed(missing, on_batch=checkpoints.put_vectors)
+            done.update(zip(missing, embeddings))
+            return [done[text] for text in texts]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoints = CheckpointStore(str(Path(tmp) / "checkpoints" / "ingestion.sqlite"))
+            checkpoints.put("parse", "file-hash", {"pages": [{"md": "page 0"}]})
+            crash.set()
+            with self.assertRaises(ValueError):
+                run(checkpoints)
+            checkpoints.close()
+
+            crash.clear()
+            requested.clear()
+            checkpoints = CheckpointStore(str(Path(tmp) / "checkpoints" / "ingestion.sqlite"))
+            self.assertEqual(checkpoints.get("parse", "file-hash"), {"pages": [{"md": "page 0"}]})
+            self.assertEqual(run(checkpoints), [[float(position)] for position in range(6)])
+            self.assertEqual(requested, texts[2:])
+
+            checkpoints.clear()
+            self.assertEqual(checkpoints.count(), {"embedding": 0})
@@ -0,0 +1,84 @@
+import asyncio
+from unittest import TestCase
+
+from llama_index.core import MockEmbedding, VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.schema import TextNode
+
+from benchmarks.fakes import FakeToolCallingLLM
+from {{ project_identifier }}.core.metrics import (
+    LatencyHistograms,
+    install_event_handler,
+    merge_snapshots,
+    render_metrics,
+    stage_latency,
+)
+
+
+class TestLatencyHistograms(TestCase):
+    def test_renders_cumulative_buckets(self):
+        histograms = LatencyHistograms(
+            "stage_seconds", "Stage duration.", label="stage", buckets=(0.1, 1), values=["a"]
+        )
+        histograms.observe("b", 0.05)
+        histograms.observe("b", 0.5)
+        histograms.observe("b", 5)
+
+        self.assertEqual(histograms.snapshot()["b"]["buckets"], [1, 2, 3])
+        self.assertEqual(
+            histograms.render(),
+            [
+                "# HELP stage_seconds Stage duration.",
+                "# TYPE stage_seconds histogram",
+                'stage_seconds_bucket{stage="a",le="0.1"} 0',
+                'stage_seconds_bucket{stage="a",le="1"} 0',
+                'stage_seconds_bucket{stage="a",le="+Inf"} 0',
+                'stage_seconds_sum{stage="a"} 0.000000',
+                'stage_seconds_count{stage="a"} 0',
+                'stage_seconds_bucket{stage="b",le="0.1"} 1',
+                'stage_seconds_bucket{stage="b",le="1"} 2',
+                'stage_seconds_bucket{stage="b",le="+Inf"} 3',
+                'stage_seconds_sum{stage="b"} 5.550000',
+                'stage_seconds_count{stage="b"} 3',
+            ],
+        )
+
+    def test_renders_snapshots_of_several_processes_added_up(self):
+        histograms = [LatencyHistograms("stage_seconds", "Stage duration.", label="stage", buckets=(1,)) for _ in "ab"]
+        histograms[0].observe("a", 0.5)
+        histograms[1].observe("a", 2)
+        histograms[1].observe("b", 0.5)
+
+        merged = merge_snapshots(histogram.snapshot() for histogram in histograms)
+
+        self.assertEqual(merged["a"], {"count": 2, "sum": 2.5, "buckets": [1, 2]})
+        self.assertEqual(merged["b"], {"count": 1, "sum": 0.5, "buckets": [1, 1]})
+        self.assertIn('stage_seconds_count{stage="a"} 2', histograms[0].render(merged))
+        own_count = stage_latency.snapshot()["turn"]["count"]
+        self.assertIn(
+            'agent_stage_duration_seconds_count{stage="turn"} ' + str(own_count + 3),
+            render_metrics([{"turn": {"count": 3, "sum": 1.5, "buckets": [0] * 14 + [3]}}]),
+        )
+
+
+class TestStageLatencyEventHandler(TestCase):
+    def test_records_retrieval_and_llm_stages(self):
+        install_event_handler()
+        before = {stage: histogram["count"] for stage, histogram in stage_latency.snapshot().items()}
+
+        index = VectorStoreIndex([TextNode(text="ammonia")], embed_model=MockEmbedding(embed_dim=4))
+        index.as_retriever().retrieve("ammonia")
+        llm = FakeToolCallingLLM(round_trip_seconds=0.01)
+
+        async def stream():
+            response = await llm.astream_chat([ChatMessage(role=MessageRole.USER, content="ammonia?")])
+            async for _ in response:
+                pass
+
+        asyncio.run(stream())
+
+        after = {stage: histogram["count"] for stage, histogram in stage_latency.snapshot().items()}
+        for stage in ("retrieval", "llm_first_token", "llm_generation"):
+            self.assertEqual(after[stage] - before[stage], 1, stage)
+        self.assertGreaterEqual(stage_latency.snapshot()["llm_first_token"]["sum"], 0.01)
+        self.assertIn('agent_stage_duration_seconds_count{stage="retrieval"}', render_metrics())
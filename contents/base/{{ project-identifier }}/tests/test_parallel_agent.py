@@ -0,0 +1,96 @@
+import asyncio
+import functools
+import time
+from unittest import IsolatedAsyncioTestCase, mock
+
+from llama_index.core import MockEmbedding, VectorStoreIndex
+from llama_index.core.base.llms.types import MessageRole
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.schema import TextNode
+from llama_index.core.tools import FunctionTool
+
+from benchmarks.fakes import FakeOpenAI, FakeTavilyToolSpec, FakeToolCallingLLM
+from {{ project_identifier }}.core import core
+from {{ project_identifier }}.core.parallel_agent import ParallelToolAgent, TimeoutTool
+
+
+def stub_tool(name: str, seconds: float) -> FunctionTool:
+    async def call(query: str) -> str:
+        await asyncio.sleep(seconds)
+        return f"{name} result"
+
+    return FunctionTool.from_defaults(async_fn=call, name=name, description=f"Stub {name} tool.")
+
+
+async def answer(agent, question: str):
+    response = await agent.astream_chat(question)
+    text = "".join([token async for token in response.async_response_gen()])
+    return response, text
+
+
+class TestParallelToolAgent(IsolatedAsyncioTestCase):
+    async def test_independent_tool_calls_run_concurrently(self):
+        llm = FakeToolCallingLLM(plan=[("Search", {"query": "q"}), ("Web", {"query": "q"})], round_trip_seconds=0)
+        agent = ParallelToolAgent.from_tools([stub_tool("Search", 0.3), stub_tool("Web", 0.3)], llm=llm)
+
+        started = time.perf_counter()
+        response, text = await answer(agent, "What is new?")
+
+        self.assertLess(time.perf_counter() - started, 0.55)
+        # Tool outputs are recorded as the calls complete
+        self.assertIn(text, ["Answer from Search result; Web result.", "Answer from Web result; Search result."])
+        self.assertCountEqual([source.tool_name for source in response.sources], ["Search", "Web"])
+        self.assertEqual(llm.round_trips, 2)
+        messages = agent.memory.get_all()
+        self.assertEqual([message.role for message in messages][-2:], [MessageRole.TOOL, MessageRole.ASSISTANT])
+        self.assertEqual(messages[-1].content, text)
+
+    async def test_a_slow_tool_times_out_without_holding_up_the_answer(self):
+        llm = FakeToolCallingLLM(plan=[("Search", {"query": "q"}), ("Web", {"query": "q"})], round_trip_seconds=0)
+        web_tool = TimeoutTool(stub_tool("Web", 5), timeout_seconds=0.2)
+        agent = ParallelToolAgent.from_tools([TimeoutTool(stub_tool("Search", 0.1)), web_tool], llm=llm)
+
+        started = time.perf_counter()
+        response, text = await answer(agent, "What is new?")
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertIn("Search result", text)
+        self.assertIn("The Web tool did not answer within 0.2 seconds", text)
+        self.assertEqual([source.is_error for source in response.sources], [False, True])
+        self.assertEqual((web_tool.stats()["calls"], web_tool.stats()["timeouts"]), (1, 1))
+
+
+def search_tool(round_trip_seconds: float) -> TimeoutTool:
+    """The Search tool of the agent components, over an in-memory index and an LLM taking `round_trip_seconds`."""
+    embed_model = MockEmbedding(embed_dim=8)
+    index = VectorStoreIndex([TextNode(text="Ammonia is measured by ion chromatography.")], embed_model=embed_model)
+    with (
+        mock.patch.object(core, "OpenAI", functools.partial(FakeOpenAI, round_trip_seconds=round_trip_seconds)),
+        mock.patch.object(core, "TavilyToolSpec", FakeTavilyToolSpec),
+        mock.patch.object(core, "get_embed_model", return_value=embed_model),
+        # Without the chainlit callbacks, which need the context of a chainlit session
+        mock.patch.object(core, "callback_manager", CallbackManager([])),
+        mock.patch.object(core.index_registry, "get", return_value=index),
+    ):
+        components = core.build_agent_components({"name": "Test", "prompt": None}, "gpt-4o", 0.0, "2026-10-18")
+    return next(tool for tool in components["tools"] if tool.metadata.name == "Search")
+
+
+class TestSearchToolTimeout(IsolatedAsyncioTestCase):
+    async def test_answers_within_the_running_event_loop(self):
+        output = await search_tool(round_trip_seconds=0).acall(input="How is ammonia measured?")
+
+        self.assertFalse(output.is_error)
+        self.assertTrue(output.content.startswith("token0 token1"))
+
+    async def test_a_slow_query_engine_llm_is_cancelled(self):
+        tool = search_tool(round_trip_seconds=2)
+        tool.timeout_seconds = 0.3
+
+        started = time.perf_counter()
+        output = await tool.acall(input="How is ammonia measured?")
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertTrue(output.is_error)
+        self.assertIn("The Search tool did not answer within 0.3 seconds", output.content)
+        self.assertEqual(tool.stats()["timeouts"], 1)
@@ -0,0 +1,56 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from {{ project_identifier }}.core.reference_assets import (
+    ThumbnailCache,
+    asset_url,
+    resolve_asset_path,
+    verify_asset_url,
+)
+
+
+class TestThumbnailCache(TestCase):
+    def test_thumbnails_are_rendered_once_per_image_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            Image.new("RGB", (1600, 1200), "red").save(tmp / "page.png")
+            (tmp / "copy.png").write_bytes((tmp / "page.png").read_bytes())
+            thumbnails = ThumbnailCache(str(tmp / "thumbnails"), max_size=200)
+
+            thumbnail_path = thumbnails.get(tmp / "page.png")
+
+            self.assertEqual(thumbnails.get(tmp / "copy.png"), thumbnail_path)
+            self.assertEqual(thumbnails.renders, 1)
+            with Image.open(thumbnail_path) as thumbnail:
+                self.assertEqual(thumbnail.size, (200, 150))
+            self.assertLess(thumbnail_path.stat().st_size, (tmp / "page.png").stat().st_size)
+
+
+class TestAssetPaths(TestCase):
+    def test_urls_map_back_to_paths_inside_the_data_folder(self):
+        url = urlsplit(asset_url("thumbnails", "./data/images/report.pdf/job-img_p0_1.png"))
+
+        self.assertEqual(url.path, "/references/thumbnails/report.pdf/job-img_p0_1.png")
+        self.assertEqual(resolve_asset_path("images", "report.pdf/job-img_p0_1.png").name, "job-img_p0_1.png")
+        self.assertIsNone(resolve_asset_path("images", "../indices/docstore.json"))
+        self.assertIsNone(resolve_asset_path("documents", "/etc/passwd"))
+
+
+class TestAssetUrlSignatures(TestCase):
+    def test_only_signed_unexpired_urls_are_accepted(self):
+        query = parse_qs(urlsplit(asset_url("documents", "./data/documents/report.pdf")).query)
+        expires, signature = int(query["expires"][0]), query["signature"][0]
+
+        self.assertGreater(expires, time.time())
+        self.assertTrue(verify_asset_url("documents", "report.pdf", expires, signature))
+        # Unsigned, as the routes get it without a query
+        self.assertFalse(verify_asset_url("documents", "report.pdf", 0, ""))
+        self.assertFalse(verify_asset_url("documents", "other.pdf", expires, signature))
+        self.assertFalse(verify_asset_url("images", "report.pdf", expires, signature))
+        self.assertFalse(verify_asset_url("documents", "report.pdf", expires + 1, signature))
+        self.assertFalse(verify_asset_url("documents", "report.pdf", int(time.time()) - 1, signature))
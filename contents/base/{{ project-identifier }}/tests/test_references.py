@@ -0,0 +1,89 @@
+import time
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, mock
+
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import NodeWithScore, TextNode
+
+import {{ project_identifier }}.core.core as core
+
+
+class FakeChainlit:
+    """Records when references become visible in the UI instead of emitting them to a chainlit session."""
+
+    def __init__(self):
+        self.events = []
+        self.session = {}
+        self.user_session = SimpleNamespace(get=self.session.get, set=self.session.__setitem__)
+        ui = self
+
+        class Step:
+            def __init__(self, name, type):
+                self.output = ""
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, exc_type, exc_value, traceback):
+                pass
+
+            async def stream_token(self, token):
+                self.output += token
+                ui.events.append((time.perf_counter(), "reference", token))
+
+        class Message:
+            def __init__(self, content, author=None):
+                self.content, self.elements, self.actions = content, [], []
+
+            async def send(self):
+                ui.events.append((time.perf_counter(), "message", self))
+
+        class Action(SimpleNamespace):
+            async def remove(self):
+                pass
+
+        self.Step, self.Message, self.Action = Step, Message, Action
+        self.Pdf = self.Image = SimpleNamespace
+
+
+def source(file_name: str, page_num: int, text: str) -> NodeWithScore:
+    metadata = {"page_num": page_num, "parsed_text_markdown": text, "source_file_relative_path": file_name}
+    return NodeWithScore(node=TextNode(text=text, metadata=metadata), score=0.5)
+
+
+class TestProcessResponseForReferences(IsolatedAsyncioTestCase):
+    async def test_references_are_visible_right_after_the_answer(self):
+        ui = FakeChainlit()
+        response = Response(response="answer", source_nodes=[source(f"{name}.pdf", 1, "text") for name in "abc"])
+
+        with mock.patch.object(core, "cl", ui):
+            answered = time.perf_counter()
+            await core.process_response_for_references(response)
+
+        references = [(at, token) for at, kind, token in ui.events if kind == "reference"]
+        # A header, then each reference as soon as it is resolved
+        self.assertEqual(len(references), 4)
+        self.assertIn("**File:** a.pdf", references[1][1])
+        self.assertLess(references[1][0] - answered, 0.1)
+        self.assertLess(ui.events[-1][0] - answered, 0.1)
+        self.assertEqual(ui.events[-1][1], "message")
+
+    async def test_operator_text_is_paginated(self):
+        ui = FakeChainlit()
+        paragraphs = [f"paragraph {position} " + "x" * 300 for position in range(20)]
+        text = "\n\n".join(paragraphs)
+        response = Response(response="answer", source_nodes=[source("a.pdf", 1, text)])
+
+        with mock.patch.object(core, "cl", ui), mock.patch.object(core, "OPERATOR_TEXT_PAGE_SIZE", 1000):
+            await core.process_response_for_references(response, is_operator=True)
+            messages = [ui.events[-1][2]]
+            while messages[-1].actions:
+                await core.send_next_operator_text_page(messages[-1].actions[0])
+                messages.append(ui.events[-1][2])
+
+        first_page, links = messages[0].content.rsplit("\n\n", 1)
+        pages = [first_page] + [message.content for message in messages[1:]]
+        self.assertEqual(links, "pdf1 (page 1)")
+        self.assertTrue(all(len(page) <= 1000 for page in pages))
+        self.assertEqual("\n\n".join(pages), text)
+        self.assertEqual(messages[0].actions[0].label, f"Show more (2/{len(pages)})")
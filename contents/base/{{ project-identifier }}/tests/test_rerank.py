@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from {{ project_identifier }}.core.rerank import LexicalReranker
+
+
+def candidates():
+    texts = [f"gas chromatography page {position} " * 20 for position in range(10)]
+    texts[7] = "The self-tightening column nut G3440-81013 fits the 5977B source. " * 3
+    return [
+        NodeWithScore(node=TextNode(text=text, metadata={"parsed_text_markdown": text}), score=1.0 - position / 10)
+        for position, text in enumerate(texts)
+    ]
+
+
+class TestLexicalReranker(TestCase):
+    def test_keeps_the_best_matches(self):
+        reranker = LexicalReranker(top_n=3, budget_ms=1000)
+        nodes = candidates()
+
+        kept = reranker.postprocess_nodes(nodes, QueryBundle("Which column nut is G3440-81013?"))
+
+        self.assertEqual(len(kept), 3)
+        self.assertEqual(kept[0].node.node_id, nodes[7].node_id)
+        self.assertEqual([hit.score for hit in kept], sorted((hit.score for hit in kept), reverse=True))
+        stats = reranker.stats()
+        self.assertEqual((stats["requests"], stats["reranked"]), (1, 1))
+        self.assertGreater(stats["prompt_tokens_saved"], 0)
+
+    def test_keeps_the_retrieval_order_over_budget(self):
+        reranker = LexicalReranker(top_n=3, budget_ms=0)
+        nodes = candidates()
+
+        kept = reranker.postprocess_nodes(nodes, QueryBundle("G3440-81013"))
+        self.assertEqual([hit.node.node_id for hit in kept], [hit.node.node_id for hit in nodes[:3]])
+        self.assertEqual(kept[0].score, nodes[0].score)
+
+        # The cost estimate of the abandoned request now skips re-ranking up front
+        reranker.postprocess_nodes(nodes, QueryBundle("G3440-81013"))
+        stats = reranker.stats()
+        self.assertEqual((stats["over_budget"], stats["skipped"], stats["reranked"]), (1, 1, 0))
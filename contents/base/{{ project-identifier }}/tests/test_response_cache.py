@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from {{ project_identifier }}.core.response_cache import SemanticResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSemanticResponseCache(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = SemanticResponseCache(threshold=0.9, ttl=60, max_size=2, clock=self.clock)
+
+    def test_similar_query_hits(self):
+        self.cache.put([1.0, 0.0, 0.0], "answer", namespace="engine", build_id="a", latency_seconds=2.0)
+
+        self.assertEqual(self.cache.lookup([0.98, 0.1, 0.0], namespace="engine", build_id="a"), "answer")
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0], namespace="engine", build_id="a"))
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], namespace="other engine", build_id="a"))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertGreater(stats["latency_saved_seconds"], 1.9)
+
+    def test_expires_and_evicts(self):
+        self.cache.put([1.0, 0.0, 0.0], "first")
+        self.clock.now = 30
+        self.cache.put([0.0, 1.0, 0.0], "second")
+        self.cache.put([0.0, 0.0, 1.0], "third")
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0]))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+        self.clock.now = 100
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0]))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_index_rebuild_invalidates(self):
+        self.cache.put([1.0, 0.0, 0.0], "answer", build_id="a")
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0], build_id="b"))
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
@@ -0,0 +1,180 @@
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from llama_index.core import MockEmbedding
+from llama_index.core.schema import TextNode
+
+from {{ project_identifier }}.core.ann import IVFIndex, IVFSearcher
+from {{ project_identifier }}.core.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from {{ project_identifier }}.core.quantization import PQSearcher, ProductQuantizer
+from {{ project_identifier }}.core.retrieval import HybridRetriever, NumpyRetriever, searcher_for_index
+from {{ project_identifier }}.core.search import DenseSearcher
+from {{ project_identifier }}.core.vector_store import load_vector_index, write_binary_store
+
+
+class TestDenseSearcher(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((200, 16)).astype(np.float32)
+        self.queries = rng.standard_normal((8, 16)).astype(np.float32)
+
+    def test_matches_full_sort(self):
+        searcher = DenseSearcher(self.vectors)
+        scores, positions = searcher.search(self.queries[0], 5)
+
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        expected_scores = normalized @ (self.queries[0] / np.linalg.norm(self.queries[0]))
+        self.assertEqual(positions.tolist(), np.argsort(-expected_scores)[:5].tolist())
+        self.assertTrue(np.allclose(scores, np.sort(expected_scores)[::-1][:5], atol=1e-5))
+
+    def test_batch_matches_single_queries(self):
+        searcher = DenseSearcher(self.vectors)
+        batch_scores, batch_positions = searcher.search_batch(self.queries, 5)
+        for query, row_scores, row_positions in zip(self.queries, batch_scores, batch_positions):
+            scores, positions = searcher.search(query, 5)
+            self.assertEqual(positions.tolist(), row_positions.tolist())
+            self.assertTrue(np.allclose(scores, row_scores))
+
+    def test_top_k_larger_than_corpus(self):
+        scores, positions = DenseSearcher(self.vectors[:3]).search(self.queries[0], 5)
+        self.assertEqual(sorted(positions.tolist()), [0, 1, 2])
+
+
+class TestIVFSearcher(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((500, 16)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.queries = rng.standard_normal((10, 16)).astype(np.float32)
+        self.ivf = IVFIndex.build(self.vectors, num_lists=10)
+
+    def test_every_vector_is_in_one_list(self):
+        self.assertEqual(sorted(np.asarray(self.ivf.list_ids).tolist()), list(range(500)))
+        self.assertEqual(int(self.ivf.list_offsets[-1]), 500)
+
+    def test_probing_all_lists_is_exact(self):
+        exact = DenseSearcher(self.vectors, normalized=True)
+        searcher = IVFSearcher(self.ivf, self.vectors, nprobe=self.ivf.num_lists)
+        for query in self.queries:
+            self.assertEqual(searcher.search(query, 5)[1].tolist(), exact.search(query, 5)[1].tolist())
+
+    def test_index_is_only_used_for_the_store_it_was_built_for(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            nodes = [TextNode(text=f"page {i}") for i in range(len(self.vectors))]
+            manifest = write_binary_store(nodes, self.vectors, tmp)
+            index = load_vector_index(tmp, embed_model=MockEmbedding(embed_dim=16))
+
+            self.ivf.save(tmp, build_id="stale")
+            self.assertIsInstance(searcher_for_index(index, backend="ivf")[0], DenseSearcher)
+
+            self.ivf.save(tmp, build_id=manifest["build_id"])
+            index = load_vector_index(tmp, embed_model=MockEmbedding(embed_dim=16))
+            self.assertIsInstance(searcher_for_index(index, backend="ivf")[0], IVFSearcher)
+
+
+class TestPQSearcher(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((300, 16)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.queries = rng.standard_normal((5, 16)).astype(np.float32)
+        self.quantizer = ProductQuantizer.train(self.vectors, num_subspaces=4, num_centroids=32)
+        self.codes = self.quantizer.encode(self.vectors)
+
+    def test_codes_are_one_byte_per_subspace(self):
+        self.assertEqual(self.codes.shape, (300, 4))
+        self.assertEqual(self.codes.dtype, np.uint8)
+        error = np.linalg.norm(self.quantizer.decode(self.codes) - self.vectors, axis=1).mean()
+        self.assertLess(error, 0.8)
+
+    def test_asymmetric_scores_match_decoded_vectors(self):
+        searcher = PQSearcher(self.quantizer, self.codes)
+        query = self.queries[0] / np.linalg.norm(self.queries[0])
+        approximate = self.quantizer.score(self.quantizer.inner_product_tables(query), searcher.codes_by_subspace)
+        self.assertTrue(np.allclose(approximate[0], self.quantizer.decode(self.codes) @ query, atol=1e-5))
+
+    def test_full_rerank_is_exact(self):
+        exact = DenseSearcher(self.vectors, normalized=True)
+        searcher = PQSearcher(self.quantizer, self.codes, self.vectors, rerank=len(self.vectors))
+        for query in self.queries:
+            self.assertEqual(searcher.search(query, 5)[1].tolist(), exact.search(query, 5)[1].tolist())
+
+
+class TestNumpyRetriever(TestCase):
+    def test_retrieves_from_binary_store(self):
+        embed_model = MockEmbedding(embed_dim=8)
+        nodes = [TextNode(text=f"page {i}") for i in range(3)]
+        embeddings = np.eye(3, 8, dtype=np.float32)
+        embeddings[1] = embed_model.get_query_embedding("anything")
+        with tempfile.TemporaryDirectory() as tmp:
+            write_binary_store(nodes, embeddings, tmp)
+            index = load_vector_index(tmp, embed_model=embed_model)
+            retriever = NumpyRetriever.from_index(index, embed_model=embed_model, similarity_top_k=2)
+
+            results = retriever.retrieve("anything")
+            self.assertEqual(results[0].node.node_id, nodes[1].node_id)
+            self.assertEqual(len(results), 2)
+
+            batch = retriever.retrieve_batch(["anything", "anything else"])
+            self.assertEqual([len(result) for result in batch], [2, 2])
+
+
+class TestBM25Index(TestCase):
+    texts = [
+        "Ammonia analysis in hydrogen fuel, application note 5994-7439en",
+        "Ammonia and formaldehyde in hydrogen for fuel cell vehicles",
+        "Pesticides in black tea by GC/MS/MS",
+        "Acetylene on the CP-Al2O3/KCl column of the 990 Micro GC",
+    ]
+
+    def test_compound_tokens_keep_their_parts(self):
+        self.assertEqual(tokenize("The CP-Al2O3/KCl column"), ["cp-al2o3/kcl", "cp", "al2o3", "kcl", "column"])
+
+    def test_exact_identifier_ranks_first(self):
+        bm25 = BM25Index.build(self.texts)
+        self.assertEqual(bm25.search("What is 5994-7439en about?", 2)[1].tolist(), [0])
+        self.assertEqual(bm25.search("Al2O3 column", 4)[1].tolist(), [3])
+        self.assertEqual(bm25.search("formaldehyde in hydrogen", 2)[1].tolist(), [1, 0])
+        self.assertEqual(len(bm25.search("unknown words", 2)[1]), 0)
+
+    def test_save_and_load_round_trip(self):
+        bm25 = BM25Index.build(self.texts)
+        with tempfile.TemporaryDirectory() as tmp:
+            bm25.save(tmp, build_id="build")
+            loaded = BM25Index.load(tmp)
+            self.assertEqual(loaded.manifest["build_id"], "build")
+            for query in ("ammonia hydrogen", "tea", "990 micro gc"):
+                self.assertTrue(np.allclose(loaded.scores(query), bm25.scores(query)))
+
+    def test_reciprocal_rank_fusion(self):
+        scores, positions = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=60)
+        self.assertEqual(positions, [3, 1, 2, 4])
+        self.assertAlmostEqual(scores[0], 1 / 63 + 1 / 61)
+
+
+class TestHybridRetriever(TestCase):
+    def test_lexical_match_is_fused_with_dense_results(self):
+        embed_model = MockEmbedding(embed_dim=8)
+        nodes = [TextNode(text=f"page {i}", metadata={"parsed_text_markdown": f"page {i}"}) for i in range(6)]
+        nodes[5].metadata["parsed_text_markdown"] = "part number G3440-81013"
+        embeddings = np.eye(6, 8, dtype=np.float32)
+        embeddings[1] = embed_model.get_query_embedding("anything")
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = write_binary_store(nodes, embeddings, tmp)
+            index = load_vector_index(tmp, embed_model=embed_model)
+            dense_only = HybridRetriever.from_index(index, embed_model=embed_model, similarity_top_k=2)
+            self.assertNotIn(nodes[5].node_id, [result.node.node_id for result in dense_only.retrieve("G3440-81013")])
+
+            BM25Index.build(node.metadata["parsed_text_markdown"] for node in nodes).save(
+                tmp, build_id=manifest["build_id"]
+            )
+            index = load_vector_index(tmp, embed_model=embed_model)
+            retriever = HybridRetriever.from_index(index, embed_model=embed_model, similarity_top_k=2)
+
+            results = retriever.retrieve("G3440-81013")
+            self.assertEqual({result.node.node_id for result in results}, {nodes[1].node_id, nodes[5].node_id})
+            batch = retriever.retrieve_batch(["G3440-81013", "anything"])
+            self.assertEqual([result.node.node_id for result in batch[0]], [result.node.node_id for result in results])
+            dense = HybridRetriever.from_index(index, embed_model=embed_model, mode="dense")
+            self.assertNotIsInstance(dense, HybridRetriever)
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+import numpy as np
+import openai
+
+from benchmarks.fakes import StubOpenAIServer
+from {{ project_identifier }}.ingestion.scheduler import (
+    BatchedEmbedder,
+    RateLimitScheduler,
+    TokenBucket,
+    openai_embed_batch,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(TestCase):
+    def test_reservations_queue_up_once_the_bucket_is_empty(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock)
+
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0)
+        self.assertAlmostEqual(bucket.reserve(1), 2.0)
+        clock.now = 2.0
+        self.assertAlmostEqual(bucket.reserve(1), 1.0)
+
+    def test_pause_blocks_new_reservations(self):
+        bucket = TokenBucket(60, clock=FakeClock())
+        bucket.pause(5)
+        self.assertAlmostEqual(bucket.reserve(1), 6.0)
+
+
+class TestBatchedEmbedder(TestCase):
+    def test_embeds_in_order_within_stub_server_limits(self):
+        texts = [f"page {position} ammonia analysis in high purity hydrogen" for position in range(60)]
+        with StubOpenAIServer(requests_per_window=6, tokens_per_window=300, window_seconds=0.5) as server:
+            client = openai.OpenAI(base_url=server.base_url, api_key="sk-stub", max_retries=0)
+            scheduler = RateLimitScheduler(6, 300, max_in_flight=3, period_seconds=0.5)
+            embedder = BatchedEmbedder(openai_embed_batch(client, "text-embedding-3-small"), scheduler)
+
+            embeddings = embedder.embed(texts)
+
+            for text, embedding in zip(texts, embeddings):
+                self.assertTrue(np.allclose(embedding, server.embed(text)))
+            self.assertEqual(scheduler.calls, server.served)
+            self.assertEqual(scheduler.rate_limited, server.rejected)
+            self.assertLessEqual(embedder.batch_tokens, 300)
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from {{ project_identifier }}.core.session_state import (
+    InMemorySessionStateStore,
+    SessionState,
+    SQLiteSessionStateStore,
+    save_session_state,
+)
+
+
+def handle_message(path: str, session_id: str, thread_id: str, question: str, settings: dict = None):
+    """
+    Handles a message like an app process behind a load balancer without stickiness: the agent of the session
+    is rebuilt from the shared session state and chat history, after saving new settings if there are any.
+    """
+    from benchmarks.fakes import FakeToolCallingLLM
+    from {{ project_identifier }}.core.chat_memory import SQLiteChatStore, SummarizingChatMemory
+    from {{ project_identifier }}.core.core import create_agent
+
+    store = SQLiteSessionStateStore(path)
+    if settings is not None:
+        save_session_state(session_id, "Multi Step Agent", settings, thread_id, store=store)
+    state = store.get(session_id)
+    memory = SummarizingChatMemory(chat_store=SQLiteChatStore(path), chat_store_key=state.thread_id)
+    agent = create_agent({"llm": FakeToolCallingLLM(round_trip_seconds=0), "tools": []}, None, memory)
+    agent.chat(question)
+    return os.getpid(), state.settings, [message.content for message in memory.get_all()]
+
+
+class TestSessionState(TestCase):
+    def test_state_is_compact_json(self):
+        state = SessionState(chat_profile="Multi Step Agent", settings={"Model": "gpt-4o", "Temperature": 0.2})
+        self.assertEqual(SessionState.from_json(state.to_json()), state)
+        self.assertLess(len(state.to_json()), 128)
+
+    def test_saving_keeps_the_thread_of_the_session(self):
+        store = InMemorySessionStateStore()
+        save_session_state("session", None, {"Model": "gpt-4o", "Temperature": 0}, "thread-1", store=store)
+        state = save_session_state("session", None, {"Model": "o1-mini", "Temperature": 0}, "thread-2", store=store)
+        self.assertEqual(state.thread_id, "thread-1")
+        self.assertEqual(store.get("session").settings["Model"], "o1-mini")
+
+    def test_two_processes_alternate_messages_of_a_session(self):
+        mini = {"Model": "gpt-4o-mini", "Temperature": 0.5}
+        full = {"Model": "gpt-4o", "Temperature": 0}
+        # The first process starts the chat and later changes the settings, the second one reconnected under a
+        # thread id of its own
+        requests = [(0, "thread-a", mini, mini), (1, "thread-b", None, mini), (0, "thread-a", full, full)]
+        requests.append((1, "thread-b", None, full))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sessions.sqlite")
+            context = multiprocessing.get_context("spawn")
+            processes = [ProcessPoolExecutor(1, mp_context=context) for _ in range(2)]
+            pids = set()
+            try:
+                for turn, (process, thread_id, new_settings, expected_settings) in enumerate(requests):
+                    pid, settings, history = (
+                        processes[process]
+                        .submit(handle_message, path, "session", thread_id, f"Question {turn}", new_settings)
+                        .result()
+                    )
+                    pids.add(pid)
+                    self.assertEqual(settings, expected_settings)
+                    self.assertEqual(history[::2], [f"Question {number}" for number in range(turn + 1)])
+                    self.assertEqual(len(history), 2 * (turn + 1))
+            finally:
+                for process in processes:
+                    process.shutdown()
+
+            self.assertEqual(len(pids), 2)
+            self.assertEqual(SQLiteSessionStateStore(path).get("session").thread_id, "thread-a")
@@ -0,0 +1,56 @@
+import tempfile
+from unittest import TestCase, mock
+
+import numpy as np
+from llama_index.core import MockEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from {{ project_identifier }}.core import vector_store
+from {{ project_identifier }}.core.vector_store import (
+    MemmapVectorStore,
+    has_binary_store,
+    load_vector_index,
+    write_binary_store,
+)
+
+
+class TestMemmapVectorStore(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.nodes = [
+            TextNode(text=f"page {i}", metadata={"page_num": i + 1, "source_file_path": f"/data/documents/{i}.pdf"})
+            for i in range(4)
+        ]
+        self.embeddings = np.eye(4, 8, dtype=np.float32) * 3
+        write_binary_store(self.nodes, self.embeddings, self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        store = MemmapVectorStore.from_persist_dir(self.tmp.name)
+        self.assertEqual(len(store), 4)
+        self.assertTrue(np.allclose(np.linalg.norm(store.vectors, axis=1), 1.0))
+        node = store.get_node(2)
+        self.assertEqual(node.node_id, self.nodes[2].node_id)
+        self.assertEqual(node.metadata["page_num"], 3)
+
+    def test_query_returns_most_similar_nodes(self):
+        store = MemmapVectorStore.from_persist_dir(self.tmp.name)
+        query = VectorStoreQuery(query_embedding=[0, 0, 1, 0.5, 0, 0, 0, 0], similarity_top_k=2)
+        result = store.query(query)
+        self.assertEqual(result.ids, [self.nodes[2].node_id, self.nodes[3].node_id])
+
+    def test_load_vector_index_prefers_binary_store(self):
+        index = load_vector_index(self.tmp.name, embed_model=MockEmbedding(embed_dim=8))
+        self.assertIsInstance(index.vector_store, MemmapVectorStore)
+
+    def test_interrupted_rebuild_leaves_no_manifest(self):
+        with mock.patch.object(vector_store, "_encode_node", side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                write_binary_store(self.nodes[:2], self.embeddings[:2], self.tmp.name)
+
+        self.assertFalse(has_binary_store(self.tmp.name))
+        write_binary_store(self.nodes[:2], self.embeddings[:2], self.tmp.name)
+        self.assertEqual(len(MemmapVectorStore.from_persist_dir(self.tmp.name)), 2)
@@ -0,0 +1,148 @@
+import asyncio
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+from aiohttp import WSMsgType, web
+
+from {{ project_identifier }}.core.worker_affinity import (
+    FORWARDED_HEADER,
+    SessionAffinityMiddleware,
+    prefix_session_ids,
+    session_worker,
+    worker_socket_path,
+)
+
+
+async def owner_app(socket_dir: str):
+    """Serves the forwarded requests of worker 1: echoes HTTP requests and websocket messages."""
+
+    async def echo(request):
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            websocket = web.WebSocketResponse()
+            await websocket.prepare(request)
+            async for message in websocket:
+                if message.type == WSMsgType.TEXT:
+                    await websocket.send_str(f"owner: {message.data}")
+            return websocket
+        body = await request.read()
+        return web.Response(
+            body=b"owner: " + body,
+            headers={"X-Forwarded-By": request.headers.get(FORWARDED_HEADER.decode(), ""), "Connection": "close"},
+        )
+
+    async def metrics(request):
+        return web.json_response({"turn": {"count": 1}})
+
+    app = web.Application()
+    app.router.add_route("*", "/ws/socket.io/", echo)
+    app.router.add_get("/metrics/worker", metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.UnixSite(runner, worker_socket_path(socket_dir, 1)).start()
+    return runner
+
+
+async def local_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"local"})
+
+
+def scope(type: str, sid: str):
+    return {
+        "type": type,
+        "method": "POST",
+        "path": "/ws/socket.io/",
+        "root_path": "",
+        "query_string": f"EIO=4&transport=polling&sid={sid}".encode(),
+        "headers": [(b"host", b"localhost"), (b"content-type", b"text/plain")],
+    }
+
+
+class TestWorkerAffinity(TestCase):
+    def test_session_ids_name_their_worker(self):
+        eio_server = SimpleNamespace(generate_id=lambda: "NMdcXaQ")
+        prefix_session_ids(eio_server, 3)
+
+        self.assertEqual(eio_server.generate_id(), "3.NMdcXaQ")
+        self.assertEqual(session_worker(b"EIO=4&transport=polling&sid=3.NMdcXaQ"), 3)
+        self.assertIsNone(session_worker(b"EIO=4&transport=polling"))
+        self.assertIsNone(session_worker(b"EIO=4&transport=polling&sid=NMdcXaQ"))
+
+    def test_forwards_requests_of_other_workers(self):
+        async def run():
+            with tempfile.TemporaryDirectory() as socket_dir:
+                runner = await owner_app(socket_dir)
+                middleware = SessionAffinityMiddleware(local_app, worker=0, num_workers=2, socket_dir=socket_dir)
+                try:
+                    responses = {}
+                    for sid in ("0.local", "1.owned", "5.unknown"):
+                        messages = [{"type": "http.request", "body": b"40", "more_body": False}]
+                        sent = []
+
+                        async def receive():
+                            return messages.pop(0)
+
+                        async def send(message):
+                            sent.append(message)
+
+                        await middleware(scope("http", sid), receive, send)
+                        responses[sid] = sent
+                    return responses
+                finally:
+                    await middleware._sessions[1].close()
+                    await runner.cleanup()
+
+        responses = asyncio.run(run())
+
+        self.assertEqual(responses["0.local"][1]["body"], b"local")
+        self.assertEqual(responses["5.unknown"][1]["body"], b"local")
+        start, body = responses["1.owned"]
+        self.assertEqual(start["status"], 200)
+        self.assertEqual(body["body"], b"owner: 40")
+        headers = dict(start["headers"])
+        self.assertEqual(headers[b"x-forwarded-by"], b"0")
+        self.assertEqual(headers[b"content-length"], b"9")
+        self.assertNotIn(b"connection", headers)
+
+    def test_relays_websockets_of_other_workers(self):
+        async def run():
+            with tempfile.TemporaryDirectory() as socket_dir:
+                runner = await owner_app(socket_dir)
+                middleware = SessionAffinityMiddleware(local_app, worker=0, num_workers=2, socket_dir=socket_dir)
+                received = asyncio.Queue()
+                await received.put({"type": "websocket.connect"})
+                await received.put({"type": "websocket.receive", "text": "2probe"})
+                sent = []
+
+                async def send(message):
+                    sent.append(message)
+                    if message["type"] == "websocket.send":
+                        await received.put({"type": "websocket.disconnect", "code": 1000})
+
+                try:
+                    await asyncio.wait_for(middleware(scope("websocket", "1.owned"), received.get, send), 5)
+                    return sent
+                finally:
+                    await middleware._sessions[1].close()
+                    await runner.cleanup()
+
+        sent = asyncio.run(run())
+
+        self.assertEqual(sent[0]["type"], "websocket.accept")
+        self.assertEqual(sent[1], {"type": "websocket.send", "text": "owner: 2probe"})
+
+    def test_fetches_from_the_other_workers(self):
+        async def run():
+            with tempfile.TemporaryDirectory() as socket_dir:
+                runner = await owner_app(socket_dir)
+                # Worker 2 is not running
+                middleware = SessionAffinityMiddleware(local_app, worker=0, num_workers=3, socket_dir=socket_dir)
+                try:
+                    return await middleware.fetch_from_workers("/metrics/worker")
+                finally:
+                    for session in middleware._sessions.values():
+                        await session.close()
+                    await runner.cleanup()
+
+        self.assertEqual(asyncio.run(run()), [{"turn": {"count": 1}}])
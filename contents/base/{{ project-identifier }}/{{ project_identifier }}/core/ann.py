@@ -0,0 +1,184 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from {{ project_identifier }}.core.search import normalize_rows, top_k_rows
+
+IVF_MANIFEST = "ivf.json"
+IVF_CENTROIDS_FILE_NAME = "ivf_centroids.npy"
+IVF_OFFSETS_FILE_NAME = "ivf_list_offsets.npy"
+IVF_IDS_FILE_NAME = "ivf_list_ids.npy"
+
+# Rows assigned to centroids per step, bounds the (rows, num_lists) score matrix during training
+_ASSIGN_CHUNK_SIZE = 65536
+
+
+def assign(vectors, centroids: np.ndarray, spherical: bool = True) -> np.ndarray:
+    """
+    Returns the position of the closest centroid of every row, by cosine similarity for unit-norm data
+    (`spherical=True`) or by Euclidean distance.
+    """
+    # argmin |x - c|^2 == argmax x.c - |c|^2 / 2, so both cases are one matrix product
+    bias = 0.0 if spherical else -0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_CHUNK_SIZE):
+        chunk = np.asarray(vectors[start : start + _ASSIGN_CHUNK_SIZE], dtype=np.float32)
+        assignments[start : start + len(chunk)] = np.argmax(chunk @ centroids.T + bias, axis=1)
+    return assignments
+
+
+def kmeans(
+    vectors,
+    num_clusters: int,
+    iterations: int = 10,
+    sample_size: int = 100000,
+    seed: int = 0,
+    spherical: bool = True,
+) -> np.ndarray:
+    """
+    Lloyd's k-means in NumPy.
+
+    With `spherical=True` rows and centroids are unit-norm and clustered by cosine similarity, otherwise
+    by Euclidean distance. Trains on a random sample of at most `sample_size` rows, which is plenty to
+    place the centroids.
+
+    Returns:
+        np.ndarray: A (num_clusters, dim) float32 matrix of centroids.
+    """
+    rng = np.random.default_rng(seed)
+    num_vectors = vectors.shape[0]
+    if num_vectors > sample_size:
+        sample = vectors[np.sort(rng.choice(num_vectors, sample_size, replace=False))]
+    else:
+        sample = vectors
+    sample = normalize_rows(sample) if spherical else np.asarray(sample, dtype=np.float32)
+    num_clusters = min(num_clusters, sample.shape[0])
+
+    centroids = sample[rng.choice(sample.shape[0], num_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign(sample, centroids, spherical=spherical)
+        counts = np.bincount(assignments, minlength=num_clusters)
+        # Sum every cluster in one pass over the rows sorted by cluster
+        non_empty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[non_empty]
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(sample[np.argsort(assignments, kind="stable")], starts, axis=0)
+        # Re-seed empty clusters with random points so every centroid stays usable
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(sample.shape[0], len(empty), replace=False)]
+        counts[empty] = 1
+        centroids = normalize_rows(sums) if spherical else (sums / counts[:, None]).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted file index: vectors are bucketed by their nearest k-means centroid, and a query only scores
+    the vectors of the `nprobe` buckets whose centroids are closest to it.
+
+    The inverted lists are stored in CSR layout: `list_ids[list_offsets[i]:list_offsets[i + 1]]` are the
+    matrix rows of bucket `i`.
+    """
+
+    def __init__(self, centroids: np.ndarray, list_offsets: np.ndarray, list_ids: np.ndarray, manifest: dict = None):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.manifest = manifest or {}
+
+    @property
+    def num_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(cls, vectors, num_lists: int = None, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """
+        Trains the coarse quantizer and buckets every vector.
+
+        Args:
+            vectors (np.ndarray): A (num_nodes, dim) matrix of unit-norm embeddings.
+            num_lists (int, optional): The number of buckets. Defaults to 4 * sqrt(num_nodes).
+        """
+        num_vectors = vectors.shape[0]
+        if num_lists is None:
+            num_lists = max(1, int(4 * math.sqrt(num_vectors)))
+        centroids = kmeans(vectors, num_lists, iterations=iterations, seed=seed)
+        assignments = assign(vectors, centroids)
+
+        list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=centroids.shape[0])
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        manifest = {"num_lists": int(centroids.shape[0]), "num_vectors": int(num_vectors)}
+        return cls(centroids, list_offsets, list_ids, manifest)
+
+    def save(self, persist_dir, **manifest):
+        """Writes the index next to the binary vector store. Extra keyword arguments are stored in its manifest."""
+        np.save(os.path.join(persist_dir, IVF_CENTROIDS_FILE_NAME), self.centroids)
+        np.save(os.path.join(persist_dir, IVF_OFFSETS_FILE_NAME), self.list_offsets)
+        np.save(os.path.join(persist_dir, IVF_IDS_FILE_NAME), self.list_ids)
+        self.manifest.update(manifest)
+        with open(os.path.join(persist_dir, IVF_MANIFEST), "w") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+
+    @classmethod
+    def load(cls, persist_dir) -> "IVFIndex":
+        with open(os.path.join(persist_dir, IVF_MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        return cls(
+            np.load(os.path.join(persist_dir, IVF_CENTROIDS_FILE_NAME)),
+            np.load(os.path.join(persist_dir, IVF_OFFSETS_FILE_NAME), mmap_mode="r"),
+            np.load(os.path.join(persist_dir, IVF_IDS_FILE_NAME), mmap_mode="r"),
+            manifest,
+        )
+
+    @staticmethod
+    def exists(persist_dir) -> bool:
+        return os.path.exists(os.path.join(persist_dir, IVF_MANIFEST))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Returns the matrix rows stored in the `nprobe` buckets closest to a unit-norm query."""
+        _, lists = top_k_rows((self.centroids @ query)[None, :], nprobe)
+        return np.concatenate(
+            [self.list_ids[self.list_offsets[i] : self.list_offsets[i + 1]] for i in lists[0]]
+            or [np.empty(0, dtype=np.int64)]
+        )
+
+
+class IVFSearcher:
+    """
+    Approximate cosine top-k search through an `IVFIndex`, with the same interface as `DenseSearcher`.
+
+    Args:
+        ivf (IVFIndex): The inverted file index.
+        vectors (np.ndarray): The unit-norm embedding matrix the index was built over.
+        nprobe (int, optional): Buckets scanned per query. Higher values trade latency for recall,
+            `nprobe == ivf.num_lists` is exact search. Defaults to 8.
+    """
+
+    def __init__(self, ivf: IVFIndex, vectors, nprobe: int = 8):
+        self.ivf = ivf
+        self.vectors = vectors
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def search(self, query, top_k: int):
+        query = normalize_rows(query)
+        candidates = np.sort(self.ivf.candidates(query, self.nprobe))
+        scores = (self.vectors[candidates] @ query)[None, :]
+        top_scores, positions = top_k_rows(scores, top_k)
+        return top_scores[0], candidates[positions[0]]
+
+    def search_batch(self, queries, top_k: int):
+        """
+        Searches every query on its own, each one probes different buckets.
+
+        Returns:
+            tuple: Lists of per-query score and position arrays. Rows can be shorter than `top_k` when
+            the probed buckets hold fewer vectors.
+        """
+        results = [self.search(query, top_k) for query in np.atleast_2d(queries)]
+        return [scores for scores, _ in results], [positions for _, positions in results]
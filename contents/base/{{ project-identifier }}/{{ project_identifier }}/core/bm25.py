@@ -0,0 +1,225 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from {{ project_identifier }}.core.search import top_k_rows
+
+BM25_MANIFEST = "bm25.json"
+BM25_VOCABULARY_FILE_NAME = "bm25_vocabulary.txt"
+BM25_OFFSETS_FILE_NAME = "bm25_offsets.npy"
+BM25_DOCUMENTS_FILE_NAME = "bm25_documents.npy"
+BM25_FREQUENCIES_FILE_NAME = "bm25_frequencies.npy"
+BM25_LENGTHS_FILE_NAME = "bm25_lengths.npy"
+
+# Keeps codes like "5994-7439en", "1,3-butadiene" or "Al2O3/KCl" whole, their parts are indexed as well
+_token_pattern = re.compile(r"[a-z0-9]+(?:[-,./][a-z0-9]+)*")
+_part_pattern = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or that the this to was "
+    "were what when where which who why will with you your me my we our".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases `text` and splits it into terms for BM25.
+
+    Compound tokens such as part numbers are kept whole so an exact code ranks highest, and their parts
+    are added so a partial code still matches.
+    """
+    terms = []
+    for token in _token_pattern.findall(text.lower()):
+        if token not in STOPWORDS:
+            terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in _part_pattern.findall(token) if part not in STOPWORDS)
+    return terms
+
+
+def lexical_text(node) -> str:
+    """The text of a node that is indexed for BM25: its file name, parsed page and generated questions."""
+    metadata = node.metadata
+    return "\n".join(
+        filter(
+            None,
+            [
+                metadata.get("source_file_relative_path") or os.path.basename(metadata.get("source_file_path") or ""),
+                metadata.get("parsed_text_markdown") or node.get_content(),
+                metadata.get("questions_this_excerpt_can_answer"),
+            ],
+        )
+    )
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index stored as compressed-sparse-row arrays.
+
+    The postings of term `t` are `documents[offsets[t]:offsets[t + 1]]` with their term frequencies in
+    `frequencies`. Documents are positions in the binary vector store, so lexical and dense results refer to
+    the same rows. The arrays are memory-mapped from disk, only the vocabulary is held in a dict.
+
+    Usage:
+    ```
+    bm25 = BM25Index.build([lexical_text(node) for node in nodes])
+    bm25.save(persist_dir, build_id=build_id)
+    scores, positions = BM25Index.load(persist_dir).search("5994-7439en", top_k=5)
+    ```
+
+    Args:
+        vocabulary (Sequence[str]): The terms, in term id order.
+        offsets (np.ndarray): (num_terms + 1,) start of each term's postings.
+        documents (np.ndarray): Document positions of all postings.
+        frequencies (np.ndarray): Term frequency of every posting.
+        lengths (np.ndarray): Number of terms of every document.
+        k1 (float, optional): Term frequency saturation. Defaults to 1.2.
+        b (float, optional): Document length normalization. Defaults to 0.75.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Sequence[str],
+        offsets: np.ndarray,
+        documents: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+        manifest: dict = None,
+    ):
+        self.term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.documents = documents
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.manifest = manifest or {}
+        num_documents = len(lengths)
+        self.length_norms = (
+            k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0)) if num_documents else np.zeros(0)
+        ).astype(np.float32)
+        document_frequencies = np.diff(offsets)
+        self.idf = np.log1p((num_documents - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(
+            np.float32
+        )
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Tokenizes every text and builds its postings.
+
+        Args:
+            texts (Iterable[str]): The lexical text of every node, in binary vector store order.
+        """
+        postings = {}
+        lengths = []
+        for position, text in enumerate(texts):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, []).append((position, frequency))
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+        documents = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.uint16)
+        for term_id, term in enumerate(vocabulary):
+            term_postings = np.asarray(postings[term], dtype=np.int64).reshape(-1, 2)
+            documents[offsets[term_id] : offsets[term_id + 1]] = term_postings[:, 0]
+            frequencies[offsets[term_id] : offsets[term_id + 1]] = np.minimum(term_postings[:, 1], 65535)
+        manifest = {"k1": k1, "b": b, "num_documents": len(lengths), "num_terms": len(vocabulary)}
+        return cls(vocabulary, offsets, documents, frequencies, np.asarray(lengths, dtype=np.uint32), k1, b, manifest)
+
+    def save(self, persist_dir, **manifest):
+        """Writes the index next to the binary vector store. Extra keyword arguments are stored in its manifest."""
+        vocabulary = sorted(self.term_ids, key=self.term_ids.get)
+        with open(os.path.join(persist_dir, BM25_VOCABULARY_FILE_NAME), "w", encoding="utf-8") as vocabulary_file:
+            vocabulary_file.write("\n".join(vocabulary))
+        np.save(os.path.join(persist_dir, BM25_OFFSETS_FILE_NAME), self.offsets)
+        np.save(os.path.join(persist_dir, BM25_DOCUMENTS_FILE_NAME), self.documents)
+        np.save(os.path.join(persist_dir, BM25_FREQUENCIES_FILE_NAME), self.frequencies)
+        np.save(os.path.join(persist_dir, BM25_LENGTHS_FILE_NAME), self.lengths)
+        self.manifest.update(manifest)
+        with open(os.path.join(persist_dir, BM25_MANIFEST), "w") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+
+    @classmethod
+    def load(cls, persist_dir) -> "BM25Index":
+        with open(os.path.join(persist_dir, BM25_MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        with open(os.path.join(persist_dir, BM25_VOCABULARY_FILE_NAME), encoding="utf-8") as vocabulary_file:
+            vocabulary = vocabulary_file.read().split("\n") if manifest["num_terms"] else []
+        return cls(
+            vocabulary,
+            np.load(os.path.join(persist_dir, BM25_OFFSETS_FILE_NAME)),
+            np.load(os.path.join(persist_dir, BM25_DOCUMENTS_FILE_NAME), mmap_mode="r"),
+            np.load(os.path.join(persist_dir, BM25_FREQUENCIES_FILE_NAME), mmap_mode="r"),
+            np.load(os.path.join(persist_dir, BM25_LENGTHS_FILE_NAME)),
+            manifest["k1"],
+            manifest["b"],
+            manifest,
+        )
+
+    @staticmethod
+    def exists(persist_dir) -> bool:
+        return os.path.exists(os.path.join(persist_dir, BM25_MANIFEST))
+
+    def scores(self, query: str) -> np.ndarray:
+        """Returns the BM25 score of every document for `query`."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, query_frequency in Counter(tokenize(query)).items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            documents = self.documents[start:end]
+            frequencies = self.frequencies[start:end].astype(np.float32)
+            # A document appears once per term, so the fancy-indexed update does not drop duplicates
+            scores[documents] += (
+                query_frequency
+                * self.idf[term_id]
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + self.length_norms[documents])
+            )
+        return scores
+
+    def search(self, query: str, top_k: int):
+        """
+        Returns the `top_k` (scores, positions) of a query, best first. Documents matching no query term
+        are left out, so fewer than `top_k` may be returned.
+        """
+        scores = self.scores(query)
+        top_scores, positions = top_k_rows(scores[None, :], top_k)
+        matched = top_scores[0] > 0
+        return top_scores[0][matched], positions[0][matched]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60, top_k: int = None):
+    """
+    Fuses ranked lists of positions: each position scores the sum of 1 / (k + rank) over the lists it is in.
+
+    Args:
+        rankings (Sequence[Sequence[int]]): Positions of each ranking, best first.
+        k (int, optional): Damping of the top ranks. Defaults to 60.
+        top_k (int, optional): Number of fused results. Defaults to all.
+
+    Returns:
+        tuple: The fused scores and positions, best first. Ties keep the order of the first ranking.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking, start=1):
+            position = int(position)
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused.items(), key=lambda item: -item[1])[:top_k]
+    return [score for _, score in ordered], [position for position, _ in ordered]
+
@@ -0,0 +1,287 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional
+
+from loguru import logger
+from pydantic import PrivateAttr
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.memory import ChatSummaryMemoryBuffer
+from llama_index.core.storage.chat_store import BaseChatStore, SimpleChatStore
+
+# SQLite file the chat histories are kept in, shared by workers and restarts. Empty keeps them in process memory
+CHAT_MEMORY_PATH = os.environ.get("CHAT_MEMORY_PATH", "")
+# Tokens of chat history sent with every question, older turns are rolled into a summary
+CHAT_MEMORY_TOKEN_LIMIT = int(os.environ.get("CHAT_MEMORY_TOKEN_LIMIT", 3000))
+# Histories of the SQLite store untouched for longer than this are deleted when it is opened
+CHAT_MEMORY_TTL_HOURS = float(os.environ.get("CHAT_MEMORY_TTL_HOURS", 168))
+# Model that writes the summaries
+CHAT_SUMMARY_MODEL = os.environ.get("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+
+SUMMARIZE_PROMPT = (
+    "The transcript above is a conversation between the user and the assistant, possibly starting with a "
+    "summary of earlier turns. Write a concise summary of it that keeps the user's questions, the documents, "
+    "methods and figures they are about, and the conclusions of the answers."
+)
+
+# Rewrites of a history by its summarizer and by the agent are serialized, across the memories of a session
+_write_lock = threading.Lock()
+_compacting = set()
+
+
+class SQLiteChatStore(BaseChatStore):
+    """
+    Chat store keeping the messages of every key as rows of a single SQLite table, so chat histories survive
+    restarts and are shared by the workers of a pod.
+
+    Args:
+        path (str): The database file, created if missing.
+    """
+
+    path: str
+
+    _lock: Any = PrivateAttr()
+    _connection: Any = PrivateAttr()
+
+    def __init__(self, path: str, **kwargs: Any):
+        super().__init__(path=path, **kwargs)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS messages (key TEXT NOT NULL, position INTEGER NOT NULL, "
+            "message TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (key, position))"
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SQLiteChatStore"
+
+    def set_messages(self, key: str, messages: List[ChatMessage]) -> None:
+        now = time.time()
+        rows = [(key, position, message.model_dump_json(), now) for position, message in enumerate(messages)]
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute("DELETE FROM messages WHERE key = ?", (key,))
+                self._connection.executemany("INSERT INTO messages VALUES (?, ?, ?, ?)", rows)
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def get_messages(self, key: str) -> List[ChatMessage]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT message FROM messages WHERE key = ? ORDER BY position", (key,)
+            ).fetchall()
+        return [ChatMessage.model_validate_json(row[0]) for row in rows]
+
+    def add_message(self, key: str, message: ChatMessage) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO messages SELECT ?, COALESCE(MAX(position) + 1, 0), ?, ? FROM messages WHERE key = ?",
+                (key, message.model_dump_json(), time.time(), key),
+            )
+
+    def delete_messages(self, key: str) -> Optional[List[ChatMessage]]:
+        messages = self.get_messages(key)
+        if not messages:
+            return None
+        with self._lock:
+            self._connection.execute("DELETE FROM messages WHERE key = ?", (key,))
+        return messages
+
+    def delete_message(self, key: str, idx: int) -> Optional[ChatMessage]:
+        messages = self.get_messages(key)
+        if idx >= len(messages):
+            return None
+        removed = messages.pop(idx)
+        self.set_messages(key, messages)
+        return removed
+
+    def delete_last_message(self, key: str) -> Optional[ChatMessage]:
+        with self._lock:
+            row = self._connection.execute(
+                "DELETE FROM messages WHERE key = ? AND position = (SELECT MAX(position) FROM messages WHERE key = ?) "
+                "RETURNING message",
+                (key, key),
+            ).fetchone()
+        return ChatMessage.model_validate_json(row[0]) if row else None
+
+    def get_keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT DISTINCT key FROM messages").fetchall()]
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Deletes the histories last written more than `max_age_seconds` ago, returns how many."""
+        with self._lock:
+            keys = self._connection.execute(
+                "SELECT key FROM messages GROUP BY key HAVING MAX(updated_at) < ?", (time.time() - max_age_seconds,)
+            ).fetchall()
+            self._connection.executemany("DELETE FROM messages WHERE key = ?", keys)
+        return len(keys)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class SummarizingChatMemory(ChatSummaryMemoryBuffer):
+    """
+    Chat memory that bounds the history sent to the LLM by `token_limit` and rolls older turns into a summary.
+
+    While the history fits, it is returned as stored. Once it grows past the limit, the oldest messages are
+    summarized by `llm` into one system message at the start of the history, keeping the newest messages up to
+    `keep_ratio` of the limit as they are, so one summary makes room for several turns. In the background mode
+    the summary is written by a worker thread, since agents read their memory on the event loop. Until it is
+    ready, the oldest messages are left out of the prompt.
+
+    The history lives in `chat_store` under `chat_store_key`, so a memory created for the same key, e.g. by a
+    rebuilt agent, carries on the conversation.
+
+    Usage:
+    ```
+    memory = SummarizingChatMemory(llm=summary_llm, chat_store=SQLiteChatStore(path), chat_store_key=thread_id)
+    agent = ReActAgent.from_tools(tools, llm=llm, memory=memory)
+    ```
+
+    Args:
+        token_limit (int, optional): Tokens of history returned by `get`. Defaults to `CHAT_MEMORY_TOKEN_LIMIT`.
+        llm (LLM, optional): The summarizer, without it older messages are dropped.
+        keep_ratio (float, optional): Share of `token_limit` kept verbatim by a summary. Defaults to 0.5.
+        background (bool, optional): Whether summaries are written by a worker thread. Defaults to True.
+    """
+
+    token_limit: int
+    summarize_prompt: Optional[str] = SUMMARIZE_PROMPT
+    keep_ratio: float = 0.5
+    background: bool = True
+
+    def __init__(self, **kwargs: Any):
+        # The token limit is validated before field defaults apply
+        kwargs.setdefault("token_limit", CHAT_MEMORY_TOKEN_LIMIT)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SummarizingChatMemory"
+
+    def get(self, input: Optional[str] = None, initial_token_count: int = 0, **kwargs: Any) -> List[ChatMessage]:
+        messages = self.get_all()
+        budget = self.token_limit - (initial_token_count if self.count_initial_tokens else 0)
+        if self._token_count_for_messages(messages) <= budget:
+            return messages
+        if self.llm is not None:
+            if self.background:
+                self._start_compaction()
+            elif self.compact():
+                messages = self.get_all()
+        return self._recent(messages, budget)
+
+    def put(self, message: ChatMessage) -> None:
+        with _write_lock:
+            super().put(message)
+
+    def set(self, messages: List[ChatMessage]) -> None:
+        with _write_lock:
+            super().set(messages)
+
+    def compact(self) -> bool:
+        """
+        Summarizes the messages before the newest `keep_ratio` of the token limit into one system message.
+
+        Returns:
+            bool: Whether the history was rewritten. It is not when there is nothing to summarize, or when the
+                summarized messages changed while the summary was written.
+        """
+        messages = self.get_all()
+        start = self._start_of_recent(messages, int(self.token_limit * self.keep_ratio))
+        if start == 0 or (start == 1 and messages[0].role == MessageRole.SYSTEM):
+            return False
+        started = time.perf_counter()
+        summary = self._summarize_oldest_chat_history(messages[:start])
+        with _write_lock:
+            current = self.get_all()
+            if current[:start] != messages[:start]:
+                return False
+            self.chat_store.set_messages(self.chat_store_key, [summary, *current[start:]])
+        logger.debug(
+            f"Summarized {start} of {len(current)} chat messages into "
+            f"{self._token_count_for_messages([summary])} tokens in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return True
+
+    def _start_compaction(self):
+        with _write_lock:
+            if self.chat_store_key in _compacting:
+                return
+            _compacting.add(self.chat_store_key)
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"Summarizing the chat history failed: {e}")
+            finally:
+                with _write_lock:
+                    _compacting.discard(self.chat_store_key)
+
+        threading.Thread(target=run, name="chat-summary", daemon=True).start()
+
+    def _start_of_recent(self, messages: List[ChatMessage], budget: int) -> int:
+        """Position of the oldest of the newest messages that fit in `budget`, which is never an assistant reply."""
+        start, used = len(messages), 0
+        while start > 0:
+            tokens = self._token_count_for_messages([messages[start - 1]])
+            if used + tokens > budget:
+                break
+            used += tokens
+            start -= 1
+        # Tool results and replies need the message they answer
+        while start < len(messages) and messages[start].role in (MessageRole.ASSISTANT, MessageRole.TOOL):
+            start += 1
+        return start
+
+    def _recent(self, messages: List[ChatMessage], budget: int) -> List[ChatMessage]:
+        """The summary, if any, and the newest messages that fit in `budget` with it."""
+        summary = messages[:1] if messages and messages[0].role == MessageRole.SYSTEM else []
+        summary_tokens = self._token_count_for_messages(summary)
+        if summary_tokens > budget:
+            summary, summary_tokens = [], 0
+        rest = messages[len(summary) :]
+        return summary + rest[self._start_of_recent(rest, budget - summary_tokens) :]
+
+
+_chat_store = None
+
+
+def get_chat_store() -> BaseChatStore:
+    """Returns the chat store of the process, SQLite at `CHAT_MEMORY_PATH` or in memory without one."""
+    global _chat_store
+    if _chat_store is None:
+        if CHAT_MEMORY_PATH:
+            store = SQLiteChatStore(CHAT_MEMORY_PATH)
+            pruned = store.prune(CHAT_MEMORY_TTL_HOURS * 3600)
+            logger.info(f"Chat memory in {CHAT_MEMORY_PATH}, deleted {pruned} expired histories")
+            _chat_store = store
+        else:
+            _chat_store = SimpleChatStore()
+    return _chat_store
+
+
+def session_memory(session_id: str, llm=None) -> SummarizingChatMemory:
+    """Returns a memory over the stored history of a chat session, summarized by `llm`."""
+    return SummarizingChatMemory(llm=llm, chat_store=get_chat_store(), chat_store_key=session_id)
+
+
+def release_session_memory(session_id: str):
+    """Forgets the history of an ended session, unless it is persisted so the chat can be resumed."""
+    store = get_chat_store()
+    if not isinstance(store, SQLiteChatStore):
+        store.delete_messages(session_id)
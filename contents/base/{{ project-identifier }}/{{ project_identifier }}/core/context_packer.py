@@ -0,0 +1,291 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional
+
+from loguru import logger
+from pydantic import Field, PrivateAttr
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from {{ project_identifier }}.core.bm25 import tokenize
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+from {{ project_identifier }}.utils.cache import LRUCache
+
+# Tokens of retrieved text passed to the response synthesizer per query, 0 passes whole pages
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1500))
+# Generated questions help retrieval, they are not source text, so packed nodes leave them out of the prompt
+QUESTIONS_METADATA_KEY = "questions_this_excerpt_can_answer"
+
+_heading_pattern = re.compile(r"^#{1,6}\s")
+_sentence_end_pattern = re.compile(r"(?<=[.!?])\s+")
+_table_separator_pattern = re.compile(r"^\|?\s*:?-{3,}")
+# Words per shingle when comparing sections for overlap
+_SHINGLE_SIZE = 5
+
+
+@dataclass
+class Section:
+    """A heading's paragraph, list or table of a page, the unit the context packer selects."""
+
+    order: int
+    heading: Optional[str]
+    text: str
+    tokens: int
+    terms: frozenset
+    shingles: frozenset
+    # Cut by rows or sentences from a section larger than the budget
+    fragment: bool = False
+
+
+def _shingles(text: str) -> frozenset:
+    words = text.lower().split()
+    if len(words) < _SHINGLE_SIZE:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    starts = range(len(words) - _SHINGLE_SIZE + 1)
+    return frozenset(" ".join(words[start : start + _SHINGLE_SIZE]) for start in starts)
+
+
+def _pack(units: List[str], joiner: str, max_tokens: int, header: str = "") -> List[str]:
+    """Joins consecutive `units` greedily into parts of at most `max_tokens`, each starting with `header`."""
+    parts, current = [], [header] if header else []
+    for unit in units:
+        if len(current) > bool(header) and count_tokens(joiner.join(current + [unit])) > max_tokens:
+            parts.append(joiner.join(current))
+            current = [header] if header else []
+        current.append(unit)
+    if len(current) > bool(header):
+        parts.append(joiner.join(current))
+    return parts
+
+
+def _split_table(text: str, max_tokens: int) -> List[str]:
+    lines = text.splitlines()
+    # The header row and its separator are repeated on every part, so each part reads as a table
+    header_size = 2 if len(lines) > 1 and _table_separator_pattern.match(lines[1].strip()) else 1
+    return _pack(lines[header_size:], "\n", max_tokens, header="\n".join(lines[:header_size]))
+
+
+def _split_prose(text: str, max_tokens: int) -> List[str]:
+    units = []
+    for line in text.splitlines():
+        units.extend(_sentence_end_pattern.split(line) if count_tokens(line) > max_tokens else [line])
+    return _pack(units, "\n", max_tokens)
+
+
+def split_section_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Splits the text of a section into parts of at most `max_tokens`: a table by rows, repeating its header, a
+    paragraph or list by lines and sentences. A single row or sentence larger than `max_tokens` is kept whole.
+    """
+    split = _split_table if text.lstrip().startswith("|") else _split_prose
+    return split(text, max_tokens)
+
+
+def split_sections(text: str, max_tokens: Optional[int] = None) -> List[Section]:
+    """
+    Splits a parsed markdown page into sections: every paragraph, list and table, under its latest heading.
+
+    Tables are kept whole and apart from the surrounding prose, unless they are larger than `max_tokens`, heading
+    included, like paragraphs and lists (see `split_section_text`). A heading directly followed by another
+    heading becomes a section of its own, so tables of contents are not lost.
+    """
+    blocks, lines, heading, heading_has_body, table = [], [], None, False, False
+
+    def flush():
+        nonlocal heading_has_body
+        if lines:
+            blocks.append((heading, "\n".join(lines)))
+            lines.clear()
+            heading_has_body = True
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if _heading_pattern.match(stripped):
+            flush()
+            if heading is not None and not heading_has_body:
+                blocks.append((None, heading))
+            heading, heading_has_body = stripped, False
+            continue
+        if not stripped:
+            flush()
+            continue
+        is_table = stripped.startswith("|")
+        if lines and is_table != table:
+            flush()
+        lines.append(line)
+        table = is_table
+    flush()
+    if heading is not None and not heading_has_body:
+        blocks.append((None, heading))
+
+    sections = []
+    for section_heading, body in blocks:
+        pieces = [body]
+        if max_tokens is not None:
+            heading_tokens = count_tokens(f"{section_heading}\n") if section_heading else 0
+            if heading_tokens + count_tokens(body) > max_tokens:
+                pieces = split_section_text(body, max_tokens - heading_tokens)
+        for piece in pieces:
+            full_text = f"{section_heading}\n{piece}" if section_heading else piece
+            sections.append(
+                Section(
+                    order=len(sections),
+                    heading=section_heading,
+                    text=piece,
+                    tokens=count_tokens(full_text),
+                    terms=frozenset(tokenize(full_text)),
+                    shingles=_shingles(piece),
+                    fragment=len(pieces) > 1,
+                )
+            )
+    return sections
+
+
+class ContextPacker(BaseNodePostprocessor):
+    """
+    Fills a token budget with the most relevant sections of the retrieved pages, instead of passing whole
+    pages with their large markdown tables to the response synthesizer.
+
+    Pages are split into sections by markdown headings, blank lines and tables, and sections are counted with
+    the tokenizer of the LLM. Sections larger than `section_max_tokens` or the budget, e.g. whole-page tables,
+    are split by table rows or sentences, so their rows with query terms are selected on their own. Sections
+    are ranked by the IDF-weighted share of query terms they contain, then by the rank of their page, and taken
+    greedily while they fit the budget. The top-ranked section is always taken, even a single row larger than
+    the budget. Split rows and sentences without query terms, and sections whose word shingles mostly appeared
+    in an already selected section, e.g. a header repeated on every page, are dropped. Every page keeps its
+    selected sections in page order under their headings, pages without any are dropped.
+
+    Usage:
+    ```
+    packer = ContextPacker(token_budget=1500)
+    query_engine = RetrieverQueryEngine.from_args(retriever, node_postprocessors=[reranker, packer])
+    packer.stats()  # {"requests": 1, "prompt_tokens_before": 2457, "prompt_tokens": 1432, ...}
+    ```
+
+    Args:
+        token_budget (int, optional): Tokens of packed text per query. Defaults to `CONTEXT_TOKEN_BUDGET`.
+        overlap_threshold (float, optional): Share of a section's shingles already selected above which it is
+            a duplicate. Defaults to 0.8.
+        section_max_tokens (int, optional): Largest section in tokens, larger ones are split. Defaults to 256.
+        cache_size (int, optional): Pages whose sections are cached. Defaults to 1024.
+    """
+
+    token_budget: int = Field(default=CONTEXT_TOKEN_BUDGET)
+    section_max_tokens: int = Field(default=256)
+    overlap_threshold: float = Field(default=0.8)
+    cache_size: int = Field(default=1024)
+    rank_weight: float = Field(default=0.3)
+
+    _sections = PrivateAttr()
+    _lock = PrivateAttr()
+    _counters = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sections = LRUCache(max_size=self.cache_size)
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextPacker"
+
+    def sections(self, node) -> List[Section]:
+        max_tokens = min(self.section_max_tokens, self.token_budget)
+        return self._sections.get_or_create(node.node_id, lambda: split_sections(node.get_content(), max_tokens))
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        if not nodes or self.token_budget <= 0:
+            return nodes
+        started = time.perf_counter()
+        tokens_before = sum(count_tokens(hit.node.get_content(metadata_mode=MetadataMode.LLM)) for hit in nodes)
+
+        query_terms = set(tokenize(query_bundle.query_str)) if query_bundle is not None else set()
+        page_sections = [self.sections(hit.node) for hit in nodes]
+        num_sections = sum(len(sections) for sections in page_sections)
+        document_frequencies = Counter(
+            term for sections in page_sections for section in sections for term in section.terms & query_terms
+        )
+        idf = {term: math.log(1 + num_sections / (1 + document_frequencies[term])) for term in query_terms}
+        total_idf = sum(idf.values()) or 1.0
+
+        ranked = []
+        for rank, sections in enumerate(page_sections):
+            for section in sections:
+                relevance = sum(idf[term] for term in section.terms & query_terms) / total_idf
+                ranked.append((-(relevance + self.rank_weight / (1 + rank)), rank, section.order, section))
+        ranked.sort(key=lambda item: item[:3])
+
+        selected, seen_shingles, used, duplicates = set(), set(), 0, 0
+        for _, rank, order, section in ranked:
+            overlap = len(section.shingles & seen_shingles)
+            if section.shingles and overlap >= self.overlap_threshold * len(section.shingles):
+                duplicates += 1
+                continue
+            if selected and used + section.tokens > self.token_budget:
+                continue
+            # Rows or sentences out of their section are noise without any query term
+            if selected and section.fragment and not section.terms & query_terms:
+                continue
+            selected.add((rank, order))
+            seen_shingles |= section.shingles
+            used += section.tokens
+
+        packed = []
+        for rank, (hit, sections) in enumerate(zip(nodes, page_sections)):
+            parts, heading = [], None
+            for section in sections:
+                if (rank, section.order) not in selected:
+                    continue
+                if section.heading is not None and section.heading != heading:
+                    parts.append(section.heading)
+                heading = section.heading
+                parts.append(section.text)
+            if parts:
+                node = hit.node.model_copy(
+                    update={
+                        "text": "\n\n".join(parts),
+                        "excluded_llm_metadata_keys": hit.node.excluded_llm_metadata_keys + [QUESTIONS_METADATA_KEY],
+                    }
+                )
+                packed.append(NodeWithScore(node=node, score=hit.score))
+
+        tokens = sum(count_tokens(hit.node.get_content(metadata_mode=MetadataMode.LLM)) for hit in packed)
+        elapsed = time.perf_counter() - started
+        logger.debug(
+            f"Packed {len(selected)} of {num_sections} sections from {len(packed)} of {len(nodes)} pages, "
+            f"{tokens_before} -> {tokens} prompt tokens in {elapsed * 1000:.1f} ms"
+        )
+        with self._lock:
+            self._counters.update(
+                requests=1,
+                sections=num_sections,
+                sections_selected=len(selected),
+                duplicates_dropped=duplicates,
+                prompt_tokens_before=tokens_before,
+                prompt_tokens=tokens,
+                pack_microseconds=int(elapsed * 1e6),
+            )
+        return packed
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        requests = counters.get("requests", 0)
+        return {
+            "requests": requests,
+            "sections": counters.get("sections", 0),
+            "sections_selected": counters.get("sections_selected", 0),
+            "duplicates_dropped": counters.get("duplicates_dropped", 0),
+            "prompt_tokens_before": counters.get("prompt_tokens_before", 0),
+            "prompt_tokens": counters.get("prompt_tokens", 0),
+            "mean_ms": round(counters.get("pack_microseconds", 0) / 1000 / requests, 3) if requests else 0.0,
+        }
@@ -1,21 +1,43 @@
 import os
+import time
+import uuid
 from loguru import logger
 import chainlit as cl
 import openai
 from datetime import datetime
 
-from typing import List  # noqa
+from typing import List, Optional  # noqa
 
 
 import {{ project_identifier }}.utils.configuration as configuration
+from {{ project_identifier }}.utils.cache import LRUCache
 from {{ project_identifier }}.utils.common import process_response_metadata_list, find_profile_data
+from {{ project_identifier }}.core.chat_memory import CHAT_SUMMARY_MODEL, session_memory
+from {{ project_identifier }}.core.context_packer import ContextPacker
+from {{ project_identifier }}.core.embedding_cache import CachedEmbedding
+from {{ project_identifier }}.core.index_registry import index_registry
+from {{ project_identifier }}.core.metrics import install_event_handler, stage_latency
+from {{ project_identifier }}.core.parallel_agent import (
+    AGENT_MODE,
+    WEB_TOOL_TIMEOUT_SECONDS,
+    ParallelToolAgent,
+    TimeoutTool,
+)
+from {{ project_identifier }}.core.reference_assets import asset_url
+from {{ project_identifier }}.core.rerank import RERANK_BASELINE_TOP_K, RERANK_CANDIDATES, LexicalReranker
+from {{ project_identifier }}.core.response_cache import SemanticResponseCache
+from {{ project_identifier }}.core.retrieval import HybridRetriever
+from {{ project_identifier }}.core.session_state import SessionState, get_session_state_store, save_session_state
+from {{ project_identifier }}.core.settings import DEFAULT_SETTINGS
+from {{ project_identifier }}.core.vector_store import index_build_id
 
-from llama_index.core import Settings
 from llama_index.core.agent import ReActAgent
 from llama_index.core.tools import FunctionTool, QueryEngineTool
-from llama_index.core import StorageContext, load_index_from_storage
+from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.callbacks import CallbackManager
-from llama_index.core.base.response.schema import StreamingResponse  # noqa
+from llama_index.core.memory.types import BaseMemory
+from llama_index.core.base.response.schema import Response, StreamingResponse  # noqa
+from llama_index.core.schema import QueryBundle
 from llama_index.llms.openai import OpenAI
 from llama_index.tools.tavily_research import TavilyToolSpec
 from llama_index.embeddings.openai import OpenAIEmbedding
@@ -24,36 +46,107 @@ configuration.configure_logging()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 app_name = "{{ project-title }} Multi Step Agent"
-index_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "indices")
-storage_context = StorageContext.from_defaults(persist_dir=index_path)
-index = load_index_from_storage(storage_context)
 
-
-@cl.step(type="tool", name="References")
-async def references_tool(references):
+AGENT_CACHE_SIZE = int(os.environ.get("AGENT_CACHE_SIZE", "16"))
+# Characters of parsed document text per Operator Persona message, further pages are sent on request
+OPERATOR_TEXT_PAGE_SIZE = int(os.environ.get("OPERATOR_TEXT_PAGE_SIZE", "4000"))
+# Answers per session whose remaining pages are kept
+OPERATOR_TEXT_PENDING_MESSAGES = 8
+OPERATOR_TEXT_ACTION = "operator_text_next_page"
+
+# The chainlit handler resolves the current session when an event fires, so one instance serves every session.
+# It is passed to each component explicitly rather than set on `Settings`, which would require a chainlit
+# context for every LlamaIndex call in the process.
+callback_manager = CallbackManager([cl.LlamaIndexCallbackHandler()])
+# Retrieval and LLM calls are timed from the LlamaIndex instrumentation events, for the `/metrics` route
+install_event_handler()
+
+agent_components_cache = LRUCache(max_size=AGENT_CACHE_SIZE)
+response_cache = SemanticResponseCache()
+reranker = LexicalReranker()
+context_packer = ContextPacker()
+_embed_model = None
+_summary_llm = None
+
+
+def get_embed_model() -> CachedEmbedding:
+    """Returns the embedding client shared by every session and profile, behind the query embedding cache."""
+    global _embed_model
+    if _embed_model is None:
+        _embed_model = CachedEmbedding(
+            OpenAIEmbedding(model="text-embedding-3-small"), callback_manager=callback_manager
+        )
+    return _embed_model
+
+
+def get_summary_llm() -> OpenAI:
+    """Returns the LLM client that summarizes older chat turns, shared by every session."""
+    global _summary_llm
+    if _summary_llm is None:
+        # Summaries are written in a worker thread, outside of any chainlit context, so without the callbacks
+        _summary_llm = OpenAI(model=CHAT_SUMMARY_MODEL, temperature=0, max_tokens=512)
+    return _summary_llm
+
+
+def format_reference(reference) -> str:
     """
-    Generates a formatted string of references with their details.
+    Formats the details of one reference as markdown.
 
     Args:
-        references (list): A list of dictionaries, where each dictionary contains
-            information about a reference, including 'score', 'path', 'page_numbers',
-            and 'images'.
+        reference (DocumentReference): The reference, with its 'score', 'path', 'page_numbers' and 'images'.
 
     Returns:
-        str: A formatted string containing the details of each reference.
+        str: The markdown of the reference.
+    """
+    lines = [
+        f"**Score:** {reference.score}",
+        f"**File:** {reference.path.replace('./data/documents/', '')}",
+        f"**Page:** {', '.join(reference.page_numbers)}",
+    ]
+    if reference.images:
+        lines.append("**Images:**")
+        lines.extend(image.path.replace("./data/images/", "") for image in reference.images)
+    return "\n".join(lines) + "\n\n"
+
+
+def paginate_text(text: str, page_size: int) -> List[str]:
     """
-    paragraph = "#### Sources:\n"
-    for reference in references:
-        paragraph += f"**Score:** {reference['score']}\n"
-        paragraph += f"**File:** {reference['path'].replace('./data/documents/', '')}\n"
-        paragraph += f"**Page:** {', '.join(reference['page_numbers'])}\n"
-        if reference["images"]:
-            paragraph += "**Images:**\n"
-            paragraph += "\n".join([f"{img['path'].replace('./data/images/', '')}" for img in reference["images"]])
-        paragraph += "\n\n"
+    Splits a text into pages of at most `page_size` characters, at paragraph or line breaks where possible.
+
+    Args:
+        text (str): The text to split.
+        page_size (int): The maximum number of characters of a page.
 
-    await cl.sleep(1)
-    return paragraph
+    Returns:
+        List[str]: The pages, without leading or trailing blank lines.
+    """
+    pages = []
+    text = text.strip()
+    while len(text) > page_size:
+        cut = text.rfind("\n\n", 0, page_size)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, page_size)
+        if cut <= 0:
+            cut = page_size
+        pages.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pages.append(text)
+    return pages
+
+
+def _operator_text_pages() -> LRUCache:
+    pages = cl.user_session.get("operator_text_pages")
+    if pages is None:
+        pages = LRUCache(max_size=OPERATOR_TEXT_PENDING_MESSAGES)
+        cl.user_session.set("operator_text_pages", pages)
+    return pages
+
+
+def _next_page_action(key: str, page_number: int, num_pages: int):
+    return cl.Action(
+        name=OPERATOR_TEXT_ACTION, value=key, label=f"Show more ({page_number}/{num_pages})", description="Next page"
+    )
 
 
 async def process_response_for_references(response: StreamingResponse, is_operator: bool = False):
@@ -64,6 +157,11 @@ async def process_response_for_references(response: StreamingResponse, is_operat
     elements based on the type of the response (e.g., Pdf, Image), and sends a
     message with the processed content and elements.
 
+    Each reference is streamed to the "References" step as soon as it is resolved. Elements are served by
+    the `/references` routes rather than uploaded with the message: images are shown as thumbnails, and
+    documents and full size images are only downloaded when their link is clicked. The parsed text shown to
+    operators is split into pages of `OPERATOR_TEXT_PAGE_SIZE` characters, the next page is sent on request.
+
     Args:
         response (StreamingResponse): The response object containing source nodes.
         is_operator (bool, optional): Flag indicating if the user is an operator. Defaults to False.
@@ -73,22 +171,61 @@ async def process_response_for_references(response: StreamingResponse, is_operat
     """
     msg = cl.Message(content="", author=cl.user_session.get("chat_profile"))
     if response.source_nodes:
-        response = process_response_metadata_list(response.source_nodes)
-        elements = []
-        for r in response:
-            if r["type"] == "Pdf":
-                elements.append(cl.Pdf(name=r["name"], display="inline", path=r["path"], page=r["page_numbers"][0]))
-            if r["images"]:
-                for img in r["images"]:
-                    elements.append(cl.Image(name=img["name"], display="inline", path=img["path"], size="small"))
-            if is_operator:
-                if msg.content:
-                    msg.content = f'{msg.content}\n\n{r["text"]}'
-                else:
-                    msg.content = r["text"]
-
+        references = process_response_metadata_list(response.source_nodes)
+        elements, links = [], []
+        async with cl.Step(name="References", type="tool") as step:
+            await step.stream_token("#### Sources:\n")
+            for document_number, r in enumerate(references, start=1):
+                # Documents and full size images are URLs the browser only fetches when opened from the links
+                if r.type == "Pdf":
+                    document_url = asset_url("documents", r.path)
+                    elements.append(cl.Pdf(name=r.name, display="side", url=document_url, page=r.page_numbers[0]))
+                full_size_names = []
+                for image_number, img in enumerate(r.images, start=1):
+                    thumbnail_url = asset_url("thumbnails", img.path)
+                    elements.append(cl.Image(name=img.name, display="inline", url=thumbnail_url, size="small"))
+                    full_size_name = f"figure {document_number}.{image_number}"
+                    elements.append(cl.Image(name=full_size_name, display="side", url=asset_url("images", img.path)))
+                    full_size_names.append(full_size_name)
+                links.append(f"{r.name} (page {', '.join(r.page_numbers)})")
+                if full_size_names:
+                    links[-1] += f": {', '.join(full_size_names)}"
+                await step.stream_token(format_reference(r))
+
+        content = []
+        if is_operator:
+            pages = paginate_text("\n\n".join(r.text.strip() for r in references), OPERATOR_TEXT_PAGE_SIZE)
+            if pages:
+                content.append(pages[0])
+            if len(pages) > 1:
+                key = str(uuid.uuid4())
+                _operator_text_pages().put(key, (pages[1:], len(pages)))
+                msg.actions = [_next_page_action(key, 2, len(pages))]
+        content.append("\n".join(links))
+        msg.content = "\n\n".join(content)
         msg.elements = elements
-        await references_tool(response)
+    await msg.send()
+
+
+async def send_next_operator_text_page(action):
+    """
+    Sends the next page of the parsed text of an Operator Persona answer, when its "Show more" action is clicked.
+
+    Args:
+        action (cl.Action): The clicked action, its value identifies the answer.
+
+    Returns:
+        None
+    """
+    await action.remove()
+    pending = _operator_text_pages().pop(action.value)
+    if pending is None:
+        return
+    (page, *remaining), num_pages = pending
+    msg = cl.Message(content=page, author=cl.user_session.get("chat_profile"))
+    if remaining:
+        _operator_text_pages().put(action.value, (remaining, num_pages))
+        msg.actions = [_next_page_action(action.value, num_pages - len(remaining) + 1, num_pages)]
     await msg.send()
 
 
@@ -111,70 +248,76 @@ async def user_message_from_token_list(token_list: List[str]):
     await msg.send()
 
 
-async def select_agent(chat_profile, settings) -> None:
-    """
-    Selects and initializes an agent based on the provided chat profile and settings.
+def add(x: int, y: int) -> int:
+    """Useful function to add two numbers."""
+    return x + y
 
-    Args:
-        chat_profile (dict): The chat profile data used to customize the agent.
-        settings (dict): A dictionary containing configuration settings for the agent, including:
-            - "Model": The model name to be used by the OpenAI API.
-            - "Temperature": The temperature setting for the OpenAI model.
 
-    Returns:
-        None
-    """
-    model = settings["Model"]
-    temperature = settings["Temperature"]
+def multiply(x: int, y: int) -> int:
+    """Useful function to multiply two numbers."""
+    return x * y
 
-    def add(x: int, y: int) -> int:
-        """Useful function to add two numbers."""
-        return x + y
 
-    def multiply(x: int, y: int) -> int:
-        """Useful function to multiply two numbers."""
-        return x * y
+def build_agent_components(profile: dict, model: str, temperature: float, current_date: str) -> dict:
+    """
+    Builds the session-independent parts of an agent: the LLM client, the query engine and the tools.
 
-    tavily_tool_spec = TavilyToolSpec(
-        api_key=os.environ.get("TAVILY_API_KEY"),
-    )
+    Nothing returned here holds conversation state, so one set of components is shared by every session
+    with the same profile, model and temperature.
 
-    profile = await find_profile_data(chat_profile)
+    Args:
+        profile (dict): The chat profile data, its "prompt" is used as the system prompt.
+        model (str): The model name to be used by the OpenAI API.
+        temperature (float): The temperature setting for the OpenAI model.
+        current_date (str): Today's date, quoted in the description of the web search tool.
 
+    Returns:
+        dict: The "llm", "query_engine" and "tools" of the agent.
+    """
     llm = OpenAI(
-        model=model, temperature=temperature, max_tokens=2048, streaming=True, system_prompt=profile.get("prompt")
+        model=model,
+        temperature=temperature,
+        max_tokens=2048,
+        streaming=True,
+        system_prompt=profile.get("prompt"),
+        callback_manager=callback_manager,
     )
 
-    Settings.llm = llm
-    embed_model = OpenAIEmbedding(model="text-embedding-3-small")
-    Settings.embed_model = embed_model
-
-    Settings.callback_manager = CallbackManager([cl.LlamaIndexCallbackHandler()])
-
-    query_engine = index.as_query_engine(
-        similarity_top_k=5,
-        streaming=True,
+    # Many candidates are retrieved cheaply, the re-ranker only passes the best few on, packed into a token budget
+    retriever = HybridRetriever.from_index(
+        index_registry.get(),
+        embed_model=get_embed_model(),
+        similarity_top_k=RERANK_CANDIDATES or RERANK_BASELINE_TOP_K,
+        callback_manager=callback_manager,
+    )
+    query_engine_args = dict(
+        node_postprocessors=([reranker] if RERANK_CANDIDATES else []) + [context_packer],
         llm=llm,
-        embed_model=embed_model,
         response_mode="compact",
         verbose=True,
         system_prompt=profile.get("prompt"),
+        callback_manager=callback_manager,
     )
+    query_engine = RetrieverQueryEngine.from_args(retriever, streaming=True, **query_engine_args)
+    # The Search tool hands the whole answer to the agent. A streaming response would be read by `str()`, which
+    # drains it in a nested event loop that blocks the running one and cannot be cancelled by the tool timeout
+    search_query_engine = RetrieverQueryEngine.from_args(retriever, streaming=False, **query_engine_args)
 
     multiply_tool = FunctionTool.from_defaults(fn=multiply)
 
     add_tool = FunctionTool.from_defaults(fn=add)
 
     ybor_tool = QueryEngineTool.from_defaults(
-        query_engine,
+        search_query_engine,
         name="Search",
         description="Useful for answering questions. Do not use if questions are about you. Try not to condense the question and provide a detailed answer.",
     )
 
+    tavily_tool_spec = TavilyToolSpec(
+        api_key=os.environ.get("TAVILY_API_KEY"),
+    )
     tl = tavily_tool_spec.to_tool_list()[0]
 
-    current_date = datetime.now().strftime("%Y-%m-%d")
-
     search_tool = FunctionTool.from_defaults(
         fn=tl.fn,
         async_fn=tl.async_fn,
@@ -182,15 +325,156 @@ async def select_agent(chat_profile, settings) -> None:
         description=f"Useful when 'web, google' keywords are mentioned. Today's data is {current_date}",
     )
 
-    agent = ReActAgent.from_tools(
-        [multiply_tool, add_tool, ybor_tool, search_tool],
+    # A slow tool call ends in an error output the LLM can answer around, rather than holding up the answer
+    tools = [
+        TimeoutTool(multiply_tool),
+        TimeoutTool(add_tool),
+        TimeoutTool(ybor_tool),
+        TimeoutTool(search_tool, timeout_seconds=WEB_TOOL_TIMEOUT_SECONDS),
+    ]
+    return {"llm": llm, "query_engine": query_engine, "tools": tools}
+
+
+def get_agent_components(profile: dict, model: str, temperature: float) -> dict:
+    """
+    Returns the cached agent components for a profile, model and temperature, building them on a miss.
+
+    Blocks until the shared index is loaded when the components have to be built.
+    """
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    # The date is part of the key so the web tool description never goes stale, yesterday's entries age out
+    key = (profile.get("name"), model, temperature, current_date)
+    components = agent_components_cache.get_or_create(
+        key, lambda: build_agent_components(profile, model, temperature, current_date)
+    )
+    logger.debug(f"Agent components cache: {agent_components_cache.stats()}")
+    logger.debug(f"Query embedding cache: {get_embed_model().stats()}")
+    return components
+
+
+def create_agent(
+    components: dict, prompt: Optional[str], memory: BaseMemory, callback_manager: Optional[CallbackManager] = None
+):
+    """
+    Creates the agent of a session over shared agent components.
+
+    With `AGENT_MODE=parallel` and a function calling model, the agent runs the independent tool calls of a
+    step concurrently, otherwise it is a ReAct agent.
+
+    Args:
+        components (dict): The "llm" and "tools" of the agent, see `build_agent_components`.
+        prompt (str, optional): The system prompt of the chat profile.
+        memory (BaseMemory): The chat memory of the session.
+        callback_manager (CallbackManager, optional): Receives the events of the agent.
+
+    Returns:
+        The agent.
+    """
+    if AGENT_MODE == "parallel" and components["llm"].metadata.is_function_calling_model:
+        return ParallelToolAgent.from_tools(
+            components["tools"],
+            llm=components["llm"],
+            system_prompt=prompt,
+            memory=memory,
+            callback_manager=callback_manager,
+            verbose=True,
+        )
+    return ReActAgent.from_tools(
+        components["tools"],
         verbose=True,
-        llm=llm,
-        context=profile.get("prompt"),
+        llm=components["llm"],
+        context=prompt,
+        memory=memory,
+        callback_manager=callback_manager,
     )
 
+
+async def select_agent(chat_profile, settings) -> None:
+    """
+    Selects and initializes an agent based on the provided chat profile and settings.
+
+    The LLM client, tools and query engine come from a cache shared across sessions. Only the agent itself,
+    which owns the chat memory, is created per session (see `create_agent`).
+
+    The chat profile, the settings and the thread of the chat history are saved to the session state store,
+    so any app process can rebuild the agent (see `restore_agent`). The chat memory reads the history of the
+    thread from the chat store, so rebuilding the agent keeps the conversation.
+
+    Args:
+        chat_profile (dict): The chat profile data used to customize the agent.
+        settings (dict): A dictionary containing configuration settings for the agent, including:
+            - "Model": The model name to be used by the OpenAI API.
+            - "Temperature": The temperature setting for the OpenAI model.
+
+    Returns:
+        None
+    """
+    with stage_latency.time("agent_build"):
+        session = cl.context.session
+        state = save_session_state(session.id, chat_profile, settings, session.thread_id)
+
+        profile = await find_profile_data(chat_profile)
+        components = await cl.make_async(get_agent_components)(profile, settings["Model"], settings["Temperature"])
+        memory = session_memory(state.thread_id, llm=get_summary_llm())
+        agent = create_agent(components, profile.get("prompt"), memory, callback_manager=callback_manager)
+
     cl.user_session.set("agent", agent)
-    cl.user_session.set("query_engine", query_engine)
+    cl.user_session.set("query_engine", components["query_engine"])
+
+
+async def restore_agent():
+    """
+    Rebuilds the agent of the session from the session state store, when the session has no agent in this
+    process, e.g. because the load balancer moved it here from another pod. A session without state gets the
+    default settings.
+
+    Returns:
+        The agent.
+    """
+    state = get_session_state_store().get(cl.context.session.id)
+    if state is None:
+        state = SessionState(chat_profile=cl.user_session.get("chat_profile"), settings=DEFAULT_SETTINGS)
+    logger.info(f"Restoring the agent of session {cl.context.session.id} from {state}")
+    await select_agent(state.chat_profile, state.settings)
+    return cl.user_session.get("agent")
+
+
+async def query_with_response_cache(query_engine, query: str):
+    """
+    Answers an Operator query from the semantic response cache, or from the query engine on a miss.
+
+    The query is embedded once: the embedding is both the cache key and the retrieval query vector.
+
+    Args:
+        query_engine (RetrieverQueryEngine): The session's query engine, cached responses are not shared
+            with other query engines.
+        query (str): The user's query.
+
+    Returns:
+        Response or AsyncStreamingResponse: The cached response on a hit, the query engine's response otherwise.
+    """
+    embedding = await get_embed_model().aget_query_embedding(query)
+    build_id = index_build_id(index_registry.get())
+    response = response_cache.lookup(embedding, namespace=query_engine, build_id=build_id)
+    if response is None:
+        started = time.perf_counter()
+        response = await query_engine.aquery(QueryBundle(query_str=query, embedding=embedding))
+        cached = Response(
+            response=getattr(response, "response_txt", None) or getattr(response, "response", None),
+            source_nodes=response.source_nodes,
+            metadata=response.metadata,
+        )
+        response_cache.put(
+            embedding,
+            cached,
+            namespace=query_engine,
+            build_id=build_id,
+            latency_seconds=time.perf_counter() - started,
+        )
+    logger.debug(f"Response cache: {response_cache.stats()}")
+    logger.debug(f"Re-ranker: {reranker.stats()}")
+    logger.debug(f"Context packer: {context_packer.stats()}")
+    return response
 
 
 def execute():
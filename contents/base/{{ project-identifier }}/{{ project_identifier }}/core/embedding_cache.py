@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, List, Optional
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+from {{ project_identifier }}.core.metrics import stage_latency
+from {{ project_identifier }}.utils.cache import LRUCache
+
+# Embeddings kept in memory per process
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 4096))
+# SQLite file of the persistent tier, shared by workers and restarts. Empty disables it.
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "")
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode (NFKC) and whitespace normalization, so trivially different spellings share a cache entry."""
+    return _whitespace.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class SQLiteEmbeddingStore:
+    """
+    Persistent key to float32 vector store in a single SQLite table.
+
+    Args:
+        path (str): The database file, created if missing.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._connection.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32).tolist() if row else None
+
+    def put(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, np.asarray(embedding, dtype=np.float32).tobytes()),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper that answers repeated texts from an in-memory LRU and an optional SQLite tier
+    before calling the wrapped model.
+
+    Entries are keyed by the model name, the kind of embedding (query or text) and the normalized text.
+    Embeddings are stored as float32, which is the precision the vector store searches with. Async lookups
+    run the SQLite tier on a worker thread, off the event loop.
+
+    Args:
+        embed_model (BaseEmbedding): The model that computes embeddings on a miss.
+        max_size (int, optional): In-memory entries. Defaults to `EMBEDDING_CACHE_SIZE`.
+        path (str, optional): SQLite file of the persistent tier. Defaults to `EMBEDDING_CACHE_PATH`,
+            an empty path keeps the cache in memory only.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _memory: LRUCache = PrivateAttr()
+    _disk: Optional[SQLiteEmbeddingStore] = PrivateAttr()
+    _stats_lock: Any = PrivateAttr()
+    _disk_hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        max_size: int = EMBEDDING_CACHE_SIZE,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        **kwargs: Any,
+    ) -> None:
+        kwargs.setdefault("embed_batch_size", embed_model.embed_batch_size)
+        super().__init__(model_name=embed_model.model_name, **kwargs)
+        self._embed_model = embed_model
+        self._memory = LRUCache(max_size=max_size)
+        self._disk = SQLiteEmbeddingStore(path) if path else None
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _lookup_disk(self, key: str) -> Optional[Embedding]:
+        embedding = self._disk.get(key)
+        if embedding is not None:
+            self._memory.put(key, embedding)
+            with self._stats_lock:
+                self._disk_hits += 1
+        return embedding
+
+    def _count_miss(self, embedding: Optional[Embedding]) -> Optional[Embedding]:
+        if embedding is None:
+            with self._stats_lock:
+                self._misses += 1
+        return embedding
+
+    def _lookup(self, key: str) -> Optional[Embedding]:
+        embedding = self._memory.get(key)
+        if embedding is None and self._disk is not None:
+            embedding = self._lookup_disk(key)
+        return self._count_miss(embedding)
+
+    async def _alookup(self, key: str) -> Optional[Embedding]:
+        embedding = self._memory.get(key)
+        if embedding is None and self._disk is not None:
+            # SQLite waits on its lock and on WAL fsyncs, which would stall every session of the event loop
+            embedding = await asyncio.to_thread(self._lookup_disk, key)
+        return self._count_miss(embedding)
+
+    def _store_memory(self, key: str, embedding: Embedding) -> Embedding:
+        # Round-trip through float32 so memory and disk hits return identical values
+        embedding = np.asarray(embedding, dtype=np.float32).tolist()
+        self._memory.put(key, embedding)
+        return embedding
+
+    def _store(self, key: str, embedding: Embedding) -> Embedding:
+        embedding = self._store_memory(key, embedding)
+        if self._disk is not None:
+            self._disk.put(key, embedding)
+        return embedding
+
+    async def _astore(self, key: str, embedding: Embedding) -> Embedding:
+        embedding = self._store_memory(key, embedding)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.put, key, embedding)
+        return embedding
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        with stage_latency.time("query_embedding"):
+            key = self._key("query", query)
+            embedding = self._lookup(key)
+            if embedding is None:
+                embedding = self._store(key, self._embed_model.get_query_embedding(query))
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        with stage_latency.time("query_embedding"):
+            key = self._key("query", query)
+            embedding = await self._alookup(key)
+            if embedding is None:
+                embedding = await self._astore(key, await self._embed_model.aget_query_embedding(query))
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys = [self._key("text", text) for text in texts]
+        embeddings = [self._lookup(key) for key in keys]
+        missing = [position for position, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._embed_model.get_text_embedding_batch([texts[position] for position in missing])
+            for position, embedding in zip(missing, computed):
+                embeddings[position] = self._store(keys[position], embedding)
+        return embeddings
+
+    def stats(self) -> dict:
+        """Returns the hit counts of both tiers, the misses that reached the wrapped model and the hit rate."""
+        memory_hits = self._memory.hits
+        lookups = memory_hits + self._disk_hits + self._misses
+        return {
+            "memory_hits": memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": (memory_hits + self._disk_hits) / lookups if lookups else 0.0,
+            "memory_size": len(self._memory),
+        }
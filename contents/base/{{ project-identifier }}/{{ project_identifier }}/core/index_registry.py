@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+from loguru import logger
+
+from {{ project_identifier }}.core.vector_store import load_vector_index
+from {{ project_identifier }}.utils.common import current_rss_mb
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "indices")
+
+
+class IndexRegistry:
+    """
+    Holds the single, lazily loaded index shared by every module of the process.
+
+    The first caller of `get` (or the background thread started by `warm_up`) loads the index, every
+    other caller waits for that load and receives the same instance. `is_ready` is the readiness signal
+    exposed to Kubernetes.
+
+    Usage:
+    ```
+    index_registry.warm_up()  # at startup, returns immediately
+    index = index_registry.get()  # blocks until the index is loaded
+    ```
+    """
+
+    def __init__(self, index_path, loader=load_vector_index):
+        self.index_path = index_path
+        self.loader = loader
+        self.load_seconds = None
+        self.rss_delta_mb = None
+        self._index = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set() and self._error is None
+
+    @property
+    def error(self):
+        return self._error
+
+    def get(self):
+        """
+        Returns the index, loading it on first use.
+
+        Raises:
+            Exception: The error raised by the loader, if loading failed.
+        """
+        if not self._ready.is_set():
+            with self._lock:
+                if not self._ready.is_set():
+                    self._load()
+        if self._error is not None:
+            raise self._error
+        return self._index
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Starts loading the index in a daemon thread so the server can come up while the index loads.
+        """
+        thread = threading.Thread(target=self._warm_up, name="index-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        try:
+            self.get()
+        except Exception:
+            # Already logged by `_load`, readiness stays negative
+            pass
+
+    def _load(self):
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        try:
+            self._index = self.loader(self.index_path)
+        except Exception as e:
+            logger.exception(f"Failed to load the index from {self.index_path}: {e}")
+            self._error = e
+        else:
+            self.load_seconds = time.perf_counter() - start
+            self.rss_delta_mb = current_rss_mb() - rss_before
+            logger.info(
+                f"Index loaded from {self.index_path} in {self.load_seconds:.2f}s, RSS +{self.rss_delta_mb:.1f} MB"
+            )
+        finally:
+            self._ready.set()
+
+
+index_registry = IndexRegistry(INDEX_PATH)
@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from pydantic import PrivateAttr
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatInProgressEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionInProgressEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.retrieval import RetrievalEndEvent, RetrievalStartEvent
+
+from {{ project_identifier }}.utils.cache import LRUCache
+
+# Upper bounds in seconds, from cache hits to slow generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# The stages of a turn. They nest: retrieval includes the query embedding, the turn includes everything.
+# "llm_*" are per LLM call, "answer_first_token" is the wait of the user from the message to the first token
+STAGES = (
+    "agent_build",
+    "query_embedding",
+    "retrieval",
+    "llm_first_token",
+    "llm_generation",
+    "answer_first_token",
+    "references",
+    "message_send",
+    "turn",
+)
+
+
+class LatencyHistograms:
+    """
+    Thread-safe latency histograms, one per label value, rendered in the Prometheus text format.
+
+    Durations are measured with the monotonic `time.perf_counter`. Recording one is a bucket lookup and three
+    increments under a lock, so histograms are always on.
+
+    Usage:
+    ```
+    histograms = LatencyHistograms("stage_duration_seconds", "Duration of a stage.", label="stage")
+    with histograms.time("retrieval"):
+        nodes = retriever.retrieve(query)
+    histograms.snapshot()  # {"retrieval": {"count": 1, "sum": 0.0123, "buckets": [0, 0, 1, ...]}}
+    histograms.render()  # ["# HELP stage_duration_seconds ...", 'stage_duration_seconds_bucket{stage="retrieval",...']
+    ```
+
+    Args:
+        name (str): The metric name.
+        description (str): The help text of the metric.
+        label (str): The label whose values have a histogram each.
+        buckets (Sequence[float], optional): Ascending upper bounds in seconds. Defaults to `DEFAULT_BUCKETS`.
+        values (Sequence[str], optional): Label values rendered before their first observation.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        values: Sequence[str] = (),
+    ):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Per label value: the count of every bucket, the last one past the largest bound, and the sum
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        for value in values:
+            self._counts[value] = [0] * (len(self.buckets) + 1)
+            self._sums[value] = 0.0
+
+    def observe(self, value: str, seconds: float):
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._counts.get(value)
+            if counts is None:
+                counts = self._counts[value] = [0] * (len(self.buckets) + 1)
+                self._sums[value] = 0.0
+            counts[position] += 1
+            self._sums[value] += seconds
+
+    @contextmanager
+    def time(self, value: str) -> Iterator[None]:
+        """Records the duration of the block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(value, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Returns the count, sum and cumulative bucket counts of every label value."""
+        with self._lock:
+            counts = {value: list(value_counts) for value, value_counts in self._counts.items()}
+            sums = dict(self._sums)
+        snapshot = {}
+        for value, value_counts in counts.items():
+            cumulative, total = [], 0
+            for count in value_counts:
+                total += count
+                cumulative.append(total)
+            snapshot[value] = {"count": total, "sum": sums[value], "buckets": cumulative}
+        return snapshot
+
+    def render(self, snapshot: Optional[Dict[str, dict]] = None) -> List[str]:
+        """Renders the histograms, or a snapshot of them, e.g. merged from several processes."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for value, histogram in sorted((self.snapshot() if snapshot is None else snapshot).items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(bounds, histogram["buckets"]):
+                lines.append(_sample(f"{self.name}_bucket", f'{label},le="{bound}"', count))
+            lines.append(_sample(f"{self.name}_sum", label, f"{histogram['sum']:.6f}"))
+            lines.append(_sample(f"{self.name}_count", label, histogram["count"]))
+        return lines
+
+
+def _sample(name: str, labels: str, value: Any) -> str:
+    """A line of the Prometheus text format, e.g. `agent_stage_duration_seconds_count{stage="turn"} 3`."""
+    # Joined, not formatted: archetect renders this file as a Jinja template, which reads doubled braces as tags
+    return "".join((name, "{", labels, "} ", str(value)))
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, dict]]) -> Dict[str, dict]:
+    """Adds up snapshots of histograms with the same buckets, e.g. of the same histograms in several processes."""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for value, histogram in snapshot.items():
+            total = merged.setdefault(value, {"count": 0, "sum": 0.0, "buckets": [0] * len(histogram["buckets"])})
+            total["count"] += histogram["count"]
+            total["sum"] += histogram["sum"]
+            total["buckets"] = [count + other for count, other in zip(total["buckets"], histogram["buckets"])]
+    return merged
+
+
+stage_latency = LatencyHistograms(
+    "agent_stage_duration_seconds", "Duration of the stages of a chat turn in seconds.", label="stage", values=STAGES
+)
+
+
+class StageLatencyEventHandler(BaseEventHandler):
+    """
+    Records the retrieval and LLM stages of every LlamaIndex call from its instrumentation events.
+
+    A start event and its end event share the span of the instrumented call. LLM calls record the time to their
+    first streamed token, if they stream, and their total generation time. LLMs that implement chat through
+    completion, unlike the OpenAI client, record both calls. Starts whose end never comes, e.g. of abandoned
+    streams, are dropped from a bounded cache.
+    """
+
+    _started: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._started = LRUCache(max_size=1024)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StageLatencyEventHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> Any:
+        if event.span_id is None:
+            return
+        now = time.perf_counter()
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            self._started.put(("llm", event.span_id), [now, False])
+        elif isinstance(event, (LLMChatInProgressEvent, LLMCompletionInProgressEvent)):
+            started = self._started.get(("llm", event.span_id))
+            if started is not None and not started[1]:
+                started[1] = True
+                stage_latency.observe("llm_first_token", now - started[0])
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            started = self._started.pop(("llm", event.span_id))
+            if started is not None:
+                stage_latency.observe("llm_generation", now - started[0])
+        elif isinstance(event, RetrievalStartEvent):
+            self._started.put(("retrieval", event.span_id), [now, False])
+        elif isinstance(event, RetrievalEndEvent):
+            started = self._started.pop(("retrieval", event.span_id))
+            if started is not None:
+                stage_latency.observe("retrieval", now - started[0])
+
+
+_event_handler = None
+
+
+def install_event_handler():
+    """Registers the `StageLatencyEventHandler` with the root LlamaIndex dispatcher, once per process."""
+    global _event_handler
+    if _event_handler is None:
+        _event_handler = StageLatencyEventHandler()
+        get_dispatcher().add_event_handler(_event_handler)
+
+
+# Returns the stage latency snapshots of the other worker processes of the server, set by `serve.py`
+_worker_snapshots: Optional[Callable[[], Awaitable[List[Dict[str, dict]]]]] = None
+
+
+def set_worker_snapshots(source: Callable[[], Awaitable[List[Dict[str, dict]]]]):
+    """Makes `render_server_metrics` add the histograms of the other workers, fetched by `source`."""
+    global _worker_snapshots
+    _worker_snapshots = source
+
+
+def render_metrics(snapshots: Sequence[Dict[str, dict]] = ()) -> str:
+    """
+    Returns the metrics of the process in the Prometheus text exposition format.
+
+    Args:
+        snapshots (Sequence[Dict[str, dict]], optional): Stage latency snapshots of other processes, added to
+            the histograms of this one.
+    """
+    snapshot = merge_snapshots([stage_latency.snapshot(), *snapshots]) if snapshots else None
+    return "\n".join(stage_latency.render(snapshot)) + "\n"
+
+
+async def render_server_metrics() -> str:
+    """Returns the metrics of all worker processes of the server, added up, or of this process without workers."""
+    return render_metrics(await _worker_snapshots() if _worker_snapshots is not None else ())
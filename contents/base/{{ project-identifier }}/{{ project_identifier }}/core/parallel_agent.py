@@ -0,0 +1,217 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import partial
+from typing import Any, List, Optional
+
+from loguru import logger
+
+from llama_index.core.agent.function_calling.step import FunctionCallingAgentWorker
+from llama_index.core.agent.runner.base import AgentRunner
+from llama_index.core.agent.types import Task, TaskStep, TaskStepOutput
+from llama_index.core.agent.utils import add_user_step_to_memory
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.chat_engine.types import AgentChatResponse, StreamingAgentChatResponse
+from llama_index.core.memory.types import BaseMemory
+from llama_index.core.tools import AsyncBaseTool, BaseTool, ToolMetadata, ToolOutput, adapt_to_async_tool
+
+# "react" reasons and calls one tool per LLM round trip, "parallel" lets function calling models request several
+# independent tool calls per round trip and runs them concurrently
+AGENT_MODE = os.environ.get("AGENT_MODE", "react")
+# Seconds a tool call may take before the agent goes on without its result
+TOOL_TIMEOUT_SECONDS = float(os.environ.get("TOOL_TIMEOUT_SECONDS", 30))
+WEB_TOOL_TIMEOUT_SECONDS = float(os.environ.get("WEB_TOOL_TIMEOUT_SECONDS", 15))
+# Tool calls of one question, beyond which the agent answers with what it has
+MAX_TOOL_CALLS = int(os.environ.get("MAX_TOOL_CALLS", 8))
+
+
+class TimeoutTool(AsyncBaseTool):
+    """
+    Bounds the async calls of a tool by a timeout. A call that times out returns an error output telling the
+    LLM the tool did not answer, instead of holding up the other tool calls and the answer.
+
+    The wrapped call is cancelled. Sync functions run in a worker thread, which finishes in the background.
+
+    Usage:
+    ```
+    tool = TimeoutTool(web_tool, timeout_seconds=15)
+    output = await tool.acall(query="...")  # output.is_error after 15 seconds
+    tool.stats()  # {"calls": 1, "timeouts": 1, "errors": 0, "mean_ms": 15001.2}
+    ```
+
+    Args:
+        tool (BaseTool): The tool to wrap, its metadata is kept.
+        timeout_seconds (float, optional): Seconds per call. Defaults to `TOOL_TIMEOUT_SECONDS`.
+    """
+
+    def __init__(self, tool: BaseTool, timeout_seconds: float = TOOL_TIMEOUT_SECONDS):
+        self.tool = tool
+        self.timeout_seconds = timeout_seconds
+        self._async_tool = adapt_to_async_tool(tool)
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self.tool.metadata
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        return self.tool(*args, **kwargs)
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            output = await asyncio.wait_for(self._async_tool.acall(*args, **kwargs), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"Tool {self.metadata.name} timed out after {self.timeout_seconds} seconds")
+            output = ToolOutput(
+                content=f"The {self.metadata.name} tool did not answer within {self.timeout_seconds:g} seconds.",
+                tool_name=self.metadata.name,
+                raw_input={"args": args, "kwargs": kwargs},
+                raw_output=None,
+                is_error=True,
+            )
+        with self._lock:
+            self._counters.update(
+                calls=1,
+                timeouts=int(timed_out),
+                errors=int(output.is_error and not timed_out),
+                call_microseconds=int((time.perf_counter() - started) * 1e6),
+            )
+        return output
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        calls = counters.get("calls", 0)
+        return {
+            "calls": calls,
+            "timeouts": counters.get("timeouts", 0),
+            "errors": counters.get("errors", 0),
+            "mean_ms": round(counters.get("call_microseconds", 0) / 1000 / calls, 3) if calls else 0.0,
+        }
+
+
+class ParallelToolAgentWorker(FunctionCallingAgentWorker):
+    """
+    Function calling agent worker that streams its final answer.
+
+    Every step, the LLM may request several tool calls at once, which run concurrently. The step's LLM response
+    is streamed: tool calls are collected until the stream ends, while an answer is passed on as it arrives.
+    """
+
+    async def astream_step(self, step: TaskStep, task: Task, **kwargs: Any) -> TaskStepOutput:
+        if step.input is not None:
+            add_user_step_to_memory(step, task.extra_state["new_memory"], verbose=self._verbose)
+        tools = self.get_tools(task.input)
+        chat_stream = await self._llm.astream_chat_with_tools(
+            tools=tools,
+            user_msg=None,
+            chat_history=self.get_all_messages(task),
+            verbose=self._verbose,
+            allow_parallel_tool_calls=self.allow_parallel_tool_calls,
+        )
+        # Tool call deltas carry no text, the first text delta starts the answer
+        response = None
+        async for response in chat_stream:
+            if response.delta and not response.message.additional_kwargs.get("tool_calls"):
+                return await self._stream_answer(step, task, self._prepend(response, chat_stream))
+
+        tool_calls = self._llm.get_tool_calls_from_response(response, error_on_no_tool_call=False) if response else []
+        if not tool_calls or task.extra_state["n_function_calls"] >= self._max_function_calls:
+            content = (response.message.content or "") if response else ""
+            answer = ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=content)
+            return await self._stream_answer(step, task, self._prepend(answer, None))
+
+        task.extra_state["new_memory"].put(response.message)
+        tool_outputs: List[ToolOutput] = []
+        started = time.perf_counter()
+        return_directs = await asyncio.gather(
+            *[
+                self._acall_function(
+                    tools, tool_call, task.extra_state["new_memory"], tool_outputs, verbose=self._verbose
+                )
+                for tool_call in tool_calls
+            ]
+        )
+        names = ", ".join(tool_call.tool_name for tool_call in tool_calls)
+        logger.debug(f"Ran {len(tool_calls)} tool calls ({names}) in {(time.perf_counter() - started) * 1000:.0f} ms")
+        task.extra_state["sources"].extend(tool_outputs)
+        task.extra_state["n_function_calls"] += len(tool_calls)
+
+        if len(return_directs) == 1 and return_directs[0]:
+            output = AgentChatResponse(response=str(tool_outputs[-1].content), sources=tool_outputs)
+            output.is_dummy_stream = True
+            return TaskStepOutput(output=output, task_step=step, is_last=True, next_steps=[])
+        return TaskStepOutput(
+            output=AgentChatResponse(response="", sources=tool_outputs),
+            task_step=step,
+            is_last=False,
+            next_steps=[step.get_next_step(step_id=str(uuid.uuid4()), input=None)],
+        )
+
+    @staticmethod
+    async def _prepend(response: ChatResponse, chat_stream):
+        yield response
+        if chat_stream is not None:
+            async for response in chat_stream:
+                yield response
+
+    async def _stream_answer(self, step: TaskStep, task: Task, answer_stream) -> TaskStepOutput:
+        output = StreamingAgentChatResponse(achat_stream=answer_stream, sources=task.extra_state["sources"])
+        # The answer is written to memory once streamed, like the ReAct agent does
+        asyncio.create_task(
+            output.awrite_response_to_history(
+                task.extra_state["new_memory"], on_stream_end_fn=partial(self.finalize_task, task)
+            )
+        )
+        output._ensure_async_setup()
+        await output.is_function_false_event.wait()
+        return TaskStepOutput(output=output, task_step=step, is_last=True, next_steps=[])
+
+
+class ParallelToolAgent(AgentRunner):
+    """
+    Agent that lets the LLM plan several independent tool calls in one step and runs them concurrently.
+
+    A question that needs both the Search and the Web tool costs the slower of the two tools and one LLM round
+    trip, instead of both tools and two round trips. Needs a function calling LLM. Wrap the tools in
+    `TimeoutTool` so that a slow tool does not hold up the answer.
+
+    Usage:
+    ```
+    tools = [TimeoutTool(search_tool), TimeoutTool(web_tool, timeout_seconds=15)]
+    agent = ParallelToolAgent.from_tools(tools, llm=llm, system_prompt=prompt)
+    response = await agent.astream_chat("...")
+    ```
+    """
+
+    @classmethod
+    def from_tools(
+        cls,
+        tools: List[BaseTool],
+        llm,
+        system_prompt: Optional[str] = None,
+        max_function_calls: int = MAX_TOOL_CALLS,
+        memory: Optional[BaseMemory] = None,
+        callback_manager: Optional[CallbackManager] = None,
+        verbose: bool = False,
+    ) -> "ParallelToolAgent":
+        agent_worker = ParallelToolAgentWorker.from_tools(
+            tools,
+            llm=llm,
+            verbose=verbose,
+            max_function_calls=max_function_calls,
+            callback_manager=callback_manager,
+            system_prompt=system_prompt,
+            allow_parallel_tool_calls=True,
+        )
+        return cls(
+            agent_worker=agent_worker, memory=memory, llm=llm, callback_manager=callback_manager, verbose=verbose
+        )
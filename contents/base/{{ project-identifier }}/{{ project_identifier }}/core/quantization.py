@@ -0,0 +1,173 @@
+import json
+import os
+
+import numpy as np
+
+from {{ project_identifier }}.core.ann import assign, kmeans
+from {{ project_identifier }}.core.search import normalize_rows, top_k_rows
+
+PQ_MANIFEST = "pq.json"
+PQ_CODEBOOKS_FILE_NAME = "pq_codebooks.npy"
+PQ_CODES_FILE_NAME = "pq_codes.npy"
+
+
+class ProductQuantizer:
+    """
+    Product quantizer: splits every vector into `num_subspaces` sub-vectors and stores each one as the
+    one-byte id of its nearest centroid in that subspace.
+
+    A 1536 dimensional float32 embedding (6144 bytes) compressed with 96 subspaces takes 96 bytes. Queries
+    are scored against the codes with asymmetric distance computation: the query stays in float32, its
+    inner product with every centroid is tabulated once, and a node's score is the sum of its table entries.
+    """
+
+    def __init__(self, codebooks: np.ndarray):
+        # (num_subspaces, num_centroids, subspace_dim)
+        self.codebooks = codebooks
+
+    @property
+    def num_subspaces(self) -> int:
+        return int(self.codebooks.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.codebooks.shape[0] * self.codebooks.shape[2])
+
+    @classmethod
+    def train(
+        cls, vectors, num_subspaces: int = 96, num_centroids: int = 256, iterations: int = 10, seed: int = 0
+    ) -> "ProductQuantizer":
+        """
+        Trains one k-means codebook per subspace.
+
+        Args:
+            vectors (np.ndarray): A (num_nodes, dim) matrix, `dim` must be divisible by `num_subspaces`.
+            num_subspaces (int, optional): Bytes per encoded vector. Defaults to 96.
+            num_centroids (int, optional): Centroids per subspace, at most 256 so codes fit in a byte.
+        """
+        num_vectors, dim = vectors.shape
+        if dim % num_subspaces:
+            raise ValueError(f"Dimension {dim} is not divisible by {num_subspaces} subspaces.")
+        if not 0 < num_centroids <= 256:
+            raise ValueError("num_centroids must be between 1 and 256 so codes fit in one byte.")
+        num_centroids = min(num_centroids, num_vectors)
+        subspace_dim = dim // num_subspaces
+
+        codebooks = np.zeros((num_subspaces, num_centroids, subspace_dim), dtype=np.float32)
+        for subspace in range(num_subspaces):
+            columns = slice(subspace * subspace_dim, (subspace + 1) * subspace_dim)
+            codebooks[subspace] = kmeans(
+                vectors[:, columns], num_centroids, iterations=iterations, seed=seed + subspace, spherical=False
+            )
+        return cls(codebooks)
+
+    def _subspaces(self, vectors):
+        subspace_dim = self.codebooks.shape[2]
+        for subspace in range(self.num_subspaces):
+            yield subspace, vectors[:, subspace * subspace_dim : (subspace + 1) * subspace_dim]
+
+    def encode(self, vectors) -> np.ndarray:
+        """Returns the (num_nodes, num_subspaces) uint8 codes of a matrix of vectors."""
+        vectors = np.atleast_2d(vectors)
+        codes = np.empty((vectors.shape[0], self.num_subspaces), dtype=np.uint8)
+        for subspace, sub_vectors in self._subspaces(vectors):
+            codes[:, subspace] = assign(sub_vectors, self.codebooks[subspace], spherical=False)
+        return codes
+
+    def decode(self, codes) -> np.ndarray:
+        """Reconstructs approximate vectors from their codes."""
+        codes = np.atleast_2d(codes)
+        return np.concatenate(
+            [self.codebooks[subspace][codes[:, subspace]] for subspace in range(self.num_subspaces)], axis=1
+        )
+
+    def inner_product_tables(self, queries) -> np.ndarray:
+        """Returns the (num_queries, num_subspaces, num_centroids) inner products of queries with every centroid."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        sub_queries = queries.reshape(queries.shape[0], self.num_subspaces, -1)
+        return np.einsum("mkd,qmd->qmk", self.codebooks, sub_queries)
+
+    def score(self, tables: np.ndarray, codes_by_subspace: np.ndarray) -> np.ndarray:
+        """
+        Approximates the (num_queries, num_nodes) inner products of tabulated queries with encoded vectors.
+
+        Args:
+            tables (np.ndarray): The output of `inner_product_tables`.
+            codes_by_subspace (np.ndarray): The transposed (num_subspaces, num_nodes) codes, so every
+                subspace is read contiguously.
+        """
+        scores = np.zeros((tables.shape[0], codes_by_subspace.shape[1]), dtype=np.float32)
+        for subspace in range(self.num_subspaces):
+            scores += tables[:, subspace, codes_by_subspace[subspace]]
+        return scores
+
+    def save(self, persist_dir, codes: np.ndarray, **manifest):
+        """Writes the codebooks and codes next to the binary vector store. Keyword arguments go to its manifest."""
+        np.save(os.path.join(persist_dir, PQ_CODEBOOKS_FILE_NAME), self.codebooks)
+        np.save(os.path.join(persist_dir, PQ_CODES_FILE_NAME), codes)
+        manifest.update(
+            num_subspaces=self.num_subspaces,
+            num_centroids=int(self.codebooks.shape[1]),
+            bytes_per_vector=int(codes.shape[1] * codes.itemsize),
+        )
+        with open(os.path.join(persist_dir, PQ_MANIFEST), "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+    @staticmethod
+    def exists(persist_dir) -> bool:
+        return os.path.exists(os.path.join(persist_dir, PQ_MANIFEST))
+
+    @classmethod
+    def load(cls, persist_dir):
+        """
+        Returns:
+            tuple: The quantizer, the memory-mapped codes and the manifest.
+        """
+        with open(os.path.join(persist_dir, PQ_MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        codebooks = np.load(os.path.join(persist_dir, PQ_CODEBOOKS_FILE_NAME))
+        codes = np.load(os.path.join(persist_dir, PQ_CODES_FILE_NAME), mmap_mode="r")
+        return cls(codebooks), codes, manifest
+
+
+class PQSearcher:
+    """
+    Approximate cosine top-k search over product-quantized codes, with the same interface as `DenseSearcher`.
+
+    Args:
+        quantizer (ProductQuantizer): The trained quantizer.
+        codes (np.ndarray): The (num_nodes, num_subspaces) codes of the unit-norm embeddings.
+        vectors (np.ndarray, optional): The unit-norm float embeddings, usually memory-mapped. Only the rows
+            of re-ranked candidates are read.
+        rerank (int, optional): The number of best approximate candidates re-scored exactly against
+            `vectors`. 0 disables re-ranking. Defaults to 50.
+    """
+
+    def __init__(self, quantizer: ProductQuantizer, codes, vectors=None, rerank: int = 50):
+        self.quantizer = quantizer
+        self.codes_by_subspace = np.ascontiguousarray(np.asarray(codes).T)
+        self.vectors = vectors
+        self.rerank = rerank if vectors is not None else 0
+
+    def __len__(self) -> int:
+        return int(self.codes_by_subspace.shape[1])
+
+    def search(self, query, top_k: int):
+        scores, positions = self.search_batch(np.asarray(query)[None, :], top_k)
+        return scores[0], positions[0]
+
+    def search_batch(self, queries, top_k: int):
+        queries = normalize_rows(np.atleast_2d(queries))
+        approximate = self.quantizer.score(self.quantizer.inner_product_tables(queries), self.codes_by_subspace)
+        scores, positions = top_k_rows(approximate, max(top_k, self.rerank))
+        if not self.rerank:
+            return scores[:, :top_k], positions[:, :top_k]
+
+        # Exact re-rank: only the candidate rows of the float matrix are read
+        reranked_scores, reranked_positions = [], []
+        for query, candidates in zip(queries, positions):
+            candidates = np.sort(candidates)
+            row_scores, row_positions = top_k_rows((self.vectors[candidates] @ query)[None, :], top_k)
+            reranked_scores.append(row_scores[0])
+            reranked_positions.append(candidates[row_positions[0]])
+        return np.stack(reranked_scores), np.stack(reranked_positions)
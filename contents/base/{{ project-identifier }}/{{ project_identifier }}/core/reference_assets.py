@@ -0,0 +1,153 @@
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import httpx
+from loguru import logger
+from PIL import Image, features
+
+from {{ project_identifier }}.utils.cache import LRUCache
+
+DATA_PATH = Path(os.path.dirname(os.path.dirname(__file__))) / "data"
+ASSET_FOLDERS = {"images": DATA_PATH / "images", "documents": DATA_PATH / "documents"}
+
+# Longest side of the thumbnails sent with references, in pixels
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "320"))
+THUMBNAIL_PATH = os.environ.get("THUMBNAIL_PATH", str(DATA_PATH / "thumbnails"))
+LLAMA_CLOUD_BASE_URL = os.environ.get("LLAMA_CLOUD_BASE_URL", "https://api.cloud.llamaindex.ai")
+# Reference asset URLs stay valid for at least this long and at most twice as long, in seconds
+ASSET_URL_TTL_SECONDS = int(os.environ.get("ASSET_URL_TTL_SECONDS", 86400))
+
+# Signs the asset URLs when no CHAINLIT_AUTH_SECRET is set. Created before the workers are forked, so they share it
+_fallback_signing_key = secrets.token_bytes(32)
+
+# LlamaParse saves images as "<job id>-<image name>", which is all that is needed to download them later
+_parsed_image_name = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})-(.+)$")
+
+
+def _signature(kind: str, relative_path: str, expires: int) -> str:
+    secret = os.environ.get("CHAINLIT_AUTH_SECRET")
+    key = secret.encode() if secret else _fallback_signing_key
+    return hmac.new(key, f"{kind}\n{relative_path}\n{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def asset_url(kind: str, path: str) -> str:
+    """
+    Returns the signed URL the UI fetches a reference asset from.
+
+    The URL is signed with `CHAINLIT_AUTH_SECRET`, so only users who were sent the reference can fetch the asset,
+    from any worker or pod. Expiry times are rounded up to whole `ASSET_URL_TTL_SECONDS` periods, which keeps the
+    URL of an asset the same for a while and lets the browser cache it.
+
+    Args:
+        kind (str): "images", "thumbnails" or "documents".
+        path (str): The path of the asset as returned by `process_response_metadata_list`,
+            e.g. "./data/images/<pdf>/<image>".
+    """
+    folder = "documents" if kind == "documents" else "images"
+    relative_path = path.split(f"/data/{folder}/", 1)[-1]
+    expires = (int(time.time()) // ASSET_URL_TTL_SECONDS + 2) * ASSET_URL_TTL_SECONDS
+    signature = _signature(kind, relative_path, expires)
+    return f"/references/{kind}/{quote(relative_path)}?expires={expires}&signature={signature}"
+
+
+def verify_asset_url(kind: str, relative_path: str, expires: int, signature: str) -> bool:
+    """Returns whether the query of an asset URL was signed by `asset_url` and has not expired yet."""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(kind, relative_path, expires), signature)
+
+
+def resolve_asset_path(folder: str, relative_path: str) -> Optional[Path]:
+    """Returns the path of an asset below `data/<folder>`, or None when `relative_path` escapes it."""
+    root = ASSET_FOLDERS[folder].resolve()
+    path = (root / relative_path).resolve()
+    return path if path.is_relative_to(root) and path != root else None
+
+
+def fetch_parsed_image(path: Path, timeout: float = 30) -> bool:
+    """
+    Downloads a page image that was not extracted at build time (`IMAGE_EXTRACTION=lazy`) from LlamaParse.
+
+    Returns whether the image is available at `path`. LlamaParse only keeps the results of a parsing job for
+    a limited time, after which the image cannot be fetched anymore.
+    """
+    if path.is_file():
+        return True
+    match = _parsed_image_name.match(path.name)
+    api_key = os.environ.get("LLAMA_CLOUD_API_KEY")
+    if not match or not api_key:
+        return False
+    job_id, image_name = match.groups()
+    url = f"{LLAMA_CLOUD_BASE_URL}/api/parsing/job/{job_id}/result/image/{image_name}"
+    try:
+        response = httpx.get(url, headers={"Authorization": f"Bearer {api_key}"}, timeout=timeout)
+        response.raise_for_status()
+    except httpx.HTTPError as error:
+        logger.warning(f"Could not fetch image {path.name} from LlamaParse: {error}")
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    temporary_path.write_bytes(response.content)
+    os.replace(temporary_path, path)
+    return True
+
+
+class ThumbnailCache:
+    """
+    Renders small thumbnails of page images on demand and keeps them on disk, keyed by a hash of the image
+    content, so an image is only resized once however many references and sessions show it.
+
+    Thumbnails are WebP when Pillow supports it and PNG otherwise. Image hashes are memoized by path,
+    modification time and size, so serving a cached thumbnail does not read the full image again.
+
+    Usage:
+    ```
+    thumbnails = ThumbnailCache(THUMBNAIL_PATH)
+    thumbnail_path = thumbnails.get(image_path)
+    ```
+
+    Args:
+        cache_dir (str): The folder of the thumbnails.
+        max_size (int, optional): Longest side of a thumbnail in pixels. Defaults to THUMBNAIL_SIZE.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = THUMBNAIL_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.image_format, self.extension = ("WEBP", "webp") if features.check("webp") else ("PNG", "png")
+        self.renders = 0
+        self._hashes = LRUCache(max_size=4096)
+        self._lock = threading.Lock()
+
+    def image_hash(self, image_path: Path) -> str:
+        stat = image_path.stat()
+        key = (str(image_path), stat.st_mtime_ns, stat.st_size)
+        return self._hashes.get_or_create(key, lambda: hashlib.sha256(image_path.read_bytes()).hexdigest())
+
+    def path_for(self, image_path: Path) -> Path:
+        return self.cache_dir / f"{self.image_hash(image_path)}-{self.max_size}.{self.extension}"
+
+    def get(self, image_path: Path) -> Path:
+        """Returns the path of the thumbnail of `image_path`, rendering it first if needed."""
+        thumbnail_path = self.path_for(image_path)
+        if thumbnail_path.is_file():
+            return thumbnail_path
+        with Image.open(image_path) as image:
+            image.thumbnail((self.max_size, self.max_size))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temporary_path = thumbnail_path.with_name(f"{thumbnail_path.name}.{threading.get_ident()}.tmp")
+            image.save(temporary_path, format=self.image_format)
+        os.replace(temporary_path, thumbnail_path)
+        with self._lock:
+            self.renders += 1
+        return thumbnail_path
@@ -0,0 +1,188 @@
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from loguru import logger
+from pydantic import Field, PrivateAttr
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from {{ project_identifier }}.core.bm25 import lexical_text, tokenize
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+from {{ project_identifier }}.utils.cache import LRUCache
+
+# Candidates retrieved for the re-ranker to choose from, 0 disables re-ranking
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 50))
+# Best re-ranked nodes passed to the LLM
+RERANK_TOP_N = int(os.environ.get("RERANK_TOP_N", 3))
+# Milliseconds re-ranking may take per request, it is skipped when the estimate exceeds it
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", 30))
+# Nodes sent to the LLM before re-ranking, the baseline of the prompt tokens saved
+RERANK_BASELINE_TOP_K = 5
+
+
+class _NodeFeatures:
+    __slots__ = ("node", "terms", "bigrams", "length", "_tokens")
+
+    def __init__(self, node):
+        terms = tokenize(lexical_text(node))
+        self.node = node
+        self.terms = Counter(terms)
+        self.bigrams = set(zip(terms, terms[1:]))
+        self.length = len(terms)
+        self._tokens = None
+
+    @property
+    def tokens(self) -> int:
+        """Prompt tokens of the node, only counted for the few nodes that reach the prompt metrics."""
+        if self._tokens is None:
+            self._tokens = count_tokens(self.node.get_content(metadata_mode=MetadataMode.LLM))
+        return self._tokens
+
+
+class LexicalReranker(BaseNodePostprocessor):
+    """
+    Re-ranks many cheaply retrieved candidates on the CPU and keeps the best `top_n`, so the LLM prompt holds
+    fewer, more relevant chunks.
+
+    Candidates are scored by lexical features against the query: IDF-weighted term coverage, saturated term
+    frequency, query bigrams found in the page, and their retrieval rank. IDF is computed over the candidates,
+    and the features of a node are cached by node id, so a request mostly costs the scoring itself.
+
+    Re-ranking has a latency budget per request. It is skipped, keeping the retrieval order, when the running
+    per-candidate cost estimate exceeds the budget, and abandoned the same way if scoring overruns it.
+
+    Usage:
+    ```
+    reranker = LexicalReranker(top_n=3, budget_ms=30)
+    query_engine = RetrieverQueryEngine.from_args(retriever, node_postprocessors=[reranker])
+    reranker.stats()  # {"requests": 1, "reranked": 1, ..., "prompt_tokens_saved": 1850}
+    ```
+
+    Args:
+        top_n (int, optional): Nodes kept. Defaults to `RERANK_TOP_N`.
+        budget_ms (float, optional): Latency budget per request. Defaults to `RERANK_BUDGET_MS`.
+        cache_size (int, optional): Nodes whose features are cached. Defaults to 4096.
+    """
+
+    top_n: int = Field(default=RERANK_TOP_N)
+    budget_ms: float = Field(default=RERANK_BUDGET_MS)
+    cache_size: int = Field(default=4096)
+    coverage_weight: float = Field(default=0.4)
+    frequency_weight: float = Field(default=0.2)
+    bigram_weight: float = Field(default=0.25)
+    rank_weight: float = Field(default=0.15)
+
+    _features = PrivateAttr()
+    _lock = PrivateAttr()
+    _seconds_per_node = PrivateAttr(default=0.0)
+    _counters = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._features = LRUCache(max_size=self.cache_size)
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LexicalReranker"
+
+    def _node_features(self, node) -> _NodeFeatures:
+        return self._features.get_or_create(node.node_id, lambda: _NodeFeatures(node))
+
+    def _count(self, **counts):
+        with self._lock:
+            self._counters.update(counts)
+
+    def _keep(self, nodes: List[NodeWithScore], kept: List[NodeWithScore], outcome: str, started: float):
+        baseline = sum(self._node_features(hit.node).tokens for hit in nodes[:RERANK_BASELINE_TOP_K])
+        tokens = sum(self._node_features(hit.node).tokens for hit in kept)
+        self._count(
+            requests=1,
+            **{outcome: 1},
+            prompt_tokens=tokens,
+            prompt_tokens_saved=baseline - tokens,
+            rerank_microseconds=int((time.perf_counter() - started) * 1e6),
+        )
+        return kept
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        started = time.perf_counter()
+        if query_bundle is None or len(nodes) <= self.top_n:
+            return self._keep(nodes, nodes[: self.top_n], "passed", started)
+        estimate_ms = self._seconds_per_node * len(nodes) * 1000
+        if estimate_ms > self.budget_ms:
+            logger.debug(f"Skipping re-ranking, estimated {estimate_ms:.1f} ms over the {self.budget_ms} ms budget")
+            # Decay the estimate, so a one-off stall does not disable re-ranking for good
+            with self._lock:
+                self._seconds_per_node *= 0.9
+            return self._keep(nodes, nodes[: self.top_n], "skipped", started)
+
+        deadline = started + self.budget_ms / 1000
+        query_terms = list(dict.fromkeys(tokenize(query_bundle.query_str)))
+        query_bigrams = set(zip(query_terms, query_terms[1:]))
+        features = []
+        for hit in nodes:
+            features.append(self._node_features(hit.node))
+            if time.perf_counter() > deadline:
+                logger.debug(f"Abandoned re-ranking after {len(features)} of {len(nodes)} candidates")
+                self._update_estimate(started, len(features))
+                return self._keep(nodes, nodes[: self.top_n], "over_budget", started)
+
+        scores = self._scores(query_terms, query_bigrams, features)
+        self._update_estimate(started, len(nodes))
+        order = sorted(range(len(nodes)), key=lambda position: -scores[position])[: self.top_n]
+        kept = [NodeWithScore(node=nodes[position].node, score=scores[position]) for position in order]
+        return self._keep(nodes, kept, "reranked", started)
+
+    def _update_estimate(self, started: float, num_nodes: int):
+        seconds_per_node = (time.perf_counter() - started) / max(num_nodes, 1)
+        with self._lock:
+            self._seconds_per_node = 0.8 * self._seconds_per_node + 0.2 * seconds_per_node
+
+    def _scores(self, query_terms, query_bigrams, features: List[_NodeFeatures]) -> List[float]:
+        num_nodes = len(features)
+        idf = {
+            term: math.log(1 + num_nodes / (1 + sum(1 for feature in features if term in feature.terms)))
+            for term in query_terms
+        }
+        total_idf = sum(idf.values()) or 1.0
+        average_length = max(sum(feature.length for feature in features) / num_nodes, 1.0)
+        scores = []
+        for rank, feature in enumerate(features):
+            coverage = frequency = 0.0
+            length_norm = 1.2 * (0.25 + 0.75 * feature.length / average_length)
+            for term in query_terms:
+                term_frequency = feature.terms.get(term, 0)
+                if term_frequency:
+                    coverage += idf[term]
+                    frequency += idf[term] * term_frequency / (term_frequency + length_norm)
+            bigrams = len(query_bigrams & feature.bigrams) / len(query_bigrams) if query_bigrams else 0.0
+            scores.append(
+                self.coverage_weight * coverage / total_idf
+                + self.frequency_weight * frequency / total_idf
+                + self.bigram_weight * bigrams
+                + self.rank_weight / (1 + rank)
+            )
+        return scores
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        requests = counters.get("requests", 0)
+        return {
+            "requests": requests,
+            "reranked": counters.get("reranked", 0),
+            "skipped": counters.get("skipped", 0),
+            "over_budget": counters.get("over_budget", 0),
+            "mean_ms": round(counters.get("rerank_microseconds", 0) / 1000 / requests, 3) if requests else 0.0,
+            "prompt_tokens": counters.get("prompt_tokens", 0),
+            "prompt_tokens_saved": counters.get("prompt_tokens_saved", 0),
+        }
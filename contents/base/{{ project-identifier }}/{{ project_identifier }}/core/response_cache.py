@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+from {{ project_identifier }}.core.search import normalize_rows
+
+# Minimum cosine similarity between two queries for one to be answered with the other's response
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("RESPONSE_CACHE_THRESHOLD", 0.95))
+# Seconds a cached response is served for
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 3600))
+# Cached responses kept per process, 0 disables the cache
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 512))
+
+
+@dataclass
+class CacheEntry:
+    response: Any
+    namespace: Hashable
+    created_at: float
+    latency_seconds: float
+
+
+class SemanticResponseCache:
+    """
+    Caches responses by query embedding: a query whose embedding is within `threshold` cosine similarity of
+    a cached query, in the same namespace, is answered with the cached response.
+
+    Embeddings live in one preallocated (max_size, dim) matrix, so a lookup is a single matrix-vector
+    product. Entries expire after `ttl` seconds, the least recently used entry is evicted when the cache is
+    full, and every entry is dropped when the index build id changes.
+
+    Args:
+        threshold (float, optional): Defaults to `RESPONSE_CACHE_THRESHOLD`.
+        ttl (float, optional): Defaults to `RESPONSE_CACHE_TTL`.
+        max_size (int, optional): Defaults to `RESPONSE_CACHE_SIZE`, 0 disables the cache.
+        clock (callable, optional): Returns the current time in seconds, for tests.
+    """
+
+    def __init__(
+        self,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        clock=time.monotonic,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.build_id = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.latency_saved_seconds = 0.0
+        self._vectors = None
+        self._entries = OrderedDict()  # slot -> CacheEntry, least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_build_id(self, build_id):
+        if build_id != self.build_id:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.build_id = build_id
+
+    def _prepare(self, embedding) -> np.ndarray:
+        vector = normalize_rows(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            self._entries.clear()
+        return vector
+
+    def lookup(self, embedding, namespace: Hashable = None, build_id: Optional[str] = None):
+        """
+        Returns the cached response of the most similar live query in `namespace`, or None on a miss.
+
+        Args:
+            embedding (array-like): The query embedding.
+            namespace (Hashable, optional): Separates responses that are not interchangeable, e.g. the
+                query engine that produced them.
+            build_id (str, optional): The build id of the index the query would be answered from.
+        """
+        if not self.max_size:
+            return None
+        started = time.perf_counter()
+        with self._lock:
+            self._check_build_id(build_id)
+            vector = self._prepare(embedding)
+            now = self.clock()
+            for slot in [slot for slot, entry in self._entries.items() if now - entry.created_at > self.ttl]:
+                del self._entries[slot]
+                self.expirations += 1
+
+            slots = [slot for slot, entry in self._entries.items() if entry.namespace == namespace]
+            if slots:
+                scores = self._vectors[slots] @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    slot = slots[best]
+                    entry = self._entries[slot]
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    self.latency_saved_seconds += max(entry.latency_seconds - (time.perf_counter() - started), 0.0)
+                    return entry.response
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        embedding,
+        response,
+        namespace: Hashable = None,
+        build_id: Optional[str] = None,
+        latency_seconds: float = 0.0,
+    ):
+        """
+        Caches a response.
+
+        Args:
+            embedding (array-like): The query embedding.
+            response (Any): The response served to later similar queries.
+            namespace (Hashable, optional): See `lookup`.
+            build_id (str, optional): The build id of the index the response was produced from.
+            latency_seconds (float, optional): What producing the response cost, counted as saved on hits.
+        """
+        if not self.max_size:
+            return
+        with self._lock:
+            self._check_build_id(build_id)
+            vector = self._prepare(embedding)
+            if len(self._entries) < self.max_size:
+                used = set(self._entries)
+                slot = next(slot for slot in range(self.max_size) if slot not in used)
+            else:
+                slot, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = CacheEntry(response, namespace, self.clock(), latency_seconds)
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+        }
@@ -0,0 +1,283 @@
+import os
+import weakref
+from typing import Callable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+
+from {{ project_identifier }}.core.ann import IVFIndex, IVFSearcher
+from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text, reciprocal_rank_fusion
+from {{ project_identifier }}.core.quantization import PQSearcher, ProductQuantizer
+from {{ project_identifier }}.core.search import DenseSearcher
+from {{ project_identifier }}.core.vector_store import MemmapVectorStore
+
+# "exact" scores every node, "ivf" only scans the closest buckets of the IVF index built by index_data.py,
+# "pq" scores the product-quantized codes built by index_data.py with VECTOR_COMPRESSION=pq
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "exact")
+# Buckets scanned per query by the "ivf" backend, higher is slower with better recall
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", 8))
+# Best approximate candidates of the "pq" backend re-scored with the float embeddings, 0 disables re-ranking
+PQ_RERANK = int(os.environ.get("PQ_RERANK", 50))
+# "hybrid" fuses the dense results with the BM25 index built by index_data.py, "dense" only uses embeddings
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+# Results taken from each of the dense and BM25 rankings before fusing them
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 20))
+# Reciprocal rank fusion constant, higher values flatten the advantage of the top ranks
+RRF_K = int(os.environ.get("RRF_K", 60))
+
+# Searchers are derived from an index once and shared by every retriever built on it
+_searchers = weakref.WeakKeyDictionary()
+
+
+def _build_searcher(index: VectorStoreIndex, backend: str):
+    vector_store = index.vector_store
+    if not isinstance(vector_store, MemmapVectorStore):
+        if backend != "exact":
+            logger.warning(f"Retrieval backend '{backend}' needs the binary vector store, using exact search")
+        node_ids = list(index.index_struct.nodes_dict.values())
+        vectors = np.asarray([vector_store.get(node_id) for node_id in node_ids], dtype=np.float32)
+        docstore = index.docstore
+        return (
+            DenseSearcher(vectors.reshape(len(node_ids), -1)),
+            lambda position: docstore.get_node(node_ids[position]),
+        )
+
+    if backend == "ivf":
+        persist_dir = vector_store.persist_dir
+        if not IVFIndex.exists(persist_dir):
+            logger.warning(f"No IVF index found in {persist_dir}, using exact search")
+        else:
+            ivf = IVFIndex.load(persist_dir)
+            if ivf.manifest.get("build_id") == vector_store.manifest["build_id"]:
+                return IVFSearcher(ivf, vector_store.vectors, nprobe=IVF_NPROBE), vector_store.get_node
+            logger.warning(f"IVF index in {persist_dir} was built for another vector store, using exact search")
+    elif backend == "pq":
+        persist_dir = vector_store.persist_dir
+        if not ProductQuantizer.exists(persist_dir):
+            logger.warning(f"No product-quantized codes found in {persist_dir}, using exact search")
+        else:
+            quantizer, codes, manifest = ProductQuantizer.load(persist_dir)
+            if manifest.get("build_id") == vector_store.manifest["build_id"]:
+                return PQSearcher(quantizer, codes, vector_store.vectors, rerank=PQ_RERANK), vector_store.get_node
+            logger.warning(f"PQ codes in {persist_dir} were built for another vector store, using exact search")
+    elif backend != "exact":
+        logger.warning(f"Unknown retrieval backend '{backend}', using exact search")
+    return vector_store.searcher, vector_store.get_node
+
+
+def searcher_for_index(index: VectorStoreIndex, backend: str = "exact"):
+    """
+    Returns the (searcher, node_lookup) pair for an index, building it on first use.
+
+    The memory-mapped binary store is searched in place. For the JSON storage context, embeddings are
+    copied once into a normalized matrix.
+
+    Args:
+        index (VectorStoreIndex): The loaded index.
+        backend (str, optional): "exact", "ivf" or "pq". Falls back to "exact" if the backend is unavailable.
+
+    Returns:
+        tuple: A searcher with `search`/`search_batch` methods, and a callable mapping a matrix row to its node.
+    """
+    searchers = _searchers.setdefault(index, {})
+    if backend not in searchers:
+        searchers[backend] = _build_searcher(index, backend)
+    return searchers[backend]
+
+
+def _build_bm25(index: VectorStoreIndex) -> Optional[BM25Index]:
+    vector_store = index.vector_store
+    if not isinstance(vector_store, MemmapVectorStore):
+        # Rows follow the node order of the JSON store, the shipped indexes are small enough to build it here
+        docstore = index.docstore
+        node_ids = list(index.index_struct.nodes_dict.values())
+        return BM25Index.build(lexical_text(docstore.get_node(node_id)) for node_id in node_ids)
+
+    persist_dir = vector_store.persist_dir
+    if not BM25Index.exists(persist_dir):
+        logger.warning(f"No BM25 index found in {persist_dir}, using dense search only")
+        return None
+    bm25 = BM25Index.load(persist_dir)
+    if bm25.manifest.get("build_id") != vector_store.manifest["build_id"]:
+        logger.warning(f"BM25 index in {persist_dir} was built for another vector store, using dense search only")
+        return None
+    return bm25
+
+
+def bm25_for_index(index: VectorStoreIndex) -> Optional[BM25Index]:
+    """
+    Returns the BM25 index over the same rows as `searcher_for_index`, loading it on first use.
+
+    Returns:
+        Optional[BM25Index]: None when the binary store has no BM25 index, or one built for other rows.
+    """
+    searchers = _searchers.setdefault(index, {})
+    if "bm25" not in searchers:
+        searchers["bm25"] = _build_bm25(index)
+    return searchers["bm25"]
+
+
+class NumpyRetriever(BaseRetriever):
+    """
+    Retriever that scores every node with one vectorized product instead of a per-node Python loop.
+
+    It is a regular llama-index retriever, so it plugs into `RetrieverQueryEngine` and `QueryEngineTool`.
+    `retrieve_batch` scores several queries with a single matrix-matrix product.
+
+    Args:
+        searcher: An object with `search(query, top_k)` and `search_batch(queries, top_k)` methods
+            returning scores and matrix row positions, e.g. `DenseSearcher`.
+        node_lookup (Callable[[int], BaseNode]): Maps a matrix row position to its node.
+        embed_model (BaseEmbedding): The model used to embed query strings.
+        similarity_top_k (int, optional): The number of nodes to return. Defaults to 5.
+    """
+
+    def __init__(
+        self,
+        searcher,
+        node_lookup: Callable[[int], BaseNode],
+        embed_model,
+        similarity_top_k: int = 5,
+        callback_manager: Optional[CallbackManager] = None,
+        verbose: bool = False,
+    ) -> None:
+        self._searcher = searcher
+        self._node_lookup = node_lookup
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        super().__init__(callback_manager=callback_manager, verbose=verbose)
+
+    @classmethod
+    def from_index(
+        cls,
+        index: VectorStoreIndex,
+        embed_model=None,
+        similarity_top_k: int = 5,
+        backend: str = RETRIEVAL_BACKEND,
+        **kwargs,
+    ) -> "NumpyRetriever":
+        searcher, node_lookup = searcher_for_index(index, backend=backend)
+        embed_model = embed_model or index._embed_model
+        return cls(searcher, node_lookup, embed_model, similarity_top_k=similarity_top_k, **kwargs)
+
+    def _to_nodes(self, scores, positions) -> List[NodeWithScore]:
+        return [
+            NodeWithScore(node=self._node_lookup(int(position)), score=float(score))
+            for score, position in zip(scores, positions)
+        ]
+
+    def _query_embedding(self, query_bundle: QueryBundle):
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+        return query_bundle.embedding
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        scores, positions = self._searcher.search(self._query_embedding(query_bundle), self._similarity_top_k)
+        return self._to_nodes(scores, positions)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = await self._embed_model.aget_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+        return self._retrieve(query_bundle)
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[NodeWithScore]]:
+        """
+        Retrieves the top nodes for several queries at once.
+
+        Args:
+            queries (List[str]): The query strings.
+
+        Returns:
+            List[List[NodeWithScore]]: The retrieved nodes of every query, in query order.
+        """
+        if not queries:
+            return []
+        embeddings = np.asarray([self._embed_model.get_query_embedding(query) for query in queries], dtype=np.float32)
+        scores, positions = self._searcher.search_batch(embeddings, self._similarity_top_k)
+        return [self._to_nodes(row_scores, row_positions) for row_scores, row_positions in zip(scores, positions)]
+
+
+class HybridRetriever(NumpyRetriever):
+    """
+    Retriever fusing dense results with BM25 results by reciprocal rank fusion.
+
+    Exact identifiers, part numbers and rare chemical names are matched lexically even when their embeddings
+    are not close to the query's. Both rankings index the rows of the same store, so they fuse without
+    looking up nodes, and only the final `similarity_top_k` nodes are read. Scores are the fused RRF scores,
+    or the dense scores when there is no BM25 index.
+
+    Usage:
+    ```
+    retriever = HybridRetriever.from_index(index_registry.get(), embed_model=get_embed_model())
+    nodes = retriever.retrieve("What does application note 5994-7439en measure?")
+    ```
+
+    Args:
+        bm25 (Optional[BM25Index]): The lexical index over the searcher's rows, dense search only if None.
+        candidates (int, optional): Results taken from each ranking before fusing. Defaults to 20.
+        rrf_k (int, optional): Reciprocal rank fusion constant. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        searcher,
+        node_lookup: Callable[[int], BaseNode],
+        embed_model,
+        bm25: Optional[BM25Index] = None,
+        similarity_top_k: int = 5,
+        candidates: int = HYBRID_CANDIDATES,
+        rrf_k: int = RRF_K,
+        **kwargs,
+    ) -> None:
+        self._bm25 = bm25
+        self._candidates = max(candidates, similarity_top_k)
+        self._rrf_k = rrf_k
+        super().__init__(searcher, node_lookup, embed_model, similarity_top_k=similarity_top_k, **kwargs)
+
+    @classmethod
+    def from_index(
+        cls,
+        index: VectorStoreIndex,
+        embed_model=None,
+        similarity_top_k: int = 5,
+        backend: str = RETRIEVAL_BACKEND,
+        mode: str = RETRIEVAL_MODE,
+        **kwargs,
+    ) -> NumpyRetriever:
+        """Returns a `HybridRetriever` in "hybrid" mode, a plain `NumpyRetriever` otherwise."""
+        if mode != "hybrid":
+            if mode != "dense":
+                logger.warning(f"Unknown retrieval mode '{mode}', using dense search")
+            return NumpyRetriever.from_index(index, embed_model, similarity_top_k, backend=backend, **kwargs)
+        searcher, node_lookup = searcher_for_index(index, backend=backend)
+        embed_model = embed_model or index._embed_model
+        return cls(
+            searcher, node_lookup, embed_model, bm25_for_index(index), similarity_top_k=similarity_top_k, **kwargs
+        )
+
+    def _fuse(self, query: str, dense_positions) -> List[NodeWithScore]:
+        _, lexical_positions = self._bm25.search(query, self._candidates)
+        scores, positions = reciprocal_rank_fusion(
+            [dense_positions, lexical_positions], k=self._rrf_k, top_k=self._similarity_top_k
+        )
+        return self._to_nodes(scores, positions)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if self._bm25 is None:
+            return super()._retrieve(query_bundle)
+        _, positions = self._searcher.search(self._query_embedding(query_bundle), self._candidates)
+        return self._fuse(query_bundle.query_str, positions)
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[NodeWithScore]]:
+        if self._bm25 is None or not queries:
+            return super().retrieve_batch(queries)
+        embeddings = np.asarray([self._embed_model.get_query_embedding(query) for query in queries], dtype=np.float32)
+        _, positions = self._searcher.search_batch(embeddings, self._candidates)
+        return [self._fuse(query, row_positions) for query, row_positions in zip(queries, positions)]
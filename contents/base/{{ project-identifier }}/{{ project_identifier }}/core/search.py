@@ -0,0 +1,66 @@
+import numpy as np
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """
+    Returns a float32 copy of `matrix` with every row scaled to unit L2 norm. All-zero rows are left as they are.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_rows(scores: np.ndarray, top_k: int):
+    """
+    Selects the `top_k` highest scores of every row of a (num_queries, num_candidates) score matrix.
+
+    `argpartition` finds the top k in linear time, only those k are then sorted.
+
+    Returns:
+        tuple: A (num_queries, k) matrix of scores and a (num_queries, k) matrix of column positions,
+        both ordered by descending score.
+    """
+    top_k = min(top_k, scores.shape[1])
+    if top_k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(scores.dtype), empty.astype(np.int64)
+    if top_k < scores.shape[1]:
+        positions = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        positions = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top_scores = np.take_along_axis(scores, positions, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(positions, order, axis=1)
+
+
+class DenseSearcher:
+    """
+    Exact cosine top-k search over one (num_nodes, dim) float32 embedding matrix.
+
+    Rows are normalized once up front, so scoring a query is a single matrix-vector product and a batch
+    of queries is a single matrix-matrix product. Pass `normalized=True` for matrices that are already
+    unit norm (e.g. the memory-mapped binary store) to search them in place without a copy.
+    """
+
+    def __init__(self, vectors, normalized: bool = False):
+        self.vectors = vectors if normalized else normalize_rows(vectors)
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def search(self, query, top_k: int):
+        """
+        Returns the `top_k` (scores, positions) of a single query embedding.
+        """
+        scores, positions = self.search_batch(np.asarray(query, dtype=np.float32)[None, :], top_k)
+        return scores[0], positions[0]
+
+    def search_batch(self, queries, top_k: int):
+        """
+        Returns (num_queries, top_k) matrices of scores and positions for a batch of query embeddings.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        if len(self) == 0:
+            return top_k_rows(np.empty((queries.shape[0], 0), dtype=np.float32), top_k)
+        return top_k_rows(queries @ self.vectors.T, top_k)
@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
+
+from loguru import logger
+
+from {{ project_identifier }}.core.chat_memory import CHAT_MEMORY_PATH, CHAT_MEMORY_TTL_HOURS
+
+# SQLite file the session state is kept in, shared by the app processes. Empty keeps it in process memory
+SESSION_STATE_PATH = os.environ.get("SESSION_STATE_PATH", CHAT_MEMORY_PATH)
+# Sessions untouched for longer than this are deleted when the SQLite store is opened
+SESSION_STATE_TTL_HOURS = float(os.environ.get("SESSION_STATE_TTL_HOURS", CHAT_MEMORY_TTL_HOURS))
+
+
+@dataclass
+class SessionState:
+    """
+    What it takes to rebuild the agent of a chat session in any app process: the chat profile, the chat
+    settings and the thread whose history the chat memory holds. The agent itself is not stored.
+    """
+
+    chat_profile: Optional[str]
+    settings: Dict[str, object] = field(default_factory=dict)
+    thread_id: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "SessionState":
+        return cls(**json.loads(data))
+
+
+class SessionStateStore(ABC):
+    """Shared store of the `SessionState` of every chat session, keyed by the chainlit session id."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionState]: ...
+
+    @abstractmethod
+    def put(self, session_id: str, state: SessionState): ...
+
+    @abstractmethod
+    def delete(self, session_id: str): ...
+
+    @property
+    def persistent(self) -> bool:
+        """Whether the state outlives the process, and may be needed by another one after the chat ends here."""
+        return True
+
+
+class InMemorySessionStateStore(SessionStateStore):
+    """Keeps session state in process memory, for a single app process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[str, str] = {}
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            data = self._states.get(session_id)
+        return SessionState.from_json(data) if data is not None else None
+
+    def put(self, session_id: str, state: SessionState):
+        with self._lock:
+            self._states[session_id] = state.to_json()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._states.pop(session_id, None)
+
+    @property
+    def persistent(self) -> bool:
+        return False
+
+
+class SQLiteSessionStateStore(SessionStateStore):
+    """
+    Keeps session state as JSON rows of a single SQLite table, shared by the app processes using the file.
+
+    Args:
+        path (str): The database file, created if missing.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS session_state "
+            "(session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state FROM session_state WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return SessionState.from_json(row[0]) if row else None
+
+    def put(self, session_id: str, state: SessionState):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO session_state (session_id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, state.to_json(), time.time()),
+            )
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Deletes the sessions last written more than `max_age_seconds` ago, returns how many."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM session_state WHERE updated_at < ?", (time.time() - max_age_seconds,)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_session_state_store = None
+
+
+def get_session_state_store() -> SessionStateStore:
+    """Returns the session state store of the process, SQLite at `SESSION_STATE_PATH` or in memory without one."""
+    global _session_state_store
+    if _session_state_store is None:
+        if SESSION_STATE_PATH:
+            store = SQLiteSessionStateStore(SESSION_STATE_PATH)
+            pruned = store.prune(SESSION_STATE_TTL_HOURS * 3600)
+            logger.info(f"Session state in {SESSION_STATE_PATH}, deleted {pruned} expired sessions")
+            _session_state_store = store
+        else:
+            _session_state_store = InMemorySessionStateStore()
+    return _session_state_store
+
+
+def save_session_state(
+    session_id: str, chat_profile: Optional[str], settings: dict, thread_id: str, store: SessionStateStore = None
+) -> SessionState:
+    """
+    Saves the chat profile and settings of a session. A session saved before keeps its thread, so its history
+    stays the same whichever process the session moves to.
+
+    Args:
+        session_id (str): The chainlit session id.
+        chat_profile (str, optional): The name of the chat profile.
+        settings (dict): The chat settings, only "Model" and "Temperature" are kept.
+        thread_id (str): The thread of the session in this process, used when the session has no state yet.
+        store (SessionStateStore, optional): Defaults to the store of the process.
+
+    Returns:
+        SessionState: The saved state.
+    """
+    store = store or get_session_state_store()
+    previous = store.get(session_id)
+    state = SessionState(
+        chat_profile=chat_profile,
+        settings={"Model": settings["Model"], "Temperature": settings["Temperature"]},
+        thread_id=previous.thread_id if previous is not None and previous.thread_id else thread_id,
+    )
+    store.put(session_id, state)
+    return state
+
+
+def release_session_state(session_id: str):
+    """Forgets the state of an ended session, unless the store is shared, where another process may resume it."""
+    store = get_session_state_store()
+    if not store.persistent:
+        store.delete(session_id)
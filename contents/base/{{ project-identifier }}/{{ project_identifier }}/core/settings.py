@@ -1,26 +1,34 @@
 import chainlit as cl
 from chainlit.input_widget import Select, Slider
 
+MODELS = ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "o1-mini"]
+DEFAULT_SETTINGS = {"Model": MODELS[0], "Temperature": 0}
 
-async def get_settings():
+
+async def get_settings(initial: dict = None):
     """
     Retrieves the chat settings.
 
+    Args:
+        initial (dict, optional): The settings shown initially, e.g. those of a session restored from the session
+            state store. Defaults to `DEFAULT_SETTINGS`.
+
     Returns:
         cl.ChatSettings: The chat settings object containing the selected values.
     """
+    initial = dict(DEFAULT_SETTINGS, **(initial or {}))
     settings = await cl.ChatSettings(
         [
             Select(
                 id="Model",
                 label="OpenAI - Model",
-                values=["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "o1-mini"],
-                initial_index=0,
+                values=MODELS,
+                initial_index=MODELS.index(initial["Model"]) if initial["Model"] in MODELS else 0,
             ),
             Slider(
                 id="Temperature",
                 label="OpenAI - Temperature",
-                initial=0,
+                initial=initial["Temperature"],
                 min=0,
                 max=1,
                 step=0.1,
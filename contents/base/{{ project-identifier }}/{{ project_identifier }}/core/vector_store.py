@@ -0,0 +1,254 @@
+import json
+import mmap
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+from pydantic import PrivateAttr
+
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.schema import BaseNode, ImageNode, IndexNode, TextNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from {{ project_identifier }}.core.search import DenseSearcher, normalize_rows
+
+BINARY_STORE_FORMAT_VERSION = 1
+BINARY_STORE_MANIFEST = "binary_store.json"
+VECTORS_FILE_NAME = "vectors.npy"
+NODES_FILE_NAME = "nodes.bin"
+OFFSETS_FILE_NAME = "nodes.offsets.npy"
+
+_NODE_CLASSES = {cls.class_name(): cls for cls in (TextNode, ImageNode, IndexNode)}
+
+
+def _encode_node(node: BaseNode) -> bytes:
+    node_dict = node.dict()
+    node_dict["embedding"] = None
+    return json.dumps({"type": node.class_name(), "node": node_dict}, ensure_ascii=False).encode("utf-8")
+
+
+def _decode_node(payload: bytes) -> BaseNode:
+    record = json.loads(payload)
+    node_cls = _NODE_CLASSES.get(record["type"], TextNode)
+    return node_cls.from_dict(record["node"])
+
+
+@contextmanager
+def _replace_atomically(path):
+    """
+    Opens a temporary file for writing that replaces `path` once it is closed.
+
+    Processes that memory-mapped the previous file keep reading the previous contents instead of
+    faulting on a truncated mapping.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        yield file
+    os.replace(temporary_path, path)
+
+
+def write_binary_store(nodes: Sequence[BaseNode], embeddings, persist_dir) -> dict:
+    """
+    Writes nodes and their embeddings to the binary vector store format.
+
+    Embeddings are L2-normalized and written as one contiguous float32 `.npy` matrix, so cosine
+    similarity becomes a dot product and the matrix can be memory-mapped as-is. Node text and metadata
+    are written as JSON records to a single binary file, addressed through an offsets array.
+
+    Args:
+        nodes (Sequence[BaseNode]): The nodes to persist, in the same order as `embeddings`.
+        embeddings (array-like): A (num_nodes, dim) matrix of node embeddings.
+        persist_dir (str or Path): The directory to write the store to.
+
+    Returns:
+        dict: The manifest written alongside the store.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2 or vectors.shape[0] != len(nodes):
+        raise ValueError(f"Expected a ({len(nodes)}, dim) embedding matrix, got shape {vectors.shape}.")
+    vectors = normalize_rows(vectors)
+
+    os.makedirs(persist_dir, exist_ok=True)
+    # The manifest of a previous build goes first and the new one is written last, so a rebuild interrupted
+    # between the files below leaves a store without a manifest, never mixed files under a valid one
+    manifest_path = os.path.join(persist_dir, BINARY_STORE_MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    with _replace_atomically(os.path.join(persist_dir, VECTORS_FILE_NAME)) as vectors_file:
+        np.save(vectors_file, vectors)
+
+    offsets = np.zeros(len(nodes) + 1, dtype=np.uint64)
+    with _replace_atomically(os.path.join(persist_dir, NODES_FILE_NAME)) as nodes_file:
+        for position, node in enumerate(nodes):
+            payload = _encode_node(node)
+            nodes_file.write(payload)
+            offsets[position + 1] = offsets[position] + len(payload)
+    with _replace_atomically(os.path.join(persist_dir, OFFSETS_FILE_NAME)) as offsets_file:
+        np.save(offsets_file, offsets)
+
+    manifest = {
+        "format_version": BINARY_STORE_FORMAT_VERSION,
+        "build_id": uuid.uuid4().hex,
+        "created_at": datetime.now().isoformat(),
+        "num_nodes": len(nodes),
+        "dim": int(vectors.shape[1]) if len(nodes) else 0,
+        "normalized": True,
+    }
+    with _replace_atomically(manifest_path) as manifest_file:
+        manifest_file.write(json.dumps(manifest, indent=2).encode("utf-8"))
+
+    return manifest
+
+
+def write_binary_store_from_index(index: VectorStoreIndex, persist_dir) -> dict:
+    """
+    Writes the nodes and embeddings of an in-memory `VectorStoreIndex` to the binary vector store format.
+
+    Args:
+        index (VectorStoreIndex): An index backed by the default docstore and simple vector store.
+        persist_dir (str or Path): The directory to write the store to.
+
+    Returns:
+        dict: The manifest written alongside the store.
+    """
+    node_ids = list(index.index_struct.nodes_dict.values())
+    nodes = index.docstore.get_nodes(node_ids)
+    embeddings = [index.vector_store.get(node_id) for node_id in node_ids]
+    return write_binary_store(nodes, embeddings, persist_dir)
+
+
+def has_binary_store(persist_dir) -> bool:
+    return os.path.exists(os.path.join(persist_dir, BINARY_STORE_MANIFEST))
+
+
+class MemmapVectorStore(BasePydanticVectorStore):
+    """
+    Read-only vector store over the binary format written by `write_binary_store`.
+
+    The embedding matrix and the node records are memory-mapped, so loading is independent of the
+    corpus size and pages are shared between processes. Nodes are only decoded when they are returned
+    from a query.
+    """
+
+    stores_text: bool = True
+    is_embedding_query: bool = True
+
+    persist_dir: str
+    manifest: dict
+
+    _vectors: np.ndarray = PrivateAttr()
+    _searcher: DenseSearcher = PrivateAttr()
+    _offsets: np.ndarray = PrivateAttr()
+    _nodes_file: Any = PrivateAttr()
+    _nodes_mmap: Any = PrivateAttr()
+
+    def __init__(self, persist_dir, manifest: dict, **kwargs: Any) -> None:
+        super().__init__(persist_dir=str(persist_dir), manifest=manifest, **kwargs)
+        self._vectors = np.load(os.path.join(self.persist_dir, VECTORS_FILE_NAME), mmap_mode="r")
+        self._searcher = DenseSearcher(self._vectors, normalized=True)
+        self._offsets = np.load(os.path.join(self.persist_dir, OFFSETS_FILE_NAME), mmap_mode="r")
+        self._nodes_file = open(os.path.join(self.persist_dir, NODES_FILE_NAME), "rb")
+        self._nodes_mmap = (
+            mmap.mmap(self._nodes_file.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] > 0 else b""
+        )
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir) -> "MemmapVectorStore":
+        with open(os.path.join(persist_dir, BINARY_STORE_MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("format_version") != BINARY_STORE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported binary store format version {manifest.get('format_version')} in {persist_dir}."
+            )
+        return cls(persist_dir=persist_dir, manifest=manifest)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MemmapVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The memory-mapped, L2-normalized (num_nodes, dim) embedding matrix."""
+        return self._vectors
+
+    @property
+    def searcher(self) -> DenseSearcher:
+        return self._searcher
+
+    def __len__(self) -> int:
+        return int(self._vectors.shape[0])
+
+    def get_node(self, position: int) -> BaseNode:
+        """Decodes the node stored at the given row of the embedding matrix."""
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return _decode_node(self._nodes_mmap[start:end])
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters=None) -> List[BaseNode]:
+        if filters is not None:
+            raise ValueError("Metadata filters are not supported by MemmapVectorStore.")
+        nodes = [self.get_node(position) for position in range(len(self))]
+        if node_ids is None:
+            return nodes
+        wanted = set(node_ids)
+        return [node for node in nodes if node.node_id in wanted]
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        raise NotImplementedError("MemmapVectorStore is read-only, rebuild it with `write_binary_store`.")
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        raise NotImplementedError("MemmapVectorStore is read-only, rebuild it with `write_binary_store`.")
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by MemmapVectorStore.")
+        if query.query_embedding is None or len(self) == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        scores, positions = self.searcher.search(query.query_embedding, query.similarity_top_k)
+        nodes = [self.get_node(int(position)) for position in positions]
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=[float(score) for score in scores],
+            ids=[node.node_id for node in nodes],
+        )
+
+
+def load_vector_index(index_path, embed_model=None) -> VectorStoreIndex:
+    """
+    Loads the persisted index, preferring the memory-mapped binary store over the JSON storage context.
+
+    Args:
+        index_path (str or Path): The directory the index was persisted to.
+        embed_model (BaseEmbedding, optional): The embedding model used for queries. Defaults to `Settings.embed_model`.
+
+    Returns:
+        VectorStoreIndex: The loaded index.
+    """
+    if has_binary_store(index_path):
+        vector_store = MemmapVectorStore.from_persist_dir(index_path)
+        logger.info(f"Loaded binary vector store with {len(vector_store)} nodes from {index_path}")
+        return VectorStoreIndex.from_vector_store(vector_store, embed_model=embed_model)
+
+    logger.info(f"No binary vector store found in {index_path}, loading the JSON storage context")
+    storage_context = StorageContext.from_defaults(persist_dir=str(index_path))
+    return load_index_from_storage(storage_context, embed_model=embed_model)
+
+
+def index_build_id(index: VectorStoreIndex) -> Optional[str]:
+    """Returns the build id of an index loaded from the binary store, None for the JSON storage context."""
+    vector_store = index.vector_store
+    if isinstance(vector_store, MemmapVectorStore):
+        return vector_store.manifest.get("build_id")
+    return None
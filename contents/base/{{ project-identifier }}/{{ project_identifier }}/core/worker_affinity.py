@@ -0,0 +1,220 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+import aiohttp
+from loguru import logger
+
+# Separates the worker number from the rest of an Engine.IO session id
+SESSION_ID_SEPARATOR = "."
+# Marks requests forwarded by another worker, which are always served where they arrive
+FORWARDED_HEADER = b"x-forwarded-by-worker"
+# Headers of a single connection, never forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "content-length",
+    "keep-alive",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+# Negotiated again by the websocket client of the forwarding worker
+WEBSOCKET_HANDSHAKE_HEADERS = {
+    "sec-websocket-extensions",
+    "sec-websocket-key",
+    "sec-websocket-protocol",
+    "sec-websocket-version",
+}
+
+
+def worker_socket_path(socket_dir: str, worker: int) -> str:
+    """The Unix socket a worker receives the forwarded requests of its sessions on."""
+    return os.path.join(socket_dir, f"worker-{worker}.sock")
+
+
+def prefix_session_ids(eio_server, worker: int):
+    """
+    Makes an Engine.IO server start the ids of its sessions with the number of its worker, so any worker can tell
+    which one a request of the session belongs to.
+    """
+    generate_id = eio_server.generate_id
+    eio_server.generate_id = lambda: f"{worker}{SESSION_ID_SEPARATOR}{generate_id()}"
+
+
+def session_worker(query_string: bytes) -> Optional[int]:
+    """The worker that owns the Engine.IO session of a request, None before the session is opened."""
+    session_ids = parse_qs(query_string.decode("latin-1")).get("sid")
+    if not session_ids:
+        return None
+    worker, separator, _ = session_ids[0].partition(SESSION_ID_SEPARATOR)
+    if not separator or not worker.isdigit():
+        return None
+    return int(worker)
+
+
+class SessionAffinityMiddleware:
+    """
+    ASGI middleware that sends every request of a Socket.IO session to the worker process that opened it.
+
+    Socket.IO sessions live in the memory of one process. Workers accept connections from a shared socket, so the
+    long-polling requests of a session, and the websocket it upgrades to, may arrive at any worker. Those of a
+    session opened by another worker are forwarded to it over its Unix socket; websockets are relayed for their
+    lifetime. Other requests are served where they arrive. `fetch_from_workers` collects data from the other
+    workers, e.g. their metrics.
+
+    Usage:
+    ```
+    prefix_session_ids(sio.eio, worker)
+    app = SessionAffinityMiddleware(app, worker, num_workers, socket_dir)
+    ```
+
+    Args:
+        app: The ASGI app of the worker.
+        worker (int): The number of the worker.
+        num_workers (int): The number of workers, sessions of others are served locally.
+        socket_dir (str): The directory of the Unix sockets of the workers, see `worker_socket_path`.
+        path (str, optional): The path Socket.IO is mounted at. Defaults to "/ws/socket.io".
+    """
+
+    def __init__(self, app, worker: int, num_workers: int, socket_dir: str, path: str = "/ws/socket.io"):
+        self.app = app
+        self.worker = worker
+        self.num_workers = num_workers
+        self.socket_dir = socket_dir
+        self.path = path.rstrip("/")
+        self._sessions: Dict[int, aiohttp.ClientSession] = {}
+
+    async def __call__(self, scope, receive, send):
+        owner = self._owner(scope)
+        if owner is None:
+            await self.app(scope, receive, send)
+        elif scope["type"] == "http":
+            await self._forward_http(owner, scope, receive, send)
+        else:
+            await self._forward_websocket(owner, scope, receive, send)
+
+    def _owner(self, scope) -> Optional[int]:
+        """The worker to forward a request to, None to serve it here."""
+        if scope["type"] not in ("http", "websocket") or not scope["path"].rstrip("/").endswith(self.path):
+            return None
+        if any(name == FORWARDED_HEADER for name, _ in scope["headers"]):
+            return None
+        owner = session_worker(scope.get("query_string", b""))
+        if owner is None or owner == self.worker or owner >= self.num_workers:
+            return None
+        return owner
+
+    def _session(self, owner: int) -> aiohttp.ClientSession:
+        session = self._sessions.get(owner)
+        if session is None or session.closed:
+            connector = aiohttp.UnixConnector(path=worker_socket_path(self.socket_dir, owner))
+            # Bodies are passed on as they are, compressed or not
+            session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+            self._sessions[owner] = session
+        return session
+
+    async def fetch_from_workers(self, path: str) -> List:
+        """
+        GETs `path` from every other worker and returns their JSON responses. Workers that do not answer, e.g.
+        while they restart, are left out.
+        """
+
+        async def fetch(worker: int):
+            headers = {FORWARDED_HEADER.decode(): str(self.worker)}
+            async with self._session(worker).get(f"http://worker{path}", headers=headers) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        workers = [worker for worker in range(self.num_workers) if worker != self.worker]
+        responses = await asyncio.gather(*(fetch(worker) for worker in workers), return_exceptions=True)
+        for worker, response in zip(workers, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"Fetching {path} from worker {worker} failed: {response!r}")
+        return [response for response in responses if not isinstance(response, Exception)]
+
+    def _url(self, scope) -> str:
+        query_string = scope.get("query_string", b"").decode("latin-1")
+        url = f"http://worker{scope.get('root_path', '')}{scope['path']}"
+        return f"{url}?{query_string}" if query_string else url
+
+    def _headers(self, scope, excluded) -> list:
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in scope["headers"]
+            if name.decode("latin-1").lower() not in excluded
+        ]
+        headers.append((FORWARDED_HEADER.decode(), str(self.worker)))
+        return headers
+
+    async def _forward_http(self, owner: int, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        try:
+            async with self._session(owner).request(
+                scope["method"], self._url(scope), headers=self._headers(scope, HOP_BY_HOP_HEADERS), data=body
+            ) as response:
+                status, raw_headers, body = response.status, response.raw_headers, await response.read()
+        except aiohttp.ClientError as e:
+            logger.warning(f"Forwarding a request to worker {owner} failed: {e}")
+            status, raw_headers, body = 502, [], b""
+
+        headers = [(name.lower(), value) for name, value in raw_headers]
+        headers = [(name, value) for name, value in headers if name.decode("latin-1") not in HOP_BY_HOP_HEADERS]
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _forward_websocket(self, owner: int, scope, receive, send):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        try:
+            upstream = await self._session(owner).ws_connect(
+                self._url(scope),
+                headers=self._headers(scope, HOP_BY_HOP_HEADERS | WEBSOCKET_HANDSHAKE_HEADERS),
+                protocols=scope.get("subprotocols", ()),
+                compress=0,
+                max_msg_size=0,
+            )
+        except aiohttp.ClientError as e:
+            logger.warning(f"Forwarding a websocket to worker {owner} failed: {e}")
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        await send({"type": "websocket.accept", "subprotocol": upstream.protocol})
+
+        async def from_client():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("text") is not None:
+                    await upstream.send_str(message["text"])
+                elif message.get("bytes") is not None:
+                    await upstream.send_bytes(message["bytes"])
+
+        async def from_owner():
+            async for message in upstream:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    await send({"type": "websocket.send", "text": message.data})
+                elif message.type == aiohttp.WSMsgType.BINARY:
+                    await send({"type": "websocket.send", "bytes": message.data})
+            await send({"type": "websocket.close", "code": upstream.close_code or 1000})
+
+        tasks = [asyncio.ensure_future(from_client()), asyncio.ensure_future(from_owner())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await upstream.close()
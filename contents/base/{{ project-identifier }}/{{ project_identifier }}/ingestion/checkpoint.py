@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class CheckpointStore:
+    """
+    Durable record of the completed units of an index build, so a crashed or interrupted build resumes
+    without paying again for the parsing, question extraction and embedding requests it already made.
+
+    Units are keyed by content hashes (of a PDF, a page or an embedded text), so a checkpoint is only reused
+    for identical input. Every `put` is committed immediately. SQLite makes concurrent writes from the
+    pipeline workers safe.
+
+    Usage:
+    ```
+    checkpoints = CheckpointStore(path)
+    parsed = checkpoints.get("parse", file_hash)
+    if parsed is None:
+        parsed = parse(pdf_file)
+        checkpoints.put("parse", file_hash, parsed)
+    ```
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS units (stage TEXT, key TEXT, value BLOB NOT NULL, PRIMARY KEY (stage, key))"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """Returns the JSON value checkpointed for a unit, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM units WHERE stage = ? AND key = ?", (stage, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, stage: str, key: str, value: Any):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO units (stage, key, value) VALUES (?, ?, ?)", (stage, key, json.dumps(value))
+            )
+
+    def get_vectors(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Returns the checkpointed embeddings among `keys`."""
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                row = self._connection.execute("SELECT vector FROM vectors WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vectors[key] = np.frombuffer(row[0], dtype=np.float32).tolist()
+        return vectors
+
+    def put_vectors(self, keys: Iterable[str], vectors: Iterable[List[float]]):
+        """Checkpoints a batch of embeddings in one transaction."""
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in zip(keys, vectors)]
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.executemany("INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)", rows)
+            self._connection.execute("COMMIT")
+
+    def count(self) -> Dict[str, int]:
+        """Returns the number of checkpointed units per stage, embeddings included."""
+        with self._lock:
+            counts = dict(self._connection.execute("SELECT stage, COUNT(*) FROM units GROUP BY stage").fetchall())
+            counts["embedding"] = self._connection.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        return counts
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM units")
+            self._connection.execute("DELETE FROM vectors")
+            self._connection.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,94 @@
+import os
+from typing import List
+
+from llama_index.core.schema import BaseNode, NodeRelationship, RelatedNodeInfo, TextNode
+
+from {{ project_identifier }}.core.context_packer import QUESTIONS_METADATA_KEY, split_section_text, split_sections
+from {{ project_identifier }}.ingestion.scheduler import count_tokens
+from {{ project_identifier }}.utils.common import CHUNK_INDEX_KEY, PARENT_PAGE_ID_KEY
+
+# Largest chunk in tokens, its heading included. Oversized tables and paragraphs are split by rows and sentences
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", 256))
+# Chunks smaller than this take in the next section even under another heading
+CHUNK_MIN_TOKENS = int(os.environ.get("CHUNK_MIN_TOKENS", 64))
+
+
+def split_chunks(text: str, max_tokens: int = CHUNK_MAX_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS) -> List[str]:
+    """
+    Splits a parsed markdown page into chunks of at most `max_tokens` that follow its structure.
+
+    Consecutive sections (see `split_sections`) under the same heading are merged while they fit, every chunk
+    starts with the heading of its first section. A chunk smaller than `min_tokens` also takes in the sections
+    of the next heading, so short headings and captions are not embedded on their own. A table or paragraph
+    larger than `max_tokens` is split by rows, repeating its header, or by lines and sentences. A single row or
+    sentence larger than `max_tokens` is kept whole.
+    """
+    chunks, parts, heading = [], [], None
+
+    def flush():
+        if parts:
+            chunks.append("\n\n".join(parts))
+            parts.clear()
+
+    for section in split_sections(text):
+        if section.tokens > max_tokens:
+            heading_tokens = count_tokens(f"{section.heading}\n\n") if section.heading is not None else 0
+            pieces = split_section_text(section.text, max_tokens - heading_tokens)
+        else:
+            pieces = [section.text]
+        for piece in pieces:
+            same_heading = bool(parts) and section.heading == heading
+            added = [piece] if same_heading or section.heading is None else [section.heading, piece]
+            if (
+                parts
+                and (same_heading or count_tokens("\n\n".join(parts)) < min_tokens)
+                and count_tokens("\n\n".join(parts + added)) <= max_tokens
+            ):
+                parts.extend(added)
+            else:
+                flush()
+                parts.extend([section.heading, piece] if section.heading is not None else [piece])
+            heading = section.heading
+    flush()
+    return chunks
+
+
+def chunk_page(
+    page: BaseNode, max_tokens: int = CHUNK_MAX_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS
+) -> List[TextNode]:
+    """
+    Cuts a page node into chunk nodes that each keep a back-reference to the page.
+
+    Chunks carry the metadata of the page (page number, image and source file paths, page hash), so
+    references still group them by document and page, with their own text as `parsed_text_markdown`. The
+    page id is stored under `PARENT_PAGE_ID_KEY` and as the source relationship of the chunk. Questions
+    generated for the page describe the whole page, they are kept out of the embedded text of its chunks.
+
+    Args:
+        page (BaseNode): A page node with a stable id.
+        max_tokens (int, optional): Largest chunk in tokens. Defaults to `CHUNK_MAX_TOKENS`.
+        min_tokens (int, optional): Smallest chunk merged with the next heading. Defaults to `CHUNK_MIN_TOKENS`.
+
+    Returns:
+        List[TextNode]: The chunks in page order, with ids `<page id>:c<chunk index>`.
+    """
+    chunk_keys = [PARENT_PAGE_ID_KEY, CHUNK_INDEX_KEY]
+    excluded_embed_metadata_keys = page.excluded_embed_metadata_keys + chunk_keys + [QUESTIONS_METADATA_KEY]
+    excluded_llm_metadata_keys = page.excluded_llm_metadata_keys + chunk_keys
+    chunks = []
+    for index, text in enumerate(split_chunks(page.get_content(), max_tokens, min_tokens)):
+        metadata = dict(page.metadata, parsed_text_markdown=text)
+        metadata[PARENT_PAGE_ID_KEY] = page.node_id
+        metadata[CHUNK_INDEX_KEY] = index
+        chunks.append(
+            TextNode(
+                id_=f"{page.node_id}:c{index}",
+                text=text,
+                metadata=metadata,
+                excluded_embed_metadata_keys=list(excluded_embed_metadata_keys),
+                excluded_llm_metadata_keys=list(excluded_llm_metadata_keys),
+                relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=page.node_id)},
+            )
+        )
+    return chunks
+
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+INGESTION_MANIFEST = "ingestion_manifest.json"
+INGESTION_MANIFEST_VERSION = 1
+
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IngestionPlan:
+    """The files of a document folder grouped by what ingestion has to do with them."""
+
+    new: List[Path] = field(default_factory=list)
+    changed: List[Path] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    file_hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def to_parse(self) -> List[Path]:
+        return self.new + self.changed
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.new)} new, {len(self.changed)} changed, {len(self.unchanged)} unchanged "
+            f"and {len(self.deleted)} deleted files"
+        )
+
+
+class IngestionManifest:
+    """
+    Records the content hash of every ingested PDF and of every parsed page, so re-running ingestion only
+    re-parses new or changed files and only re-embeds new or changed pages.
+
+    The manifest is stored next to the index it describes and written after the index, so it never
+    refers to pages the index does not contain.
+
+    Usage:
+    ```
+    manifest = IngestionManifest.load(index_path)
+    plan = manifest.plan(pdf_files)
+    ...
+    manifest.record_file(pdf_file.name, plan.file_hashes[pdf_file.name], page_hashes)
+    manifest.save(index_path)
+    ```
+    """
+
+    def __init__(self, files: dict = None, chunking: str = "pages"):
+        # file name -> {"sha256": file hash, "pages": [page markdown hash, ...]}
+        self.files = files or {}
+        # How pages were cut into nodes, manifests written before chunking embedded whole pages
+        self.chunking = chunking
+
+    @classmethod
+    def load(cls, persist_dir) -> "IngestionManifest":
+        """Returns the manifest saved in `persist_dir`, or an empty one."""
+        path = os.path.join(persist_dir, INGESTION_MANIFEST)
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("version") != INGESTION_MANIFEST_VERSION:
+            raise ValueError(f"Unsupported ingestion manifest version {manifest.get('version')} in {persist_dir}.")
+        return cls(manifest["files"], chunking=manifest.get("chunking", "pages"))
+
+    @staticmethod
+    def exists(persist_dir) -> bool:
+        return os.path.exists(os.path.join(persist_dir, INGESTION_MANIFEST))
+
+    def save(self, persist_dir):
+        manifest = {
+            "version": INGESTION_MANIFEST_VERSION,
+            "updated_at": datetime.now().isoformat(),
+            "chunking": self.chunking,
+            "files": self.files,
+        }
+        path = os.path.join(persist_dir, INGESTION_MANIFEST)
+        with open(f"{path}.tmp", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def plan(self, pdf_files) -> IngestionPlan:
+        """Hashes `pdf_files` and compares them with the recorded files."""
+        plan = IngestionPlan()
+        for pdf_file in pdf_files:
+            pdf_file = Path(pdf_file)
+            file_hash = file_sha256(pdf_file)
+            plan.file_hashes[pdf_file.name] = file_hash
+            recorded = self.files.get(pdf_file.name)
+            if recorded is None:
+                plan.new.append(pdf_file)
+            elif recorded["sha256"] != file_hash:
+                plan.changed.append(pdf_file)
+            else:
+                plan.unchanged.append(pdf_file)
+        plan.deleted = sorted(set(self.files) - set(plan.file_hashes))
+        return plan
+
+    def page_hashes(self, file_name: str) -> List[str]:
+        return self.files.get(file_name, {}).get("pages", [])
+
+    def record_file(self, file_name: str, file_hash: str, page_hashes: List[str]):
+        self.files[file_name] = {"sha256": file_hash, "pages": list(page_hashes)}
+
+    def remove_file(self, file_name: str):
+        self.files.pop(file_name, None)
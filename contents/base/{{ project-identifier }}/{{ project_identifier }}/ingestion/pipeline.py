@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List
+
+from {{ project_identifier }}.utils.common import ScriptTimer
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name (str): Used in timings and logs.
+        fn (Callable): Called with the output of the previous stage. Returning None drops the item.
+        workers (int, optional): Threads running `fn` concurrently. Defaults to 1.
+    """
+
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class StageFailure:
+    stage: str
+    item: Any
+    error: BaseException
+
+
+class Pipeline:
+    """
+    Runs items through consecutive stages, every stage with its own worker threads, so different items are
+    in different stages at the same time (e.g. one PDF is embedded while the next one is being parsed).
+
+    Each stage is timed with a `ScriptTimer` from its first item to its last, and the time its workers
+    spent busy is logged when it finishes. An item whose stage raises is logged, recorded in `failures` and
+    dropped, the other items carry on.
+
+    Usage:
+    ```
+    pipeline = Pipeline([Stage("parse", parse, workers=4), Stage("embed", embed)], logger=logger)
+    results = pipeline.run(pdf_files)
+    ```
+    """
+
+    def __init__(self, stages: List[Stage], logger=None, queue_size: int = 8):
+        self.stages = stages
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue_size = queue_size
+        self.failures: List[StageFailure] = []
+        self.busy_seconds = {stage.name: 0.0 for stage in stages}
+        self._lock = threading.Lock()
+
+    def _run_stage(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue):
+        timer = ScriptTimer(f"Stage '{stage.name}'", logger=self.logger)
+        started = threading.Event()
+        remaining = [stage.workers]
+
+        def work():
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                with self._lock:
+                    if not started.is_set():
+                        started.set()
+                        timer.__enter__()
+                before = time.perf_counter()
+                try:
+                    result = stage.fn(item)
+                except Exception as error:
+                    self.logger.error(f"Stage '{stage.name}' failed for {item}: {error}")
+                    self.logger.error(traceback.format_exc())
+                    with self._lock:
+                        self.failures.append(StageFailure(stage.name, item, error))
+                    result = None
+                with self._lock:
+                    self.busy_seconds[stage.name] += time.perf_counter() - before
+                if result is not None:
+                    outbox.put(result)
+
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                if started.is_set():
+                    timer.__exit__(None, None, None)
+                    self.logger.info(f"● Stage '{stage.name}' workers were busy {self.busy_seconds[stage.name]:.1f}s")
+                outbox.put(_DONE)
+            else:
+                # Let the next worker of this stage see the end of the input too
+                inbox.put(_DONE)
+
+        return [
+            threading.Thread(target=work, name=f"{stage.name}-{worker}", daemon=True) for worker in range(stage.workers)
+        ]
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Returns the outputs of the last stage, in completion order."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages] + [queue.Queue()]
+        threads = []
+        for stage, inbox, outbox in zip(self.stages, queues, queues[1:]):
+            threads.extend(self._run_stage(stage, inbox, outbox))
+        for thread in threads:
+            thread.start()
+
+        for item in items:
+            queues[0].put(item)
+        queues[0].put(_DONE)
+
+        results = []
+        while True:
+            result = queues[-1].get()
+            if result is _DONE:
+                break
+            results.append(result)
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence
+
+import openai
+
+from llama_index.core.utils import get_tokenizer
+
+RATE_LIMIT_STATUS = 429
+TRANSIENT_STATUSES = {408, 409, 500, 502, 503, 504}
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text))
+
+
+class TokenBucket:
+    """
+    Token bucket holding at most `limit` units, refilled continuously at `limit` units per `period_seconds`.
+
+    Callers reserve units up front and are told how long to wait before using them, so concurrent callers
+    queue up fairly instead of polling. Not thread-safe on its own, `RateLimitScheduler` serializes access.
+    """
+
+    def __init__(self, limit: float, period_seconds: float = 60, clock=time.monotonic):
+        self.capacity = float(limit)
+        self.rate = self.capacity / period_seconds
+        self.clock = clock
+        self.level = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` units, possibly into debt, and returns the seconds to wait before using them."""
+        self._refill()
+        # A single request larger than the bucket could never run otherwise
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def pause(self, seconds: float):
+        """Empties the bucket so that no reservation can be used within the next `seconds`."""
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Reads the `retry-after-ms` or `retry-after` header of an OpenAI API error, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class RateLimitScheduler:
+    """
+    Runs API calls within requests/minute and tokens/minute budgets, with at most `max_in_flight` calls at once.
+
+    Every call reserves one request and its estimated tokens from two token buckets before it is sent, so
+    the budgets are respected up front rather than discovered through rate limit errors. When the API still
+    answers 429 (e.g. another client shares the key), both buckets are paused for the server's retry-after
+    delay and the call is queued again. Connection errors and transient 5xx statuses are retried with
+    exponential backoff. Other errors are raised.
+
+    Args:
+        requests_per_minute (float): The request budget.
+        tokens_per_minute (float): The token budget.
+        max_in_flight (int, optional): Concurrent calls. Defaults to 4.
+        max_attempts (int, optional): Attempts per call before the last error is raised. Defaults to 8.
+        period_seconds (float, optional): The period both budgets apply to. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_in_flight: int = 4,
+        max_attempts: int = 8,
+        period_seconds: float = 60,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        logger=None,
+    ):
+        self.requests = TokenBucket(requests_per_minute, period_seconds, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, period_seconds, clock=clock)
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.sleep = sleep
+        self.logger = logger or logging.getLogger(__name__)
+        self.calls = 0
+        self.rate_limited = 0
+        self.transient_errors = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def call(self, fn: Callable, tokens: int, on_rate_limit: Callable[[], None] = None):
+        """
+        Calls `fn()` once the budgets allow `tokens` more tokens and returns its result.
+
+        Args:
+            fn (Callable): The API call.
+            tokens (int): The tokens the call is expected to consume.
+            on_rate_limit (Callable, optional): Called whenever the API answers 429.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            with self._lock:
+                delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+                self.wait_seconds += delay
+            if delay:
+                self.sleep(delay)
+
+            with self._in_flight:
+                try:
+                    result = fn()
+                    with self._lock:
+                        self.calls += 1
+                    return result
+                except Exception as error:
+                    status = getattr(error, "status_code", None)
+                    if status == RATE_LIMIT_STATUS and attempt < self.max_attempts:
+                        pause = retry_after_seconds(error) or 1.0
+                        with self._lock:
+                            self.rate_limited += 1
+                            self.requests.pause(pause)
+                            self.tokens.pause(pause)
+                        self.logger.warning(f"Rate limited, pausing for {pause:.2f}s (attempt {attempt})")
+                        if on_rate_limit is not None:
+                            on_rate_limit()
+                    elif (
+                        status in TRANSIENT_STATUSES or isinstance(error, openai.APIConnectionError)
+                    ) and attempt < self.max_attempts:
+                        with self._lock:
+                            self.transient_errors += 1
+                        backoff = min(2 ** (attempt - 1), 30)
+                        self.logger.warning(f"{type(error).__name__}, retrying in {backoff}s (attempt {attempt})")
+                        self.sleep(backoff)
+                    else:
+                        raise
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "transient_errors": self.transient_errors,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
+
+
+class BatchedEmbedder:
+    """
+    Embeds texts in batches sized by token count, sent through a `RateLimitScheduler`.
+
+    The batch token budget adapts: it is halved whenever a batch is rate limited, so large batches do not
+    keep colliding with the tokens/minute limit, and it grows back by a quarter after every
+    `grow_after` successful batches, up to `max_batch_tokens`.
+
+    Args:
+        embed_batch (Callable): Embeds a list of texts with a single API request.
+        scheduler (RateLimitScheduler): Budgets and concurrency of the requests.
+        max_batch_tokens (int, optional): Upper bound of the batch token budget, also capped by the
+            tokens/minute budget. Defaults to 100000.
+        max_batch_size (int, optional): Upper bound of texts per batch. Defaults to 256.
+        min_batch_tokens (int, optional): Lower bound of the adaptive budget. Defaults to 500.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        scheduler: RateLimitScheduler,
+        max_batch_tokens: int = 100000,
+        max_batch_size: int = 256,
+        min_batch_tokens: int = 500,
+        grow_after: int = 4,
+    ):
+        self.embed_batch = embed_batch
+        self.scheduler = scheduler
+        self.max_batch_tokens = min(max_batch_tokens, int(scheduler.tokens.capacity))
+        self.max_batch_size = max_batch_size
+        self.min_batch_tokens = min(min_batch_tokens, self.max_batch_tokens)
+        self.batch_tokens = self.max_batch_tokens
+        self.grow_after = grow_after
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def _shrink(self):
+        with self._lock:
+            self.batch_tokens = max(self.min_batch_tokens, self.batch_tokens // 2)
+            self._successes = 0
+
+    def _grow(self):
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.grow_after:
+                self.batch_tokens = min(self.max_batch_tokens, int(self.batch_tokens * 1.25))
+                self._successes = 0
+
+    def _next_batch(self, token_counts: Sequence[int], start: int) -> int:
+        """Returns the end of the batch starting at `start` under the current budget, at least one text."""
+        end, total = start, 0
+        while end < len(token_counts) and end - start < self.max_batch_size:
+            if end > start and total + token_counts[end] > self.batch_tokens:
+                break
+            total += token_counts[end]
+            end += 1
+        return end
+
+    def _run_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        embeddings = self.scheduler.call(lambda: self.embed_batch(texts), tokens, on_rate_limit=self._shrink)
+        self._grow()
+        return embeddings
+
+    def embed(
+        self, texts: Sequence[str], on_batch: Callable[[List[str], List[List[float]]], None] = None
+    ) -> List[List[float]]:
+        """
+        Returns the embeddings of `texts`, in order.
+
+        Args:
+            texts (Sequence[str]): The texts to embed.
+            on_batch (Callable, optional): Called with the texts and embeddings of every completed batch, e.g.
+                to checkpoint them before the remaining batches are done.
+        """
+        texts = list(texts)
+        token_counts = [count_tokens(text) for text in texts]
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        start, pending = 0, {}
+        with ThreadPoolExecutor(max_workers=self.scheduler.max_in_flight) as executor:
+            while start < len(texts) or pending:
+                # Batches are cut lazily, so they follow the budget as it adapts
+                while start < len(texts) and len(pending) < self.scheduler.max_in_flight:
+                    end = self._next_batch(token_counts, start)
+                    future = executor.submit(self._run_batch, texts[start:end], sum(token_counts[start:end]))
+                    pending[future] = (start, end)
+                    start = end
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_start, batch_end = pending.pop(future)
+                    batch_embeddings = future.result()
+                    embeddings[batch_start:batch_end] = batch_embeddings
+                    if on_batch is not None:
+                        on_batch(texts[batch_start:batch_end], batch_embeddings)
+        return embeddings
+
+
+def openai_embed_batch(client: openai.OpenAI, model: str) -> Callable[[List[str]], List[List[float]]]:
+    """
+    Returns a function embedding a batch of texts with one request and no client-side retries.
+
+    Newlines are replaced like `OpenAIEmbedding` does, so stored embeddings match query embeddings.
+    """
+
+    def embed_batch(texts: List[str]) -> List[List[float]]:
+        response = client.embeddings.create(input=[text.replace("\n", " ") for text in texts], model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    return embed_batch
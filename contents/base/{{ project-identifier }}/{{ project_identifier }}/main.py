@@ -1,4 +1,5 @@
 import os
+import time
 from loguru import logger
 import chainlit as cl
 import openai
@@ -6,16 +7,36 @@ import openai
 from typing import List  # noqa
 
 from chainlit.server import app
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
 import {{ project_identifier }}.utils.configuration as configuration
 from {{ project_identifier }}.core.settings import get_settings
 from {{ project_identifier }}.utils.chat_profiles import CHAT_PROFILES
-from {{ project_identifier }}.core.core import process_response_for_references, select_agent
+from {{ project_identifier }}.core.core import (
+    OPERATOR_TEXT_ACTION,
+    process_response_for_references,
+    query_with_response_cache,
+    restore_agent,
+    select_agent,
+    send_next_operator_text_page,
+)
+from {{ project_identifier }}.core.chat_memory import release_session_memory
+from {{ project_identifier }}.core.session_state import get_session_state_store, release_session_state
+from {{ project_identifier }}.core.index_registry import index_registry
+from {{ project_identifier }}.core.metrics import render_server_metrics, stage_latency
+from {{ project_identifier }}.core.reference_assets import (
+    THUMBNAIL_PATH,
+    ThumbnailCache,
+    fetch_parsed_image,
+    resolve_asset_path,
+    verify_asset_url,
+)
 
 from llama_index.core.agent import ReActAgent  # noqa
 
-from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.base.response.schema import StreamingResponse  # noqa
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse  # noqa
 
 from openinference.instrumentation.llama_index import LlamaIndexInstrumentor
 from phoenix.otel import register
@@ -34,9 +55,11 @@ configuration.configure_logging()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 app_name = "{{ project-title }} Multi Step Agent"
-index_path = os.path.join(os.path.dirname(__file__), "data", "indices")
-storage_context = StorageContext.from_defaults(persist_dir=index_path)
-index = load_index_from_storage(storage_context)
+# Load the index in the background, readiness stays negative until it is available
+index_registry.warm_up()
+thumbnails = ThumbnailCache(THUMBNAIL_PATH)
+# Reference assets are immutable for a given path until the index is rebuilt
+ASSET_HEADERS = {"Cache-Control": "private, max-age=86400"}
 
 
 @cl.set_starters
@@ -122,7 +145,9 @@ async def setup_agent(settings) -> None:
 
 @cl.on_message
 async def main(message: cl.Message):
-    agent = cl.user_session.get("agent")  # type: ReActAgent
+    started = time.perf_counter()
+    # The session may have moved here from another process, which holds its agent
+    agent = cl.user_session.get("agent") or await restore_agent()  # type: ReActAgent
     query_engine = cl.user_session.get("query_engine")
     is_operator = False
 
@@ -130,33 +155,109 @@ async def main(message: cl.Message):
 
     if cl.user_session.get("chat_profile") == "{{ project-title }} Operator Persona":
         is_operator = True
-        res = await cl.make_async(query_engine.query)(message.content)
+        res = await query_with_response_cache(query_engine, message.content)
     else:
-        res = await cl.make_async(agent.stream_chat)(message.content)  # type: StreamingResponse
+        res = await agent.astream_chat(message.content)  # type: StreamingAgentChatResponse
 
-    logger.info(res)
+    # Not the response itself: turning a streaming response into text would read the whole stream
+    logger.info(f"Response: {type(res).__name__} with {len(res.source_nodes)} source nodes")
 
     if not is_operator:
-        for token in res.response_gen:
+        first_token = True
+        async for token in res.async_response_gen():
+            if first_token:
+                stage_latency.observe("answer_first_token", time.perf_counter() - started)
+                first_token = False
             await msg.stream_token(token)
 
-    await msg.send()
-    await process_response_for_references(res, is_operator)
+    with stage_latency.time("message_send"):
+        await msg.send()
+    with stage_latency.time("references"):
+        await process_response_for_references(res, is_operator)
+    stage_latency.observe("turn", time.perf_counter() - started)
+
+
+@cl.action_callback(OPERATOR_TEXT_ACTION)
+async def on_operator_text_page(action: cl.Action):
+    await send_next_operator_text_page(action)
 
 
 @cl.on_chat_start
 async def start():
-    settings = await get_settings()
+    # A session that reconnects to this process after another one served it keeps its settings
+    state = get_session_state_store().get(cl.context.session.id)
+    settings = await get_settings(state.settings if state is not None else None)
     chat_profile = cl.user_session.get("chat_profile")
     logger.info(f"on_chat_start: Starting chat with profile: {chat_profile}")
     await setup_agent(settings)
 
 
+@cl.on_chat_end
+def end():
+    release_session_memory(cl.context.session.thread_id)
+    release_session_state(cl.context.session.id)
+
+
 @app.get("/health/readiness")
 def health_check():
+    if not index_registry.is_ready():
+        status = "failed" if index_registry.error is not None else "loading"
+        return JSONResponse(status_code=503, content={"status": status})
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(await render_server_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/worker")
+def worker_metrics():
+    # The histograms of this process only, which the other workers of `serve.py` add to theirs
+    return JSONResponse(stage_latency.snapshot())
+
+
+def _verify_signature(kind: str, path: str, expires: int, signature: str):
+    # The assets are only sent to signed in users, with URLs signed by `asset_url`
+    if not verify_asset_url(kind, path, expires, signature):
+        raise HTTPException(status_code=403)
+
+
+async def _image_path(path: str):
+    image_path = resolve_asset_path("images", path)
+    if image_path is None or not await cl.make_async(fetch_parsed_image)(image_path):
+        raise HTTPException(status_code=404)
+    return image_path
+
+
+@app.get("/references/images/{path:path}")
+async def reference_image(path: str, expires: int = 0, signature: str = ""):
+    _verify_signature("images", path, expires, signature)
+    return FileResponse(await _image_path(path), headers=ASSET_HEADERS)
+
+
+@app.get("/references/thumbnails/{path:path}")
+async def reference_thumbnail(path: str, expires: int = 0, signature: str = ""):
+    _verify_signature("thumbnails", path, expires, signature)
+    thumbnail_path = await cl.make_async(thumbnails.get)(await _image_path(path))
+    return FileResponse(thumbnail_path, headers=ASSET_HEADERS)
+
+
+@app.get("/references/documents/{path:path}")
+async def reference_document(path: str, expires: int = 0, signature: str = ""):
+    _verify_signature("documents", path, expires, signature)
+    document_path = resolve_asset_path("documents", path)
+    if document_path is None or not document_path.is_file():
+        raise HTTPException(status_code=404)
+    return FileResponse(document_path, headers=ASSET_HEADERS)
+
+
+# Chainlit registers its UI catch-all route when it is imported, keep it behind the routes declared above
+for route in [r for r in app.router.routes if getattr(r, "path", None) == "/{full_path:path}"]:
+    app.router.routes.remove(route)
+    app.router.routes.append(route)
+
+
 if __name__ == "__main__":
     from chainlit.cli import run_chainlit
 
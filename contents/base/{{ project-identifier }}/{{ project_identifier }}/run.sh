@@ -1,3 +1,6 @@
 #!/bin/bash
 {% if 'Phoenix' in observability %}export PHOENIX_OBSERVABILITY=true{% endif %}
-chainlit run main.py -h --host 0.0.0.0 --port 8000
\ No newline at end of file
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+  exec python serve.py
+fi
+exec chainlit run main.py -h --host 0.0.0.0 --port 8000
\ No newline at end of file
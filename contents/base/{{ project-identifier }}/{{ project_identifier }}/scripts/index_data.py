@@ -1,13 +1,21 @@
+import argparse
+import os
 import re
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import logging
 from pathlib import Path
-import traceback
 from dotenv import load_dotenv
 
+import numpy as np
+import openai
+
 from llama_parse import LlamaParse
 
-from llama_index.core import VectorStoreIndex, Document, Settings
+from llama_index.core import VectorStoreIndex, Document, PromptTemplate, Settings
+from llama_index.core.schema import MetadataMode
 
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
@@ -15,12 +23,31 @@ from llama_index.core.extractors import (
     QuestionsAnsweredExtractor,
 )
 
+from {{ project_identifier }}.core.ann import IVFIndex
+from {{ project_identifier }}.core.bm25 import BM25Index, lexical_text
+from {{ project_identifier }}.core.context_packer import QUESTIONS_METADATA_KEY
+from {{ project_identifier }}.core.quantization import ProductQuantizer
+from {{ project_identifier }}.core.vector_store import MemmapVectorStore, has_binary_store, write_binary_store
+from {{ project_identifier }}.ingestion.checkpoint import CheckpointStore
+from {{ project_identifier }}.ingestion.chunking import chunk_page
+from {{ project_identifier }}.ingestion.manifest import IngestionManifest, text_sha256
+from {{ project_identifier }}.ingestion.pipeline import Pipeline, Stage
+from {{ project_identifier }}.ingestion.scheduler import (
+    BatchedEmbedder,
+    RateLimitScheduler,
+    count_tokens,
+    openai_embed_batch,
+)
+from {{ project_identifier }}.utils.common import DOCUMENT_RELATIVE_PATH_KEY, IMAGE_RELATIVE_PATH_KEY, ScriptTimer
+
 load_dotenv()
 
 # Setup models for llama_index
 llm = OpenAI(model="gpt-4o", temperature=0, max_retries=10, timeout=120)
-llm_mini = OpenAI(model="gpt-4o-mini", temperature=0, max_retries=10, timeout=120)
+# Rate limits of the question extraction and embedding requests are handled by the schedulers below
+llm_mini = OpenAI(model="gpt-4o-mini", temperature=0, max_retries=0, timeout=120)
 embed_model = OpenAIEmbedding(model="text-embedding-3-small")
+embedding_client = openai.OpenAI(max_retries=0, timeout=120)
 
 Settings.embed_model = embed_model
 Settings.llm = llm
@@ -32,17 +59,31 @@ DATA_FOLDER_NAME = "data"
 DOCUMENTS_FOLDER_NAME = "documents"
 IMAGES_FOLDER_NAME = "images"
 INDEX_FOLDER_NAME = "indices"
+CHECKPOINTS_FOLDER_NAME = "checkpoints"
+
+# Set to "pq" to also store product-quantized codes of the embeddings (RETRIEVAL_BACKEND=pq)
+VECTOR_COMPRESSION = os.environ.get("VECTOR_COMPRESSION", "none")
+PQ_SUBSPACES = int(os.environ.get("PQ_SUBSPACES", 96))
+# Files processed concurrently by each stage of the ingestion pipeline
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 4))
+# Budgets of the OpenAI account tier, shared by all pipeline workers
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.environ.get("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.environ.get("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 500))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 200000))
+MAX_IN_FLIGHT_REQUESTS = int(os.environ.get("MAX_IN_FLIGHT_REQUESTS", 4))
+# "lazy" skips downloading page images, the application fetches them from LlamaParse when first referenced
+IMAGE_EXTRACTION = os.environ.get("IMAGE_EXTRACTION", "eager")
+# "sections" embeds chunks of headings, paragraphs and tables that point back to their page, "pages" whole pages
+CHUNKING = os.environ.get("CHUNKING", "sections")
+# Prompt template and generated questions of one QuestionsAnsweredExtractor call, on top of the page text
+QUESTION_EXTRACTION_OVERHEAD_TOKENS = 400
 
 data_path = Path(__file__).resolve().parent.parent / DATA_FOLDER_NAME
 data_pdf_path = data_path / DOCUMENTS_FOLDER_NAME
 data_images_path = data_path / IMAGES_FOLDER_NAME
 index_path = data_path / INDEX_FOLDER_NAME
-
-# Early exit if index already exists
-if index_path.exists() and any(index_path.iterdir()):
-    logger.info(f"Index already exists at '{index_path}'. Exiting the script.")
-    logger.info("You can delete the folder and re-run the script in order to rebuild and index.")
-    exit()
+checkpoints_path = data_path / CHECKPOINTS_FOLDER_NAME / "ingestion.sqlite"
 
 # Ensure directories for the index and images exist
 data_images_path.mkdir(parents=True, exist_ok=True)
@@ -70,88 +111,329 @@ def _get_sorted_image_files(image_dir):
     return sorted_files
 
 
-def get_documents(json_dicts, image_dir=None, original_pdf_path=None):
+def get_parsed_image_files(json_result, image_dir):
+    """Get the paths LlamaParse downloads the images of a parsed result to, sorted by page."""
+    image_files = []
+    for page in json_result["pages"]:
+        for image in page.get("images", []):
+            file_name = f"{json_result['job_id']}-{image['name']}"
+            if not file_name.endswith((".png", ".jpg")):
+                file_name += ".png"
+            image_files.append(Path(image_dir) / file_name)
+    return sorted(image_files, key=get_page_number)
+
+
+def get_documents(json_dicts, image_dir=None, original_pdf_path=None, image_files=None):
     """Split docs into documents, attach image metadata."""
     documents = []
-    image_files = _get_sorted_image_files(image_dir) if image_dir is not None else None
+    if image_files is None and image_dir is not None:
+        image_files = _get_sorted_image_files(image_dir)
     md_texts = [d["md"] for d in json_dicts]
     # texts = [d["text"] for d in json_dicts]
 
+    excluded_metadata_keys = [
+        "page_num",
+        "image_path",
+        "source_file_path",
+        "parsed_text_markdown",
+        IMAGE_RELATIVE_PATH_KEY,
+        DOCUMENT_RELATIVE_PATH_KEY,
+    ]
+
     for idx, md_text in enumerate(md_texts):
         chunk_metadata = {"page_num": idx + 1}
         if image_files is not None and idx < len(image_files):
-            image_file = image_files[idx]
+            image_file = Path(image_files[idx])
             chunk_metadata["image_path"] = str(image_file)
+            # Relative to the images folder, so references do not have to parse absolute paths at query time
+            chunk_metadata[IMAGE_RELATIVE_PATH_KEY] = f"{image_file.parent.name}/{image_file.name}"
         chunk_metadata["parsed_text_markdown"] = md_text
         chunk_metadata["source_file_path"] = original_pdf_path  # Set the original PDF path here
+        if original_pdf_path is not None:
+            chunk_metadata[DOCUMENT_RELATIVE_PATH_KEY] = Path(original_pdf_path).name
 
         node = Document(
             text=chunk_metadata["parsed_text_markdown"],  # or texts can be used.
             metadata=chunk_metadata,
-            excluded_embed_metadata_keys=["page_num", "image_path", "source_file_path", "parsed_text_markdown"],
-            excluded_llm_metadata_keys=["page_num", "image_path", "source_file_path", "parsed_text_markdown"],
+            excluded_embed_metadata_keys=list(excluded_metadata_keys),
+            excluded_llm_metadata_keys=list(excluded_metadata_keys),
         )
         documents.append(node)
 
     return documents
 
 
-def parse_data_documents_and_create_index():
+def load_existing_nodes():
     """
-    Parses PDF Text, Tables & Images and creates a VectorStoreIndex
+    Returns the nodes of the current binary store with their embeddings, grouped by source file name.
+
+    Everything is copied into memory, so the store can be rewritten in place afterwards.
+    """
+    existing = defaultdict(list)
+    if not has_binary_store(index_path):
+        return existing
+    store = MemmapVectorStore.from_persist_dir(index_path)
+    vectors = np.array(store.vectors)
+    for position in range(len(store)):
+        node = store.get_node(position)
+        file_name = Path(node.metadata.get("source_file_path", "")).name
+        existing[file_name].append((node, vectors[position]))
+    return existing
+
+
+def parse_data_documents_and_create_index(resume: bool = True, force: bool = False):
+    """
+    Incrementally parses PDF Text, Tables & Images and updates the VectorStoreIndex.
+
+    Only new or changed PDFs (by content hash) are parsed, and only their new or changed pages (by hash of
+    the parsed markdown) go through question extraction and embedding. Nodes of deleted PDFs are removed.
+    Parsing, image extraction and embedding run as concurrent pipeline stages.
+
+    With `CHUNKING=sections` pages are cut into chunks of headings, paragraphs and tables, which are embedded
+    instead of the pages and keep a back-reference to their page. Changing `CHUNKING` rebuilds every file.
+
+    Every completed unit of work (parsed PDF, extracted images, questions of a page, batch of embeddings) is
+    checkpointed as soon as it is done, so an interrupted build resumes where it stopped. Checkpoints are
+    cleared once the index is written with no failed files.
+
+    Args:
+        resume (bool, optional): Reuse the checkpoints of a previous, unfinished build. Defaults to True.
+        force (bool, optional): Rebuild every file from scratch, ignoring the manifest, the existing index and
+            the checkpoints. Defaults to False.
     """
+    if (
+        not force
+        and index_path.exists()
+        and any(index_path.iterdir())
+        and not IngestionManifest.exists(index_path)
+    ):
+        logger.info(f"Index at '{index_path}' was built without an ingestion manifest. Exiting the script.")
+        logger.info("You can re-run the script with --force in order to rebuild the index.")
+        return None
+
+    checkpoints = CheckpointStore(str(checkpoints_path))
+    if force or not resume:
+        checkpoints.clear()
+    else:
+        logger.info(f"Resuming from checkpoints: {checkpoints.count()}")
+
     parser = LlamaParse(
         verbose=True,
         result_type="markdown",
         language="en",
-        num_workers=8,  # Adjust the number of workers as needed
     )
-
-    text_documents_pool = []
-
-    try:
-        # Step 1: Collect all PDF files
-        pdf_files = [file for file in Path(data_pdf_path).iterdir() if file.suffix == ".pdf"]
-        logger.info(f"Found {len(pdf_files)} PDF files to process.")
-
-        # Step 2: Parse all PDFs (parallel processing)
-        json_results_list = parser.get_json_result(pdf_files)
-        logger.info(f"Finished parsing {len(json_results_list)} PDFs")
-
-        # Step 3: Iterate over the results, maintaining association with PDF files
-        for pdf_file, md_json_objs in zip(pdf_files, json_results_list):
-            if md_json_objs:
-                md_json_list = md_json_objs["pages"]
-                original_pdf_path = md_json_objs["file_path"]
-                logger.info(f"Extracting images for {pdf_file.name}...")
-
-                # Ensure a unique image directory for each PDF
-                data_images_file_path = data_images_path / pdf_file.name
-                data_images_file_path.mkdir(parents=True, exist_ok=True)
-
-                # Extract images for this PDF
-                image_dicts = parser.get_images([md_json_objs], download_path=data_images_file_path)
-                logger.info(f"Finished extracting {len(image_dicts)} images for {pdf_file.name}")
-
-                logger.info(f"Extracting text documents for {pdf_file.name}...")
-                text_documents = get_documents(
-                    md_json_list, image_dir=data_images_file_path, original_pdf_path=str(original_pdf_path)
-                )
-                logger.info(f"Finished extracting {len(text_documents)} text documents for {pdf_file.name}")
-                text_documents_pool.extend(text_documents)
-            else:
+    extractor = QuestionsAnsweredExtractor(questions=3, llm=llm_mini, num_workers=1)
+    llm_scheduler = RateLimitScheduler(
+        LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, max_in_flight=MAX_IN_FLIGHT_REQUESTS, logger=logger
+    )
+    embedding_scheduler = RateLimitScheduler(
+        EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE, max_in_flight=MAX_IN_FLIGHT_REQUESTS, logger=logger
+    )
+    embedder = BatchedEmbedder(openai_embed_batch(embedding_client, embed_model.model_name), embedding_scheduler)
+
+    question_prompt = PromptTemplate(template=extractor.prompt_template)
+
+    def ask_questions(node) -> str:
+        # The prompt of the extractor, sent by the sync client. `extractor.extract` runs an event loop per call,
+        # which the pooled connections of the shared async client must not outlive
+        context = node.get_content(metadata_mode=extractor.metadata_mode)
+        return llm_mini.predict(question_prompt, num_questions=extractor.questions, context_str=context).strip()
+
+    def extract_questions(node):
+        key = f"{llm_mini.model}:{node.metadata['page_hash']}"
+        questions = checkpoints.get("questions", key)
+        if questions is None:
+            tokens = count_tokens(node.text) + QUESTION_EXTRACTION_OVERHEAD_TOKENS
+            questions = llm_scheduler.call(lambda: {QUESTIONS_METADATA_KEY: ask_questions(node)}, tokens)
+            checkpoints.put("questions", key, questions)
+        node.metadata.update(questions)
+        return node
+
+    def embedding_key(text):
+        return text_sha256(f"{embed_model.model_name}\n{text}")
+
+    def checkpoint_embeddings(texts, batch_embeddings):
+        checkpoints.put_vectors([embedding_key(text) for text in texts], batch_embeddings)
+
+    with ScriptTimer("Planning", logger=logger):
+        manifest = IngestionManifest(chunking=CHUNKING) if force else IngestionManifest.load(index_path)
+        pdf_files = sorted(file for file in Path(data_pdf_path).iterdir() if file.suffix == ".pdf")
+        plan = manifest.plan(pdf_files)
+        existing = defaultdict(list) if force else load_existing_nodes()
+        if not existing and manifest.files:
+            # The manifest has no store to reuse nodes from, start over
+            manifest = IngestionManifest(chunking=CHUNKING)
+            plan = manifest.plan(pdf_files)
+        elif manifest.chunking != CHUNKING:
+            # Every node has to be cut again, embeddings of unchanged texts are still reused. A manifest without
+            # files is a first build, which only records the scheme
+            if manifest.files:
+                logger.info(f"Index was chunked by {manifest.chunking}, re-chunking every file by {CHUNKING}.")
+            manifest = IngestionManifest(chunking=CHUNKING)
+            plan = manifest.plan(pdf_files)
+    logger.info(f"Found {len(pdf_files)} PDF files: {plan}.")
+
+    def parse(pdf_file):
+        file_hash = plan.file_hashes[pdf_file.name]
+        md_json_objs = checkpoints.get("parse", file_hash)
+        if md_json_objs is None:
+            md_json_objs = parser.get_json_result(str(pdf_file))[0]
+            if not md_json_objs or not md_json_objs.get("pages"):
                 logger.warning(f"No content extracted from {pdf_file.name}.")
-    except Exception as e:
-        logger.error(f"Exception occurred: {e}")
-        logger.error(traceback.format_exc())
-
-    logger.info("Building the Index...")
-    vector_index = VectorStoreIndex.from_documents(
-        text_documents_pool, transformations=[QuestionsAnsweredExtractor(questions=3, llm=llm_mini, num_workers=2)]
+                return None
+            checkpoints.put("parse", file_hash, md_json_objs)
+        else:
+            logger.info(f"Reusing the checkpointed parse of {pdf_file.name}")
+        return {"pdf_file": pdf_file, "file_hash": file_hash, "json": md_json_objs}
+
+    def extract_images(job):
+        pdf_file = job["pdf_file"]
+        # Ensure a unique, up to date image directory for each PDF
+        data_images_file_path = data_images_path / pdf_file.name
+        if IMAGE_EXTRACTION == "lazy":
+            # Images of a previous parse have other job ids and would never be referenced again
+            shutil.rmtree(data_images_file_path, ignore_errors=True)
+            job["documents"] = get_documents(
+                job["json"]["pages"],
+                original_pdf_path=str(job["json"]["file_path"]),
+                image_files=get_parsed_image_files(job["json"], data_images_file_path),
+            )
+            return job
+        image_names = checkpoints.get("images", job["file_hash"])
+        if image_names is not None and all((data_images_file_path / name).is_file() for name in image_names):
+            logger.info(f"Reusing the {len(image_names)} checkpointed images of {pdf_file.name}")
+        else:
+            shutil.rmtree(data_images_file_path, ignore_errors=True)
+            data_images_file_path.mkdir(parents=True, exist_ok=True)
+            image_dicts = parser.get_images([job["json"]], download_path=data_images_file_path)
+            image_names = [file.name for file in data_images_file_path.iterdir() if file.is_file()]
+            checkpoints.put("images", job["file_hash"], image_names)
+            logger.info(f"Finished extracting {len(image_dicts)} images for {pdf_file.name}")
+        job["documents"] = get_documents(
+            job["json"]["pages"], image_dir=data_images_file_path, original_pdf_path=str(job["json"]["file_path"])
+        )
+        return job
+
+    def embed(job):
+        pdf_file = job["pdf_file"]
+        previous = existing.get(pdf_file.name, [])
+        questions = {node.metadata.get("page_hash"): node.metadata.get(QUESTIONS_METADATA_KEY) for node, _ in previous}
+        # Nodes are matched by their embedded text, so unchanged pages or chunks keep their embeddings
+        reusable = {
+            embedding_key(node.get_content(metadata_mode=MetadataMode.EMBED)): vector for node, vector in previous
+        }
+        pages, to_extract = [], []
+        for document in job["documents"]:
+            page_hash = text_sha256(document.text)
+            document.metadata["page_hash"] = page_hash
+            document.excluded_embed_metadata_keys.append("page_hash")
+            document.excluded_llm_metadata_keys.append("page_hash")
+            document.id_ = f"{pdf_file.name}:p{document.metadata['page_num']}:{page_hash[:16]}"
+            pages.append(document)
+            if CHUNKING != "pages":
+                # Questions about a whole page would make its chunks look alike, chunks are embedded as they are
+                continue
+            if page_hash in questions:
+                # Keep the extracted questions, they are part of the embedded text
+                if questions[page_hash] is not None:
+                    document.metadata[QUESTIONS_METADATA_KEY] = questions[page_hash]
+            else:
+                to_extract.append(document)
+
+        if to_extract:
+            with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT_REQUESTS) as executor:
+                list(executor.map(extract_questions, to_extract))
+        nodes = pages if CHUNKING == "pages" else [chunk for page in pages for chunk in chunk_page(page)]
+        embedded_texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        keys = [embedding_key(text) for text in embedded_texts]
+        texts = dict(zip(keys, embedded_texts))
+        vectors = {key: reusable[key] for key in texts if key in reusable}
+        # Repeated texts, e.g. a footer cut into a chunk of its own on every page, are embedded once
+        to_embed = [key for key in texts if key not in vectors]
+        if to_embed:
+            vectors.update(checkpoints.get_vectors(to_embed))
+            missing = [texts[key] for key in to_embed if key not in vectors]
+            for text, vector in zip(missing, embedder.embed(missing, on_batch=checkpoint_embeddings)):
+                vectors[embedding_key(text)] = vector
+        logger.info(f"Embedded {len(to_embed)} of {len(nodes)} {CHUNKING} of {len(pages)} pages of {pdf_file.name}")
+        job.update(
+            nodes=nodes,
+            embeddings=[vectors[key] for key in keys],
+            page_hashes=[page.metadata["page_hash"] for page in pages],
+        )
+        return job
+
+    pipeline = Pipeline(
+        [
+            Stage("parse", parse, workers=INGEST_WORKERS),
+            Stage("extract images", extract_images, workers=INGEST_WORKERS),
+            Stage("embed", embed, workers=INGEST_WORKERS),
+        ],
+        logger=logger,
     )
-    vector_index.storage_context.persist(persist_dir=index_path)
-    logger.info(f"Finished building the VectorStoreIndex, saved to disk at {index_path}.")
-
+    with ScriptTimer("Ingestion pipeline", logger=logger):
+        jobs = pipeline.run(plan.to_parse)
+    logger.info(f"Question extraction requests: {llm_scheduler.stats()}")
+    logger.info(f"Embedding requests: {embedding_scheduler.stats()}")
+    if pipeline.failures:
+        logger.warning(f"{len(pipeline.failures)} files failed and keep their previous nodes, if any.")
+
+    with ScriptTimer("Writing the index", logger=logger):
+        ingested = {job["pdf_file"].name: job for job in jobs}
+        all_nodes, all_embeddings = [], []
+        for file_name in sorted(set(existing) | set(ingested)):
+            if file_name in ingested:
+                job = ingested[file_name]
+                all_nodes.extend(job["nodes"])
+                all_embeddings.extend(job["embeddings"])
+                manifest.record_file(file_name, plan.file_hashes[file_name], job["page_hashes"])
+            elif file_name in plan.file_hashes:
+                # Unchanged, or changed but failed this time
+                for node, vector in existing[file_name]:
+                    all_nodes.append(node)
+                    all_embeddings.append(vector)
+        for file_name in plan.deleted:
+            manifest.remove_file(file_name)
+            shutil.rmtree(data_images_path / file_name, ignore_errors=True)
+            logger.info(f"Removed the nodes of deleted file {file_name}")
+
+        if not all_nodes:
+            logger.warning("No nodes to index.")
+            return None
+
+        for node, vector in zip(all_nodes, all_embeddings):
+            node.embedding = [float(value) for value in vector]
+        vector_index = VectorStoreIndex(nodes=all_nodes, embed_model=embed_model)
+        vector_index.storage_context.persist(persist_dir=index_path)
+        logger.info(f"Finished building the VectorStoreIndex, saved to disk at {index_path}.")
+
+        manifest_data = write_binary_store(all_nodes, np.asarray(all_embeddings, dtype=np.float32), index_path)
+        logger.info(f"Wrote binary vector store with {manifest_data['num_nodes']} nodes to {index_path}.")
+
+    vectors = MemmapVectorStore.from_persist_dir(index_path).vectors
+
+    with ScriptTimer("Building the IVF index", logger=logger):
+        ivf = IVFIndex.build(vectors)
+        ivf.save(index_path, build_id=manifest_data["build_id"])
+        logger.info(f"Wrote IVF index with {ivf.num_lists} lists to {index_path}.")
+
+    with ScriptTimer("Building the BM25 index", logger=logger):
+        # Same order as the binary store, BM25 positions are vector store rows
+        bm25 = BM25Index.build(lexical_text(node) for node in all_nodes)
+        bm25.save(index_path, build_id=manifest_data["build_id"])
+        logger.info(f"Wrote BM25 index with {bm25.manifest['num_terms']} terms to {index_path}.")
+
+    if VECTOR_COMPRESSION == "pq":
+        with ScriptTimer("Training the product quantizer", logger=logger):
+            quantizer = ProductQuantizer.train(vectors, num_subspaces=PQ_SUBSPACES)
+            quantizer.save(index_path, quantizer.encode(vectors), build_id=manifest_data["build_id"])
+            logger.info(f"Wrote product-quantized codes ({quantizer.num_subspaces} bytes per vector) to {index_path}.")
+
+    # Written last, so the manifest never lists pages the index does not contain
+    manifest.save(index_path)
+    if not pipeline.failures:
+        checkpoints.clear()
+    checkpoints.close()
     return vector_index
 
 
@@ -159,4 +441,17 @@ if __name__ == "__main__":
     """
     This script parses PDF documents, extracts text and images, and creates a VectorStoreIndex.
     """
-    index = parse_data_documents_and_create_index()
+    arg_parser = argparse.ArgumentParser(description="Builds or updates the index of the PDF documents.")
+    arg_parser.add_argument(
+        "--resume",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Reuse the checkpoints of an interrupted build (default). --no-resume discards them.",
+    )
+    arg_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild the whole index from scratch, ignoring the manifest, the existing index and the checkpoints.",
+    )
+    args = arg_parser.parse_args()
+    index = parse_data_documents_and_create_index(resume=args.resume, force=args.force)
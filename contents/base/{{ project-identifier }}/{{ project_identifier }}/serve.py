@@ -0,0 +1,213 @@
+"""
+Serves the chainlit app of `main.py` from `WEB_CONCURRENCY` pre-forked worker processes, so chat sessions are
+not limited to the one CPU a Python process can use.
+
+The parent process loads the app and the index, then forks the workers, which share the pages of the index and
+of everything else loaded before the fork until they write to them. The binary vector store and the BM25 index are
+memory-mapped, so their pages are shared in any case. The workers accept connections from one listening socket;
+the requests of a Socket.IO session are forwarded to the worker that opened it (see `SessionAffinityMiddleware`).
+The parent restarts workers that crash and stops them all on SIGTERM or SIGINT.
+
+Usage:
+    WEB_CONCURRENCY=2 python serve.py
+"""
+
+import asyncio
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import uvicorn
+from loguru import logger
+
+# Worker processes, 1 runs the app in this process
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+HOST = os.environ.get("CHAINLIT_HOST", "0.0.0.0")
+PORT = int(os.environ.get("CHAINLIT_PORT", 8000))
+# Connections waiting to be accepted by a worker
+LISTEN_BACKLOG = 2048
+# Workers exiting sooner than this after their start are restarted after a pause, so a broken app does not spin
+MIN_WORKER_SECONDS = 5
+
+
+def load_app(target: str = "main.py"):
+    """
+    Loads the chainlit app the way `chainlit run --headless` does.
+
+    Returns:
+        tuple: The ASGI app and the Socket.IO server.
+    """
+    from chainlit.config import config, load_module
+    from chainlit.markdown import init_markdown
+    from chainlit.utils import check_file, ensure_jwt_secret
+
+    config.run.host = HOST
+    config.run.port = PORT
+    config.run.headless = True
+    check_file(target)
+    config.run.module_name = target
+    load_module(target)
+    ensure_jwt_secret()
+    init_markdown(config.root)
+
+    from chainlit.server import app, sio
+
+    return app, sio
+
+
+def preload_index():
+    """Loads the index and the searchers derived from it, which the forked workers then share."""
+    from {{ project_identifier }}.core.index_registry import index_registry
+    from {{ project_identifier }}.core.retrieval import (
+        RETRIEVAL_BACKEND,
+        RETRIEVAL_MODE,
+        bm25_for_index,
+        searcher_for_index,
+    )
+
+    try:
+        index = index_registry.get()
+    except Exception:
+        # Logged by the registry, the readiness of the workers stays negative
+        return
+    searcher_for_index(index, RETRIEVAL_BACKEND)
+    if RETRIEVAL_MODE == "hybrid":
+        bm25_for_index(index)
+
+
+def run_server(app, sockets: List[socket.socket]):
+    from chainlit.config import config
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            ws=os.environ.get("UVICORN_WS_PROTOCOL", "auto"),
+            ws_per_message_deflate=os.environ.get("UVICORN_WS_PER_MESSAGE_DEFLATE", "true").lower()
+            in ("true", "1", "yes"),
+            log_level="debug" if config.run.debug else "error",
+        )
+    )
+    # Never the event loop of the parent, if it has one: forked processes would share its epoll instance
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.serve(sockets=sockets))
+
+
+def prefork(num_workers: int, run_worker: Callable[[int], None]) -> Dict[int, int]:
+    """
+    Forks `num_workers` processes running `run_worker(worker)`, and supervises them until they all exited.
+
+    Workers that exit with an error or are killed are restarted, unless the parent received SIGTERM or SIGINT,
+    which it passes on to the workers.
+
+    Args:
+        num_workers (int): The number of workers.
+        run_worker (Callable[[int], None]): Runs worker number `worker` in the child process.
+
+    Returns:
+        Dict[int, int]: The exit status of the last process of every worker.
+    """
+    workers: Dict[int, tuple] = {}  # pid: (worker, start time)
+    statuses: Dict[int, int] = {}
+    stopping = False
+
+    def start(worker: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            status = 0
+            try:
+                run_worker(worker)
+            except BaseException:
+                logger.exception(f"Worker {worker} failed")
+                status = 1
+            finally:
+                os._exit(status)
+        workers[pid] = (worker, time.monotonic())
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous_handlers = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for worker in range(num_workers):
+            start(worker)
+        while workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker, started = workers.pop(pid)
+            statuses[worker] = os.waitstatus_to_exitcode(status)
+            if statuses[worker] != 0 and not stopping:
+                logger.warning(f"Worker {worker} (pid {pid}) exited with {statuses[worker]}, restarting it")
+                if time.monotonic() - started < MIN_WORKER_SECONDS:
+                    time.sleep(MIN_WORKER_SECONDS)
+                start(worker)
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+    return statuses
+
+
+def serve(num_workers: int = WEB_CONCURRENCY):
+    from {{ project_identifier }}.core.worker_affinity import (
+        SessionAffinityMiddleware,
+        prefix_session_ids,
+        worker_socket_path,
+    )
+
+    app, sio = load_app()
+    listener = socket.create_server((HOST, PORT), backlog=LISTEN_BACKLOG)
+    if num_workers <= 1:
+        run_server(app, [listener])
+        return
+
+    from {{ project_identifier }}.core.chat_memory import CHAT_MEMORY_PATH
+    from {{ project_identifier }}.core.metrics import set_worker_snapshots
+
+    if not CHAT_MEMORY_PATH:
+        logger.warning(
+            "Chat histories are kept per worker, set CHAT_MEMORY_PATH so reconnecting sessions keep theirs"
+        )
+    preload_index()
+    # Objects loaded so far are never freed, the collector leaves them and the pages they are on alone
+    gc.freeze()
+
+    socket_dir = tempfile.mkdtemp(prefix="workers-")
+    worker_sockets = []
+    for worker in range(num_workers):
+        worker_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        worker_socket.bind(worker_socket_path(socket_dir, worker))
+        worker_socket.listen(LISTEN_BACKLOG)
+        worker_sockets.append(worker_socket)
+
+    def run_worker(worker: int):
+        prefix_session_ids(sio.eio, worker)
+        middleware = SessionAffinityMiddleware(app, worker, num_workers, socket_dir)
+        # /metrics adds up the histograms of all workers, whichever worker the scrape reaches
+        set_worker_snapshots(lambda: middleware.fetch_from_workers("/metrics/worker"))
+        run_server(middleware, [listener, worker_sockets[worker]])
+
+    logger.info(f"Serving on {HOST}:{PORT} with {num_workers} workers")
+    try:
+        prefork(num_workers, run_worker)
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(serve())
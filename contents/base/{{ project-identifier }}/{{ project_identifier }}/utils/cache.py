@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded least-recently-used cache with hit/miss counters.
+
+    Usage:
+    ```
+    cache = LRUCache(max_size=128)
+    value = cache.get_or_create(key, lambda: expensive(key))
+    cache.stats()  # {"size": 1, "max_size": 128, "hits": 0, "misses": 1, "evictions": 0, "hit_rate": 0.0}
+    ```
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 128):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+        # Per key being created by `get_or_create`, held while its factory runs
+        self._creating = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def get(self, key, default=None):
+        """Returns the cached value and marks it as recently used, counting a hit or a miss."""
+        with self._lock:
+            value = self._items.get(key, self._MISSING)
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_create(self, key, factory):
+        """
+        Returns the cached value, or creates, caches and returns it with `factory()`.
+
+        The factory runs under a lock of its key rather than the cache lock: concurrent callers of the same key
+        wait for one value instead of building it twice, callers of other keys are not held up.
+        """
+        value = self.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+        with self._lock:
+            key_lock = self._creating.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                # Created by the caller this one waited for
+                value = self._items.get(key, self._MISSING)
+            if value is self._MISSING:
+                try:
+                    value = factory()
+                    self.put(key, value)
+                finally:
+                    with self._lock:
+                        self._creating.pop(key, None)
+            return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
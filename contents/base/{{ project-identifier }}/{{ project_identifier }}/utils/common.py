@@ -1,6 +1,7 @@
+import os
 import re
-from loguru import logger
-from collections import defaultdict
+import sys
+import resource
 
 import logging
 from datetime import datetime
@@ -38,140 +39,152 @@ class ScriptTimer:
         self.logger.info("┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉┉")
 
 
-class MetadataExtractor:
+def current_rss_mb() -> float:
     """
-    MetadataExtractor is a class designed to extract specific metadata from a given response_metadata object.
-
-    Attributes:
-        response_metadata (dict): The metadata extracted from the response object.
-        score (float or None): The score associated with the response, if available.
-
-    Methods:
-        extract_image_path():
-            Extracts the image path from the metadata.
-            Returns:
-                str: The relative path to the image if found, otherwise None.
-
-        extract_document_path():
-            Extracts the document path from the metadata.
-            Returns:
-                str: The relative path to the document if found, otherwise None.
-
-        extract_page_number():
-            Extracts the page number from the metadata.
-            Returns:
-                str: The page number as a string, or "Unknown" if not found.
-
-        extract_parsed_text():
-            Extracts the parsed text in markdown format from the metadata.
-            Returns:
-                str: The parsed text if found, otherwise "No parsed text found."
+    Returns the resident set size of the current process in MB.
+
+    Reads `/proc/self/statm` where available and falls back to the peak RSS reported by `getrusage`.
     """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
 
-    def __init__(self, response_metadata):
-        # Assuming response_metadata is an instance of NodeWithScore, extract the node metadata
-        self.response_metadata = (
-            response_metadata.node.metadata if hasattr(response_metadata, "node") else response_metadata
-        )
-        self.score = response_metadata.score if hasattr(response_metadata, "score") else None
 
-    def extract_image_path(self):
-        pattern = r".*/data/images/(.*)"
-        try:
-            image_path = re.findall(pattern, self.response_metadata.get("image_path", ""))[0]
-            return f"./data/images/{image_path}"
-        except (IndexError, AttributeError):
-            logger.info("No valid image path found.")
-            return None
+# Metadata keys written by `scripts/index_data.py` with the paths relative to the data folders
+DOCUMENT_RELATIVE_PATH_KEY = "source_file_relative_path"
+IMAGE_RELATIVE_PATH_KEY = "image_relative_path"
+# Back-reference of a chunk to the page it was cut from, and its position on that page
+PARENT_PAGE_ID_KEY = "parent_page_id"
+CHUNK_INDEX_KEY = "chunk_index"
+
+# Fallbacks for nodes indexed before the relative paths were stored
+_document_path_pattern = re.compile(r".*/data/documents/(.*)")
+_image_path_pattern = re.compile(r".*/data/images/(.*)")
+
+
+def _relative_path(metadata, key: str, absolute_key: str, pattern: re.Pattern):
+    relative_path = metadata.get(key)
+    if relative_path is not None:
+        return relative_path
+    absolute_path = metadata.get(absolute_key)
+    match = pattern.match(absolute_path) if isinstance(absolute_path, str) else None
+    return match.group(1) if match else None
+
+
+def document_relative_path(metadata) -> str:
+    """Returns the path of a node's PDF relative to `data/documents`, or None."""
+    return _relative_path(metadata, DOCUMENT_RELATIVE_PATH_KEY, "source_file_path", _document_path_pattern)
+
+
+def image_relative_path(metadata) -> str:
+    """Returns the path of a node's page image relative to `data/images`, or None."""
+    return _relative_path(metadata, IMAGE_RELATIVE_PATH_KEY, "image_path", _image_path_pattern)
+
 
-    def extract_document_path(self):
-        pattern_file = r".*/data/documents/(.*)"
-        try:
-            file_path = re.findall(pattern_file, self.response_metadata.get("source_file_path", ""))[0]
-            return f"./data/documents/{file_path}"
-        except (IndexError, AttributeError):
-            logger.info(f"No source document path match for {self.response_metadata.get('source_file_path', None)}.")
-            return None
+class ImageReference:
+    """A page image of a referenced document."""
 
-    def extract_page_number(self):
-        return str(self.response_metadata.get("page_num", "Unknown"))
+    __slots__ = ("path", "name", "page_num", "score")
+    type = "Image"
+    display = "inline"
 
-    def extract_parsed_text(self):
-        return self.response_metadata.get("parsed_text_markdown", "No parsed text found.")
+    def __init__(self, path: str, name: str, page_num: str, score):
+        self.path = path
+        self.name = name
+        self.page_num = page_num
+        self.score = score
+
+
+class DocumentReference:
+    """A referenced document with the pages, text and images of all its source nodes."""
+
+    __slots__ = ("path", "name", "page_numbers", "text", "score", "images")
+    type = "Pdf"
+    display = "inline"
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self.page_numbers = []
+        self.text = ""
+        self.score = None
+        self.images = []
+
+
+def _page_order(page_number: str):
+    return (0, int(page_number), "") if page_number.isdigit() else (1, 0, page_number)
 
 
 def process_response_metadata_list(response_metadata_list):
     """
     Processes a list of response metadata and organizes the extracted information into a structured format.
 
+    Documents are named "pdf1", "pdf2", ... in the order of their first source node, and each document's
+    images "image1", "image2", ... in the order of their source nodes. Chunks of the same page share its
+    image, which is referenced once, and their texts are joined in page order.
+
     Args:
-        response_metadata_list (list): A list of response metadata dictionaries to be processed.
+        response_metadata_list (list): A list of `NodeWithScore` (or metadata dictionaries) to be processed.
 
     Returns:
-        list: A list of dictionaries, each representing a document with the following keys:
-            - type (str): The type of the document, default is "Pdf".
+        list: A list of `DocumentReference`, one per document, with:
+            - type (str): The type of the document, "Pdf".
             - path (str): The file path of the document.
             - name (str): The name of the document.
-            - display (str): Display mode, default is "inline".
-            - page_numbers (list): A sorted list of page numbers where the document appears.
-            - text (list): A list of parsed text segments from the document.
+            - display (str): Display mode, "inline".
+            - page_numbers (list): The page numbers where the document appears, in page order.
+            - text (str): The parsed text of the document's source nodes, page by page.
             - score (float): The highest score associated with the document.
-            - images (list): A list of dictionaries, each representing an image with the following keys:
-                - type (str): The type of the image, default is "Image".
-                - path (str): The file path of the image.
-                - name (str): The name of the image.
-                - display (str): Display mode, default is "inline".
-                - page_num (int): The page number where the image appears.
-                - text (str): The parsed text associated with the image.
-                - score (float): The score associated with the image.
+            - images (list): An `ImageReference` per distinct image of the source nodes, with the path, name,
+                page_num and score of the image.
     """
-    all_documents = defaultdict(
-        lambda: {
-            "type": "Pdf",
-            "path": None,
-            "name": None,
-            "display": "inline",
-            "page_numbers": set(),
-            "text": "",
-            "score": None,
-            "images": [],
-        }
-    )
-
-    for index, response_meta in enumerate(response_metadata_list):
-        extractor = MetadataExtractor(response_meta)
-
-        final_image_path = extractor.extract_image_path()
-        final_document_path = extractor.extract_document_path()
-        page_number = extractor.extract_page_number()
-        parsed_text = extractor.extract_parsed_text()
-        score = extractor.score
-
-        if final_document_path:
-            document = all_documents[final_document_path]
-            document["path"] = final_document_path
-            document["name"] = f"pdf{len(all_documents)}"
-            document["page_numbers"].add(page_number)
-            document["text"] += parsed_text + "\n\n"
-            document["score"] = score if document["score"] is None else max(document["score"], score)
-
-            if final_image_path:
-                document["images"].append(
-                    {
-                        "type": "Image",
-                        "path": final_image_path,
-                        "name": f"image{len(document['images']) + 1}",
-                        "display": "inline",
-                        "page_num": page_number,
-                        "score": score,
-                    }
+    documents = {}
+    texts = {}
+    page_numbers = {}
+
+    for response_meta in response_metadata_list:
+        node = getattr(response_meta, "node", None)
+        metadata = node.metadata if node is not None else response_meta
+        document_path = document_relative_path(metadata)
+        if document_path is None:
+            continue
+        score = getattr(response_meta, "score", None)
+
+        document = documents.get(document_path)
+        if document is None:
+            document = documents[document_path] = DocumentReference(
+                f"./data/documents/{document_path}", f"pdf{len(documents) + 1}"
+            )
+            # page number -> chunk index -> text, pages in the order of their first source node
+            texts[document_path] = {}
+            page_numbers[document_path] = set()
+        page_number = str(metadata.get("page_num", "Unknown"))
+        page_numbers[document_path].add(page_number)
+        page_text = metadata.get("parsed_text_markdown", "No parsed text found.")
+        texts[document_path].setdefault(page_number, {}).setdefault(metadata.get(CHUNK_INDEX_KEY, 0), page_text)
+        document.score = score if document.score is None else max(document.score, score)
+
+        image_path = image_relative_path(metadata)
+        if image_path is not None and all(image.path != f"./data/images/{image_path}" for image in document.images):
+            document.images.append(
+                ImageReference(
+                    f"./data/images/{image_path}", f"image{len(document.images) + 1}", page_number, score
                 )
+            )
 
-    # Convert page_numbers from set to sorted list for consistency
-    for document in all_documents.values():
-        document["page_numbers"] = sorted(document["page_numbers"])
+    for document_path, document in documents.items():
+        document.page_numbers = sorted(page_numbers[document_path], key=_page_order)
+        document.text = (
+            "\n\n".join(text for page_texts in texts[document_path].values() for _, text in sorted(page_texts.items()))
+            + "\n\n"
+        )
 
-    return list(all_documents.values())
+    return list(documents.values())
 
 
 async def find_profile_data(chat_profile):